@@ -58,8 +58,11 @@ const History: React.FC = () => {
 
               <div className="history-image">
                 <img
-                  src={`http://localhost:8000/image/${item.imagePath}`}
+                  src={`http://localhost:8000/image/${
+                    item.thumbnailPath ?? item.imagePath
+                  }`}
                   alt={item.prompt}
+                  loading="lazy"
                   className="generated-image"
                 />
               </div>
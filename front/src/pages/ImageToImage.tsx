@@ -9,12 +9,15 @@ const ImageToImage: React.FC = () => {
   const [strength, setStrength] = useState(0.4); // 기본값 0.4
 
   // Worker 서비스
-  const { generateImageToImage } = useImageWorkerService();
+  const { generateImageToImage, cancelGeneration } = useImageWorkerService();
   const {
     isGenerating,
     generatedImage,
+    generatedThumbnail,
     error,
     message,
+    progress,
+    progressPreview,
     clearError,
     clearMessage,
     addToHistory,
@@ -51,9 +54,9 @@ const ImageToImage: React.FC = () => {
   // 이미지 생성 성공 시 히스토리에 추가
   useEffect(() => {
     if (generatedImage && prompt) {
-      addToHistory(prompt, generatedImage, "image-to-image");
+      addToHistory(prompt, generatedImage, "image-to-image", generatedThumbnail);
     }
-  }, [generatedImage, prompt, addToHistory]);
+  }, [generatedImage, generatedThumbnail, prompt, addToHistory]);
 
   return (
     <div className="image-to-image-page">
@@ -152,6 +155,21 @@ const ImageToImage: React.FC = () => {
             <p>🎯 이미지 변환이 백그라운드에서 진행 중입니다.</p>
             <p>다른 페이지로 이동해도 변환은 계속됩니다!</p>
             <p>⚠️ 이미지 → 이미지는 새로고침 후 복구할 수 없습니다.</p>
+            {progress && (
+              <p>
+                ⏳ {progress.step} / {progress.totalSteps} 단계
+              </p>
+            )}
+            {progressPreview && (
+              <img
+                src={progressPreview}
+                alt="Preview"
+                className="progress-preview"
+              />
+            )}
+            <button onClick={cancelGeneration} className="btn btn-secondary">
+              변환 취소
+            </button>
           </div>
         )}
       </div>
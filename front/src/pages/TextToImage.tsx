@@ -6,12 +6,15 @@ const TextToImage: React.FC = () => {
   const [prompt, setPrompt] = useState("");
 
   // Worker 서비스
-  const { generateTextToImage } = useImageWorkerService();
+  const { generateTextToImage, cancelGeneration } = useImageWorkerService();
   const {
     isGenerating,
     generatedImage,
+    generatedThumbnail,
     error,
     message,
+    progress,
+    progressPreview,
     clearError,
     clearMessage,
     addToHistory,
@@ -37,9 +40,9 @@ const TextToImage: React.FC = () => {
   // 이미지 생성 성공 시 히스토리에 추가하고 pending request 클리어
   useEffect(() => {
     if (generatedImage && prompt) {
-      addToHistory(prompt, generatedImage, "text-to-image");
+      addToHistory(prompt, generatedImage, "text-to-image", generatedThumbnail);
     }
-  }, [generatedImage, prompt, addToHistory]);
+  }, [generatedImage, generatedThumbnail, prompt, addToHistory]);
 
   return (
     <div className="text-to-image-page">
@@ -90,6 +93,21 @@ const TextToImage: React.FC = () => {
             <p>🎯 이미지 생성이 백그라운드에서 진행 중입니다.</p>
             <p>다른 페이지로 이동해도 생성은 계속됩니다!</p>
             <p>💡 새로고침하지 말아주세요.</p>
+            {progress && (
+              <p>
+                ⏳ {progress.step} / {progress.totalSteps} 단계
+              </p>
+            )}
+            {progressPreview && (
+              <img
+                src={progressPreview}
+                alt="Preview"
+                className="progress-preview"
+              />
+            )}
+            <button onClick={cancelGeneration} className="btn btn-secondary">
+              생성 취소
+            </button>
           </div>
         )}
       </div>
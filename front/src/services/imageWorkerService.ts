@@ -34,19 +34,29 @@ class ImageWorkerService {
     switch (type) {
       case "GENERATION_STARTED":
         store.setGenerating(true);
+        store.setProgress(null);
         store.setError(null);
         store.setMessage(data.message);
         break;
 
+      case "GENERATION_PROGRESS":
+        store.setProgress(
+          { step: data.step, totalSteps: data.totalSteps },
+          data.preview
+        );
+        break;
+
       case "GENERATION_SUCCESS":
         store.setGenerating(false);
-        store.setGeneratedImage(data.imagePath);
+        store.setProgress(null);
+        store.setGeneratedImage(data.imagePath, data.thumbnailPath);
         store.setMessage(data.message);
         store.setError(null);
         break;
 
       case "GENERATION_ERROR":
         store.setGenerating(false);
+        store.setProgress(null);
         store.setError(data.error);
         store.setMessage(data.message);
         store.setGeneratedImage(null);
@@ -104,13 +114,18 @@ class ImageWorkerService {
     });
   }
 
+  public cancelGeneration() {
+    this.worker?.postMessage({ type: "CANCEL_GENERATION" });
+  }
+
   public addToHistory(
     prompt: string,
     imagePath: string,
-    type: "text-to-image" | "image-to-image"
+    type: "text-to-image" | "image-to-image",
+    thumbnailPath?: string | null
   ) {
     const store = useImageStore.getState();
-    store.addToHistory(prompt, imagePath, type);
+    store.addToHistory(prompt, imagePath, type, thumbnailPath);
   }
 
   public cleanup() {
@@ -131,5 +146,7 @@ export const useImageWorkerService = () => {
       imageWorkerService.generateTextToImage.bind(imageWorkerService),
     generateImageToImage:
       imageWorkerService.generateImageToImage.bind(imageWorkerService),
+    cancelGeneration:
+      imageWorkerService.cancelGeneration.bind(imageWorkerService),
   };
 };
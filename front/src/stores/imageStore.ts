@@ -5,25 +5,37 @@ interface ImageGenerationState {
   // 상태
   isGenerating: boolean;
   generatedImage: string | null;
+  generatedThumbnail: string | null;
   error: string | null;
   message: string | null;
+  progress: { step: number; totalSteps: number } | null;
+  progressPreview: string | null;
   generationHistory: Array<{
     id: string;
     prompt: string;
     imagePath: string;
+    thumbnailPath?: string;
     timestamp: Date;
     type: "text-to-image" | "image-to-image";
   }>;
 
   // 액션
   setGenerating: (isGenerating: boolean) => void;
-  setGeneratedImage: (imagePath: string | null) => void;
+  setGeneratedImage: (
+    imagePath: string | null,
+    thumbnailPath?: string | null
+  ) => void;
   setError: (error: string | null) => void;
   setMessage: (message: string | null) => void;
+  setProgress: (
+    progress: { step: number; totalSteps: number } | null,
+    preview?: string | null
+  ) => void;
   addToHistory: (
     prompt: string,
     imagePath: string,
-    type: "text-to-image" | "image-to-image"
+    type: "text-to-image" | "image-to-image",
+    thumbnailPath?: string | null
   ) => void;
   clearError: () => void;
   clearMessage: () => void;
@@ -37,24 +49,40 @@ export const useImageStore = create<ImageGenerationState>()(
       // 초기 상태
       isGenerating: false,
       generatedImage: null,
+      generatedThumbnail: null,
       error: null,
       message: null,
+      progress: null,
+      progressPreview: null,
       generationHistory: [],
 
       // 액션들
       setGenerating: (isGenerating) => set({ isGenerating }),
 
-      setGeneratedImage: (imagePath) => set({ generatedImage: imagePath }),
+      setGeneratedImage: (imagePath, thumbnailPath) =>
+        set({
+          generatedImage: imagePath,
+          generatedThumbnail: thumbnailPath ?? null,
+        }),
 
       setError: (error) => set({ error }),
 
       setMessage: (message) => set({ message }),
 
-      addToHistory: (prompt, imagePath, type) => {
+      setProgress: (progress, preview) =>
+        set((state) => ({
+          progress,
+          // 미리보기가 없는 스텝에서는 직전 미리보기를 유지
+          progressPreview:
+            progress === null ? null : preview ?? state.progressPreview,
+        })),
+
+      addToHistory: (prompt, imagePath, type, thumbnailPath) => {
         const newEntry = {
           id: Date.now().toString(),
           prompt,
           imagePath,
+          thumbnailPath: thumbnailPath ?? undefined,
           timestamp: new Date(),
           type,
         };
@@ -87,6 +115,7 @@ export const useImageStore = create<ImageGenerationState>()(
       partialize: (state) => ({
         // sessionStorage에 저장할 상태들
         generatedImage: state.generatedImage,
+        generatedThumbnail: state.generatedThumbnail,
         generationHistory: state.generationHistory,
         // isGenerating은 저장하지 않음 (새로고침 시 false로 리셋)
       }),
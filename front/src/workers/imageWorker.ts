@@ -3,8 +3,8 @@ const API_BASE_URL = "http://localhost:8000";
 
 // Worker 메시지 타입 정의
 interface WorkerMessage {
-  type: "GENERATE_TEXT_TO_IMAGE" | "GENERATE_IMAGE_TO_IMAGE";
-  payload: TextToImagePayload | ImageToImagePayload;
+  type: "GENERATE_TEXT_TO_IMAGE" | "GENERATE_IMAGE_TO_IMAGE" | "CANCEL_GENERATION";
+  payload?: TextToImagePayload | ImageToImagePayload;
 }
 
 interface TextToImagePayload {
@@ -30,6 +30,66 @@ const sendMessage = (type: string, data: any) => {
   self.postMessage({ type, data });
 };
 
+// 현재 진행 중인 작업
+let currentJobId: string | null = null;
+let currentEvents: EventSource | null = null;
+
+const closeEvents = () => {
+  currentEvents?.close();
+  currentEvents = null;
+  currentJobId = null;
+};
+
+// 작업 이벤트 스트림(SSE)을 구독하고 완료되면 결과 경로를 반환
+interface JobResult {
+  image_paths: string[];
+  thumbnail_paths?: string[];
+}
+
+const followJob = (jobId: string): Promise<JobResult> =>
+  new Promise((resolve, reject) => {
+    closeEvents();
+    currentJobId = jobId;
+    currentEvents = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+
+    currentEvents.addEventListener("progress", (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      sendMessage("GENERATION_PROGRESS", {
+        step: data.step,
+        totalSteps: data.total_steps,
+        preview: data.preview ?? null,
+      });
+    });
+
+    currentEvents.addEventListener("status", (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      if (data.status === "succeeded") {
+        closeEvents();
+        resolve(data.result);
+      } else if (data.status === "failed") {
+        closeEvents();
+        reject(new Error(data.error || "이미지 생성에 실패했습니다."));
+      } else if (data.status === "cancelled") {
+        closeEvents();
+        reject(new Error("생성이 취소되었습니다."));
+      }
+    });
+
+    currentEvents.onerror = () => {
+      // 서버가 스트림을 닫은 뒤의 재연결 시도는 무시
+      if (currentEvents?.readyState === EventSource.CLOSED) {
+        closeEvents();
+        reject(new Error("진행 상황 스트림 연결이 끊어졌습니다."));
+      }
+    };
+  });
+
+// 진행 중인 작업 취소
+const cancelGeneration = async () => {
+  if (!currentJobId) return;
+  await fetch(`${API_BASE_URL}/jobs/${currentJobId}`, { method: "DELETE" });
+};
+
 // 텍스트에서 이미지 생성
 const generateTextToImage = async (payload: TextToImagePayload) => {
   try {
@@ -37,28 +97,26 @@ const generateTextToImage = async (payload: TextToImagePayload) => {
       message: "이미지 생성이 시작되었습니다.",
     });
 
-    const response = await fetch(`${API_BASE_URL}/generate/text-to-image`, {
+    const response = await fetch(`${API_BASE_URL}/jobs/text-to-image`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify(payload),
+      body: JSON.stringify({ preview: true, ...payload }),
     });
 
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
-    const data = await response.json();
+    const { job_id } = await response.json();
+    const result = await followJob(job_id);
 
-    if (data.success) {
-      sendMessage("GENERATION_SUCCESS", {
-        imagePath: data.image_paths[0],
-        message: "이미지가 성공적으로 생성되었습니다.",
-      });
-    } else {
-      throw new Error(data.message || "이미지 생성에 실패했습니다.");
-    }
+    sendMessage("GENERATION_SUCCESS", {
+      imagePath: result.image_paths[0],
+      thumbnailPath: result.thumbnail_paths?.[0] ?? null,
+      message: "이미지가 성공적으로 생성되었습니다.",
+    });
   } catch (error) {
     sendMessage("GENERATION_ERROR", {
       error:
@@ -91,8 +149,9 @@ const generateImageToImage = async (payload: ImageToImagePayload) => {
       "model_id",
       payload.model_id || "stabilityai/stable-diffusion-xl-base-1.0"
     );
+    formData.append("preview", "true");
 
-    const response = await fetch(`${API_BASE_URL}/generate/image-to-image`, {
+    const response = await fetch(`${API_BASE_URL}/jobs/image-to-image`, {
       method: "POST",
       body: formData,
     });
@@ -101,16 +160,14 @@ const generateImageToImage = async (payload: ImageToImagePayload) => {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
-    const data = await response.json();
+    const { job_id } = await response.json();
+    const result = await followJob(job_id);
 
-    if (data.success) {
-      sendMessage("GENERATION_SUCCESS", {
-        imagePath: data.image_paths[0],
-        message: "이미지가 성공적으로 변환되었습니다.",
-      });
-    } else {
-      throw new Error(data.message || "이미지 변환에 실패했습니다.");
-    }
+    sendMessage("GENERATION_SUCCESS", {
+      imagePath: result.image_paths[0],
+      thumbnailPath: result.thumbnail_paths?.[0] ?? null,
+      message: "이미지가 성공적으로 변환되었습니다.",
+    });
   } catch (error) {
     sendMessage("GENERATION_ERROR", {
       error:
@@ -128,11 +185,14 @@ self.addEventListener("message", (event: MessageEvent<WorkerMessage>) => {
 
   switch (type) {
     case "GENERATE_TEXT_TO_IMAGE":
-      generateTextToImage(payload);
+      generateTextToImage(payload as TextToImagePayload);
       break;
     case "GENERATE_IMAGE_TO_IMAGE":
       generateImageToImage(payload as ImageToImagePayload);
       break;
+    case "CANCEL_GENERATION":
+      cancelGeneration();
+      break;
     default:
       console.warn("Unknown message type:", type);
   }
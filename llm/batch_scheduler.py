@@ -0,0 +1,351 @@
+"""
+Batch Scheduler
+
+Collects concurrent generation requests with a compatible shape and runs
+them as a single batched pipeline call.
+
+Requests are compatible when they target the same model and share every
+parameter that must be identical across a pipeline batch (size, steps,
+guidance, negative prompt, prompt suffix, LoRA adapters, speed profile,
+images per prompt, prompt length in encoder chunks and, for img2img,
+strength and input size). A batch holds at most max_batch_size images,
+fewer when the memory planner estimates that the full batch would not fit.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Deque, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from image_generator import GeneratorEvictedError, StepCallback, create_generator, output_size
+from lora_adapters import LoraSelection
+from memory_planner import get_planner, memory_planning_enabled
+from prompt_embeddings import prompt_chunks
+
+
+@dataclass(eq=False)
+class _PendingRequest:
+    """A single queued generation request."""
+
+    kind: str  # "text" 또는 "image"
+    model_id: str
+    prompt: str
+    filename: Optional[str]
+    guidance_scale: float
+    num_inference_steps: Optional[int]
+    negative_prompt: Optional[str]
+    height: int = 512
+    width: int = 512
+    strength: float = 0.75
+    input_image: Optional[Image.Image] = None
+    step_callback: Optional[StepCallback] = None
+    seeds: Tuple[Optional[int], ...] = (None,)  # 출력 이미지별 시드 (길이 = 이미지 수)
+    prompt_suffix: Optional[str] = None
+    loras: Optional[Tuple[LoraSelection, ...]] = None  # None이면 모델 기본 LoRA
+    profile: Optional[str] = None  # 속도 프로필 (스케줄러)
+    prompt_chunks: int = 1  # 프롬프트 인코딩 청크 수 (배치 안에서 패딩 길이가 같아야 함)
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def num_images(self) -> int:
+        """Images this request produces."""
+        return len(self.seeds)
+
+    def filenames(self) -> List[Optional[str]]:
+        """Output filename per image; variants get _1, _2, ... before the extension."""
+        if self.filename is None or self.num_images == 1:
+            return [self.filename] * self.num_images
+        stem, ext = os.path.splitext(self.filename)
+        return [f"{stem}_{j + 1}{ext}" for j in range(self.num_images)]
+
+    def batch_key(self) -> Tuple[Any, ...]:
+        """Parameters that must match for requests to share a pipeline call."""
+        if self.kind == "image":
+            return (
+                self.kind,
+                self.model_id,
+                self.input_image.size,
+                self.strength,
+                self.guidance_scale,
+                self.num_inference_steps,
+                self.negative_prompt,
+                self.prompt_suffix,
+                self.loras,
+                self.profile,
+                self.num_images,
+                self.prompt_chunks,
+            )
+        return (
+            self.kind,
+            self.model_id,
+            self.height,
+            self.width,
+            self.guidance_scale,
+            self.num_inference_steps,
+            self.negative_prompt,
+            self.prompt_suffix,
+            self.loras,
+            self.profile,
+            self.num_images,
+            self.prompt_chunks,
+        )
+
+
+class BatchScheduler:
+    """Groups compatible requests within a short window into batched pipeline calls."""
+
+    def __init__(self, max_batch_size: int = 4, max_wait_ms: float = 50.0):
+        """Initialize the scheduler and start its dispatch thread."""
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: Deque[_PendingRequest] = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.batches_run = 0
+        self.requests_run = 0
+        self.images_run = 0
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit_text_to_image(
+        self,
+        model_id: str,
+        prompt: str,
+        filename: Optional[str] = None,
+        height: int = 512,
+        width: int = 512,
+        guidance_scale: float = 7.5,
+        num_inference_steps: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        step_callback: Optional[StepCallback] = None,
+        seed: Optional[int] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        seeds: Optional[Sequence[Optional[int]]] = None,
+        profile: Optional[str] = None
+    ) -> "Future[List[Image.Image]]":
+        """Queue a text-to-image request. The future resolves to the generated images.
+
+        seeds requests one image per entry; otherwise a single image with seed.
+        """
+        return self._submit(_PendingRequest(
+            kind="text",
+            model_id=model_id,
+            prompt=prompt,
+            filename=filename,
+            height=height,
+            width=width,
+            guidance_scale=guidance_scale,
+            num_inference_steps=num_inference_steps,
+            negative_prompt=negative_prompt,
+            step_callback=step_callback,
+            seeds=tuple(seeds) if seeds else (seed,),
+            prompt_suffix=prompt_suffix,
+            loras=tuple(loras) if loras is not None else None,
+            profile=profile,
+        ))
+
+    def submit_image_to_image(
+        self,
+        model_id: str,
+        prompt: str,
+        input_image: Image.Image,
+        filename: Optional[str] = None,
+        strength: float = 0.75,
+        guidance_scale: float = 7.5,
+        num_inference_steps: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        step_callback: Optional[StepCallback] = None,
+        seed: Optional[int] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        seeds: Optional[Sequence[Optional[int]]] = None,
+        profile: Optional[str] = None
+    ) -> "Future[List[Image.Image]]":
+        """Queue an image-to-image request. The future resolves to the generated images.
+
+        seeds requests one image per entry; otherwise a single image with seed.
+        """
+        return self._submit(_PendingRequest(
+            kind="image",
+            model_id=model_id,
+            prompt=prompt,
+            filename=filename,
+            input_image=input_image,
+            strength=strength,
+            guidance_scale=guidance_scale,
+            num_inference_steps=num_inference_steps,
+            negative_prompt=negative_prompt,
+            step_callback=step_callback,
+            seeds=tuple(seeds) if seeds else (seed,),
+            prompt_suffix=prompt_suffix,
+            loras=tuple(loras) if loras is not None else None,
+            profile=profile,
+        ))
+
+    def pending_count(self) -> int:
+        """Number of requests waiting to be batched."""
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        """Batch counters for sizing max batch size and wait window."""
+        with self._condition:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "pending": len(self._pending),
+                "batches_run": self.batches_run,
+                "requests_run": self.requests_run,
+                "images_run": self.images_run,
+                "avg_batch_size": self.requests_run / self.batches_run if self.batches_run else 0.0,
+            }
+
+    def shutdown(self):
+        """Stop the dispatch thread after the current batch."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _submit(self, request: _PendingRequest) -> Future:
+        # 토크나이저 호출은 잠금 밖에서
+        request.prompt_chunks = prompt_chunks(request.model_id, request.prompt)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Batch scheduler is shut down")
+            self._pending.append(request)
+            self._condition.notify_all()
+        return request.future
+
+    def max_images(self, model_id: str, height: int, width: int, guidance_scale: float) -> int:
+        """Images per pipeline call for a shape: max_batch_size, capped by the memory planner."""
+        if not memory_planning_enabled():
+            return self.max_batch_size
+        return get_planner(model_id).max_batch_size(height, width, self.max_batch_size, guidance=guidance_scale > 1)
+
+    def _capacity(self, request: _PendingRequest) -> int:
+        """Requests shaped like this one that fit in a batch (at least one)."""
+        if request.kind == "image":
+            width, height = request.input_image.size
+        else:
+            height, width = output_size(request.model_id, request.height, request.width)
+        # 메모리 예산 안에 들어가는 이미지 수만큼만 묶음
+        images = self.max_images(request.model_id, height, width, request.guidance_scale)
+        return max(1, images // request.num_images)
+
+    def _matching_locked(self, key: Tuple[Any, ...], capacity: int) -> List[_PendingRequest]:
+        matches = [r for r in self._pending if r.batch_key() == key]
+        return matches[:capacity]
+
+    def _next_batch(self) -> Optional[List[_PendingRequest]]:
+        with self._condition:
+            while not self._pending and not self._stopped:
+                self._condition.wait()
+            if not self._pending:
+                return None
+
+            # 가장 오래된 요청 기준으로 같은 형태의 요청을 대기 시간 동안 모음
+            head = self._pending[0]
+            key = head.batch_key()
+            capacity = self._capacity(head)
+            deadline = head.enqueued_at + self.max_wait
+            batch = self._matching_locked(key, capacity)
+            while len(batch) < capacity and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                batch = self._matching_locked(key, capacity)
+
+            for request in batch:
+                self._pending.remove(request)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # 취소된 요청은 추론에서 제외
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                images = self._execute(batch)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            with self._condition:
+                self.batches_run += 1
+                self.requests_run += len(batch)
+                self.images_run += len(images)
+            # 결과는 요청(프롬프트)별로 묶여 있음
+            n = batch[0].num_images
+            for i, request in enumerate(batch):
+                request.future.set_result(images[i * n:(i + 1) * n])
+
+    def _execute(self, batch: List[_PendingRequest]) -> List[Image.Image]:
+        try:
+            return self._execute_on(create_generator(batch[0].model_id), batch)
+        except GeneratorEvictedError:
+            # 레지스트리가 방금 제거한 생성기 - 레지스트리에서 다시 받아 재시도
+            return self._execute_on(create_generator(batch[0].model_id), batch)
+
+    def _execute_on(self, generator, batch: List[_PendingRequest]) -> List[Image.Image]:
+        head = batch[0]
+        print(f"📦 Running batch of {len(batch)} {head.kind} request(s) x {head.num_images} image(s) on {head.model_id}")
+        if head.kind == "image":
+            return generator.generate_image_to_image_batch(
+                [r.prompt for r in batch],
+                [r.input_image for r in batch],
+                filenames=[name for r in batch for name in r.filenames()],
+                strength=head.strength,
+                guidance_scale=head.guidance_scale,
+                num_inference_steps=head.num_inference_steps,
+                negative_prompt=head.negative_prompt,
+                step_callbacks=[r.step_callback for r in batch],
+                seeds=[seed for r in batch for seed in r.seeds],
+                prompt_suffix=head.prompt_suffix,
+                loras=head.loras,
+                num_images_per_prompt=head.num_images,
+                profile=head.profile,
+            )
+        return generator.generate_text_to_image_batch(
+            [r.prompt for r in batch],
+            filenames=[name for r in batch for name in r.filenames()],
+            height=head.height,
+            width=head.width,
+            guidance_scale=head.guidance_scale,
+            num_inference_steps=head.num_inference_steps,
+            negative_prompt=head.negative_prompt,
+            step_callbacks=[r.step_callback for r in batch],
+            seeds=[seed for r in batch for seed in r.seeds],
+            prompt_suffix=head.prompt_suffix,
+            loras=head.loras,
+            num_images_per_prompt=head.num_images,
+            profile=head.profile,
+        )
+
+
+_scheduler: Optional[BatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> BatchScheduler:
+    """Return the process-wide batch scheduler, configured from the environment."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BatchScheduler(
+                max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "4")),
+                max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "50")),
+            )
+        return _scheduler
@@ -0,0 +1,480 @@
+"""
+Benchmark
+
+Reproducible latency/throughput benchmark for the generation path.
+
+Drives StableDiffusionGenerator directly ("generator" target) or the FastAPI
+endpoints through an in-process TestClient ("api" target) over a grid of
+models, image sizes, step counts and concurrency levels, and reports
+p50/p95/p99 latency, images/sec and peak RSS per scenario.
+
+With --stub (the default) tiny randomly initialized SD / SDXL pipelines are
+built on disk and the translator is replaced by a model-free stub, so the
+benchmark runs offline on CPU-only CI. Results are saved as JSON and two
+result files can be compared with --compare.
+
+Usage:
+    python benchmark.py --target generator --sizes 64,128 --steps 2,4 --concurrency 1,4
+    python benchmark.py --target api --requests 16 --output bench/head.json
+    python benchmark.py --compare bench/base.json bench/head.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 스텁 모델 토크나이저 어휘 (영문 소문자/숫자/일부 구두점 단위 BPE)
+_STUB_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789,.-'"
+
+BENCH_PROMPTS = [
+    "a cat sitting on a chair",
+    "a flat illustration of a classroom, pastel colors",
+    "a red bicycle leaning against a brick wall",
+    "teacher explaining a chart to students, simple shapes",
+    "창가에 앉아 책을 읽는 학생",  # 번역 경로 포함 (api 대상)
+    "노트북으로 온라인 강의를 듣는 사람",
+]
+
+
+@dataclass
+class Scenario:
+    """One point of the benchmark grid."""
+
+    target: str
+    kind: str
+    model: str
+    size: int
+    steps: int
+    concurrency: int
+    requests: int
+
+    @property
+    def key(self) -> str:
+        """Stable identifier used to match scenarios across result files."""
+        return f"{self.target}/{self.kind}/{self.model}/{self.size}px/{self.steps}steps/c{self.concurrency}"
+
+
+def build_stub_models(root: str) -> Dict[str, str]:
+    """Build tiny randomly initialized SD and SDXL pipelines under root (reused if present)."""
+    models = {"sd": os.path.join(root, "tiny-sd"), "sd-xl": os.path.join(root, "tiny-sd-xl")}
+    if all(os.path.exists(os.path.join(path, "model_index.json")) for path in models.values()):
+        return models
+
+    import torch
+    from diffusers import AutoencoderKL, DDIMScheduler, StableDiffusionPipeline, StableDiffusionXLPipeline, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel, CLIPTextModelWithProjection, CLIPTokenizer
+
+    print(f"🧪 스텁 모델 생성: {root}")
+    os.makedirs(root, exist_ok=True)
+    torch.manual_seed(0)
+
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1}
+    for char in _STUB_CHARS:
+        vocab.setdefault(char, len(vocab))
+        vocab.setdefault(char + "</w>", len(vocab))
+    vocab_path = os.path.join(root, "vocab.json")
+    merges_path = os.path.join(root, "merges.txt")
+    with open(vocab_path, "w") as f:
+        json.dump(vocab, f)
+    with open(merges_path, "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(vocab_path, merges_path, model_max_length=77)
+
+    def text_encoder(cls=CLIPTextModel):
+        config = CLIPTextConfig(
+            vocab_size=len(vocab), hidden_size=32, intermediate_size=37, num_attention_heads=4,
+            num_hidden_layers=2, max_position_embeddings=77, bos_token_id=0, eos_token_id=1,
+            pad_token_id=1, projection_dim=32,
+        )
+        return cls(config)
+
+    def vae():
+        return AutoencoderKL(
+            block_out_channels=[32, 64], in_channels=3, out_channels=3, latent_channels=4, sample_size=32,
+            down_block_types=["DownEncoderBlock2D"] * 2, up_block_types=["UpDecoderBlock2D"] * 2,
+        )
+
+    def scheduler():
+        return DDIMScheduler(
+            beta_start=0.00085, beta_end=0.012, beta_schedule="scaled_linear",
+            clip_sample=False, set_alpha_to_one=False,
+        )
+
+    blocks = {
+        "block_out_channels": (32, 64), "layers_per_block": 1, "sample_size": 32,
+        "in_channels": 4, "out_channels": 4, "norm_num_groups": 32,
+        "down_block_types": ("DownBlock2D", "CrossAttnDownBlock2D"),
+        "up_block_types": ("CrossAttnUpBlock2D", "UpBlock2D"),
+    }
+    StableDiffusionPipeline(
+        vae=vae(), text_encoder=text_encoder(), tokenizer=tokenizer,
+        unet=UNet2DConditionModel(cross_attention_dim=32, attention_head_dim=4, **blocks),
+        scheduler=scheduler(), safety_checker=None, feature_extractor=None, requires_safety_checker=False,
+    ).save_pretrained(models["sd"])
+    # SDXL: 두 인코더 hidden(32+32)=cross_attention_dim 64, pooled(32)+time ids(6*8)=80
+    StableDiffusionXLPipeline(
+        vae=vae(), text_encoder=text_encoder(), text_encoder_2=text_encoder(CLIPTextModelWithProjection),
+        tokenizer=tokenizer, tokenizer_2=tokenizer,
+        unet=UNet2DConditionModel(
+            cross_attention_dim=64, attention_head_dim=(2, 4), use_linear_projection=True,
+            addition_embed_type="text_time", addition_time_embed_dim=8,
+            transformer_layers_per_block=(1, 2), projection_class_embeddings_input_dim=80, **blocks,
+        ),
+        scheduler=scheduler(),
+    ).save_pretrained(models["sd-xl"])
+    return models
+
+
+def install_stub_translator(latency_ms: float = 0.0):
+    """Replace the process-wide translator with a model-free one that answers after a fixed delay."""
+    import translator
+    from metrics import TRANSLATION_SECONDS
+
+    class StubTranslator(translator.Translator):
+        """Translator with the real caching/batching but no model."""
+
+        def _ensure_loaded(self):
+            self.model = "stub"
+
+        def _translate_uncached(self, items: List[Tuple[str, str]]) -> List[str]:
+            with TRANSLATION_SECONDS.time(source_lang="stub"):
+                time.sleep(latency_ms / 1000.0)
+            self.batches += 1
+            # 스텁 토크나이저가 아는 문자만 남도록 고정된 영어 문장으로 대체
+            translations = [f"translated prompt {len(text)}" for text, _ in items]
+            for (text, _), translation in zip(items, translations):
+                self._cache_put(text, translation)
+            return translations
+
+    with translator._translator_lock:
+        translator._translator = StubTranslator()
+
+
+class RssSampler:
+    """Background sampler tracking the peak resident set size during a scenario."""
+
+    def __init__(self, interval: float = 0.05):
+        """Configure the sampling interval in seconds."""
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "RssSampler":
+        from metrics import current_rss_bytes
+
+        def sample():
+            while True:
+                self.peak = max(self.peak, current_rss_bytes())
+                if self._stop.wait(self.interval):
+                    return
+
+        self._thread = threading.Thread(target=sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(scenario: Scenario, call: Callable[[int], int], warmup: int = 1) -> Dict[str, Any]:
+    """Run one scenario. call(i) performs request i and returns the number of images produced."""
+    for i in range(warmup):
+        call(-1 - i)
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    images = 0
+    lock = threading.Lock()
+
+    def timed(i: int):
+        nonlocal images
+        start = time.perf_counter()
+        try:
+            produced = call(i)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            images += produced
+
+    with RssSampler() as rss:
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=scenario.concurrency, thread_name_prefix="bench") as pool:
+            list(pool.map(timed, range(scenario.requests)))
+        wall = time.perf_counter() - wall_start
+
+    result = asdict(scenario)
+    result.update({
+        "key": scenario.key,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_seconds": round(wall, 4),
+        "images": images,
+        "images_per_second": round(images / wall, 4) if wall else 0.0,
+        "latency_seconds": {
+            "mean": round(statistics.fmean(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "peak_rss_bytes": rss.peak,
+    })
+    return result
+
+
+def _prompt(i: int) -> str:
+    return BENCH_PROMPTS[i % len(BENCH_PROMPTS)]
+
+
+def _input_image(size: int):
+    from PIL import Image
+    return Image.new("RGB", (size, size), (200, 120, 80))
+
+
+def generator_call(scenario: Scenario, model_path: str, seed: int) -> Callable[[int], int]:
+    """Call StableDiffusionGenerator directly (no scheduler, service or HTTP layers)."""
+    from generation_service import negative_prompt_for, positive_suffix
+    from model_registry import get_registry
+
+    generator = get_registry().get(model_path)
+    suffix, negative = positive_suffix(), negative_prompt_for()
+    image = _input_image(scenario.size)
+
+    def call(i: int) -> int:
+        if scenario.kind == "text-to-image":
+            generator.generate_text_to_image(
+                _prompt(i), None, height=scenario.size, width=scenario.size,
+                num_inference_steps=scenario.steps, negative_prompt=negative,
+                seed=seed + i, prompt_suffix=suffix,
+            )
+        else:
+            generator.generate_image_to_image(
+                _prompt(i), image, None, strength=0.5, num_inference_steps=scenario.steps,
+                negative_prompt=negative, seed=seed + i, prompt_suffix=suffix,
+            )
+        return 1
+
+    return call
+
+
+def api_call(scenario: Scenario, model_path: str, seed: int, client) -> Callable[[int], int]:
+    """Call the FastAPI endpoints through an in-process client."""
+    buffer = io.BytesIO()
+    _input_image(scenario.size).save(buffer, format="PNG")
+    upload = buffer.getvalue()
+
+    def call(i: int) -> int:
+        # 요청마다 다른 시드: 결정적이면서 결과 캐시에는 걸리지 않음
+        if scenario.kind == "text-to-image":
+            response = client.post("/generate/text-to-image", json={
+                "prompt": _prompt(i), "model_id": model_path, "height": scenario.size, "width": scenario.size,
+                "num_inference_steps": scenario.steps, "use_translation": True, "seed": seed + i,
+            })
+        else:
+            response = client.post(
+                "/generate/image-to-image",
+                files={"image": ("input.png", upload, "image/png")},
+                data={
+                    "prompt": _prompt(i), "model_id": model_path, "strength": "0.5",
+                    "num_inference_steps": str(scenario.steps), "seed": str(seed + i),
+                },
+            )
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return len(response.json()["image_paths"])
+
+    return call
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> Dict[str, Any]:
+    import diffusers
+    import torch
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "diffusers": diffusers.__version__,
+        "cuda": torch.cuda.is_available(),
+    }
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _strs(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Prepare the environment, run every scenario of the grid and return the results."""
+    workdir = args.workdir or tempfile.mkdtemp(prefix="img-gen-bench-")
+    # 서비스 설정은 import 시점에 읽히므로 모듈을 불러오기 전에 지정
+    os.environ.setdefault("OUTPUT_DIR", os.path.join(workdir, "outputs"))
+    os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(workdir, "results"))
+    # 반복 시드가 캐시에 걸리면 생성 경로가 측정되지 않음
+    os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+    os.environ.setdefault("WARMUP_MODE", "off")
+    os.environ["SERVING_MODE"] = "single"
+    if args.stub:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    if args.stub:
+        stub_models = build_stub_models(args.stub_dir or os.path.join(workdir, "models"))
+        models = {name: stub_models.get(name, name) for name in args.models}
+        install_stub_translator(args.translation_latency_ms)
+    else:
+        models = {name: name for name in args.models}
+
+    client = None
+    if args.target == "api":
+        from fastapi.testclient import TestClient
+        import main
+        client = TestClient(main.app)
+        client.__enter__()
+
+    scenarios = [
+        Scenario(args.target, kind, model, size, steps, concurrency, args.requests)
+        for kind in args.kinds
+        for model in args.models
+        for size in args.sizes
+        for steps in args.steps
+        for concurrency in args.concurrency
+    ]
+    results = []
+    try:
+        for scenario in scenarios:
+            model_path = models[scenario.model]
+            if client is not None:
+                call = api_call(scenario, model_path, args.seed, client)
+            else:
+                call = generator_call(scenario, model_path, args.seed)
+            print(f"⏱️  {scenario.key} ({scenario.requests} requests)")
+            result = run_scenario(scenario, call, args.warmup)
+            latency = result["latency_seconds"]
+            print(
+                f"   p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s  "
+                f"{result['images_per_second']:.2f} img/s  peak RSS {result['peak_rss_bytes'] / 1024 ** 2:.0f} MB"
+                + (f"  ⚠️ {result['errors']} errors" if result["errors"] else "")
+            )
+            results.append(result)
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    return {"environment": _environment(), "config": config, "scenarios": results}
+
+
+def compare(base_path: str, head_path: str, threshold: float = 0.1) -> int:
+    """Print per-scenario changes between two result files. Returns 1 if any p50/p95 regressed past threshold."""
+    with open(base_path) as f:
+        base = {s["key"]: s for s in json.load(f)["scenarios"]}
+    with open(head_path) as f:
+        head = {s["key"]: s for s in json.load(f)["scenarios"]}
+
+    regressed = False
+    for key, new in head.items():
+        old = base.get(key)
+        if old is None:
+            print(f"🆕 {key}")
+            continue
+        changes = []
+        for metric in ("p50", "p95", "p99"):
+            before, after = old["latency_seconds"][metric], new["latency_seconds"][metric]
+            delta = (after - before) / before if before else 0.0
+            if metric != "p99" and delta > threshold:
+                regressed = True
+            changes.append(f"{metric} {before:.3f}→{after:.3f}s ({delta:+.0%})")
+        before, after = old["images_per_second"], new["images_per_second"]
+        changes.append(f"img/s {before:.2f}→{after:.2f}")
+        before, after = old["peak_rss_bytes"], new["peak_rss_bytes"]
+        changes.append(f"RSS {before / 1024 ** 2:.0f}→{after / 1024 ** 2:.0f} MB")
+        print(f"{key}: " + ", ".join(changes))
+    if regressed:
+        print(f"⚠️  p50/p95 latency regressed by more than {threshold:.0%}")
+    return 1 if regressed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the image generation path")
+    parser.add_argument("--target", choices=("generator", "api"), default="generator")
+    parser.add_argument("--kinds", type=_strs, default=["text-to-image"], help="text-to-image,image-to-image")
+    parser.add_argument("--models", type=_strs, default=["sd"], help="model ids (with --stub: sd, sd-xl; SDXL always renders at >=1024px)")
+    parser.add_argument("--sizes", type=_ints, default=[64])
+    parser.add_argument("--steps", type=_ints, default=[4])
+    parser.add_argument("--concurrency", type=_ints, default=[1, 4])
+    parser.add_argument("--requests", type=int, default=8, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests before each scenario")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--stub", action=argparse.BooleanOptionalAction, default=True,
+                        help="use tiny random pipelines and a stub translator (offline, CPU)")
+    parser.add_argument("--stub-dir", help="where stub models are built (reused between runs)")
+    parser.add_argument("--translation-latency-ms", type=float, default=0.0, help="stub translator delay")
+    parser.add_argument("--workdir", help="outputs/cache directory (default: a temp dir)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold for --compare")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare, threshold=args.threshold)
+
+    results = run_benchmark(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Bulk Manifest
+
+Manifest parsing and resume bookkeeping for the bulk runner.
+
+Kept free of torch/diffusers imports so manifests can be validated and
+results inspected on machines without the inference stack.
+"""
+
+import csv
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from prompt_catalog import get_catalog
+from speed_profiles import resolve as resolve_profile
+
+KINDS = ("text-to-image", "image-to-image")
+
+# 매니페스트 필드 -> 변환 함수 (CSV 값은 모두 문자열)
+_FIELD_TYPES = {
+    "height": int,
+    "width": int,
+    "num_inference_steps": int,
+    "guidance_scale": float,
+    "strength": float,
+    "seed": int,
+    "num_images": int,
+}
+
+
+@dataclass
+class BulkEntry:
+    """One manifest row."""
+
+    id: str
+    prompt: str
+    kind: str = "text-to-image"
+    model_id: str = "stabilityai/stable-diffusion-xl-base-1.0"
+    input_image: Optional[str] = None
+    height: int = 512
+    width: int = 512
+    num_inference_steps: Optional[int] = None  # 기본값: 프로필 값 또는 20
+    guidance_scale: Optional[float] = None  # 기본값: 프로필 값 또는 API와 동일 (text 12.0, image 3.0)
+    strength: float = 0.15
+    seed: Optional[int] = None
+    num_images: int = 1
+    loras: Optional[str] = None  # 비어 있으면 모델 기본 LoRA, "none"이면 LoRA 없이
+    use_translation: bool = True
+    profile: Optional[str] = None  # 속도 프로필 (None이면 SPEED_PROFILE_DEFAULT)
+    style: Optional[str] = None  # 프롬프트 카탈로그 스타일
+    tone: Optional[str] = None  # 프롬프트 카탈로그 분위기
+    translated_prompt: Optional[str] = field(default=None, repr=False)
+
+
+def _entry_id(entry: BulkEntry, input_image: Optional[str]) -> str:
+    """Stable id from the resolved entry, so resuming survives reordered manifests.
+
+    Hashing the resolved fields (CLI defaults and profile steps/guidance
+    applied) means changing a default re-generates the entry instead of
+    skipping it as done. input_image is the manifest's own (relative) path.
+    """
+    fields = asdict(entry)
+    for name in ("id", "translated_prompt"):
+        fields.pop(name)
+    fields["input_image"] = input_image
+    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def _parse_row(row: Dict[str, Any], defaults: Dict[str, Any], base_dir: str, default_steps: int) -> BulkEntry:
+    values = {k: v for k, v in row.items() if k and v not in (None, "")}
+    if not values.get("prompt"):
+        raise ValueError("missing prompt")
+    entry_id = str(values.pop("id", ""))
+    for name, convert in _FIELD_TYPES.items():
+        if name in values:
+            values[name] = convert(values[name])
+    if "use_translation" in values and isinstance(values["use_translation"], str):
+        values["use_translation"] = values["use_translation"].strip().lower() in ("1", "true", "yes")
+    if isinstance(values.get("loras"), list):
+        # JSONL: [{"name": ..., "scale": ...}] 또는 ["name", ...]
+        values["loras"] = ",".join(
+            f"{l['name']}:{l.get('scale', 1.0)}" if isinstance(l, dict) else str(l) for l in values["loras"]
+        ) or "none"
+    known = set(BulkEntry.__dataclass_fields__) - {"id", "translated_prompt"}
+    entry = BulkEntry(id=entry_id, **{**defaults, **{k: v for k, v in values.items() if k in known}})
+    if entry.kind not in KINDS:
+        raise ValueError(f"unknown kind: {entry.kind}")
+    input_image = entry.input_image
+    if entry.kind == "image-to-image":
+        if not entry.input_image:
+            raise ValueError("image-to-image entry without input_image")
+        entry.input_image = os.path.join(base_dir, entry.input_image)
+    get_catalog().validate(style=entry.style, tone=entry.tone)
+    # 프로필 기본값을 적용해 스텝/가이던스를 확정 (그룹 키와 기록에 사용)
+    is_image = entry.kind == "image-to-image"
+    entry.profile, entry.num_inference_steps, entry.guidance_scale = resolve_profile(
+        entry.profile,
+        entry.model_id,
+        entry.num_inference_steps,
+        entry.guidance_scale,
+        entry.strength if is_image else None,
+        default_steps=default_steps,
+        default_guidance=3.0 if is_image else 12.0
+    )
+    if not entry.id:
+        entry.id = _entry_id(entry, input_image)
+    return entry
+
+
+def read_manifest(
+    path: str,
+    defaults: Optional[Dict[str, Any]] = None,
+    default_steps: int = 20
+) -> List[BulkEntry]:
+    """Parse a .jsonl or .csv manifest. Raises ValueError naming the bad line.
+
+    default_steps applies to entries whose steps neither the row, the
+    defaults nor the profile set (the runner passes the CPU-aware default).
+    """
+    defaults = defaults or {}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows: Iterator[Tuple[int, Dict[str, Any]]] = enumerate(csv.DictReader(f), start=2)
+        else:
+            rows = ((n, json.loads(line)) for n, line in enumerate(f, start=1) if line.strip())
+        entries: List[BulkEntry] = []
+        seen = set()
+        for line_no, row in rows:
+            try:
+                entry = _parse_row(row, defaults, base_dir, default_steps)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from e
+            if entry.id in seen:
+                # 같은 항목이 여러 번 있으면 한 번만 생성
+                continue
+            seen.add(entry.id)
+            entries.append(entry)
+    return entries
+
+
+def read_completed(results_path: str, output_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Records of entries finished in earlier runs (whose images still exist)."""
+    completed: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(results_path):
+        return completed
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 중단된 마지막 줄
+            if record.get("status") != "ok":
+                completed.pop(record.get("id"), None)
+                continue
+            if all(os.path.exists(os.path.join(output_dir, p)) for p in record.get("images", [])):
+                completed[record["id"]] = record
+    return completed
+
+
+class ResultsWriter:
+    """Append-only results manifest, flushed to disk after every record."""
+
+    def __init__(self, path: str):
+        """Open the manifest for appending."""
+        self._file = open(path, "a+", encoding="utf-8")
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                # 중단으로 잘린 마지막 줄을 끝내고 새 기록은 다음 줄부터
+                self._file.write("\n")
+
+    def write(self, record: Dict[str, Any]):
+        """Append one record durably."""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """Close the manifest."""
+        self._file.close()
@@ -0,0 +1,317 @@
+"""
+Bulk Runner
+
+Offline batch generation for prompt catalogs.
+
+Reads a JSONL or CSV manifest, translates every pending prompt in batches,
+groups entries by model, kind and shape so each model is loaded once and
+compatible prompts share batched pipeline calls, and writes images plus a
+results manifest incrementally (image encoding overlaps the next batch's
+inference). Entries already recorded as done in the results manifest are
+skipped, so an interrupted run resumes where it stopped.
+
+Manifest fields (only prompt is required):
+    id, prompt, kind (text-to-image / image-to-image), model_id, input_image,
+    height, width, num_inference_steps, guidance_scale, strength, seed,
+    num_images, loras ("name[:scale],..." or "none"), use_translation,
+    profile (quality / balanced / fast; unset steps/guidance take its defaults),
+    style, tone (prompt catalog names, see GET /elearning-options)
+
+Usage:
+    python bulk_runner.py catalog.jsonl --output-dir out/catalog
+    python bulk_runner.py catalog.csv --output-dir out/catalog --batch-size 8 --format webp
+    python bulk_runner.py catalog.jsonl --output-dir out/catalog --profile fast
+    python bulk_runner.py catalog.jsonl --output-dir out/catalog --dry-run
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from bulk_manifest import KINDS, BulkEntry, ResultsWriter, read_completed, read_manifest
+from cpu_optimization import default_num_steps
+from image_encoding import encode_image, get_encode_executor, validate_format
+from image_generator import create_generator, output_size
+from image_ingest import ingest_image
+from lora_adapters import LoraSelection, parse_loras, resolve_lora
+from memory_planner import get_planner, memory_planning_enabled
+from generation_service import negative_prompt_for, positive_suffix, variant_seeds
+from prompt_embeddings import prompt_chunks
+from speed_profiles import PROFILES
+from translator import get_translator
+
+
+def entry_shape(entry: BulkEntry) -> Tuple[int, int]:
+    """(height, width) the pipeline renders at (input size for img2img)."""
+    if entry.kind == "image-to-image":
+        with Image.open(entry.input_image) as image:
+            return image.height, image.width
+    return output_size(entry.model_id, entry.height, entry.width)
+
+
+def group_key(entry: BulkEntry) -> Tuple[Any, ...]:
+    """Entries with the same key share batched pipeline calls."""
+    return (
+        entry.model_id,
+        entry.kind,
+        entry_shape(entry),
+        entry.profile,
+        entry.style,
+        entry.tone,
+        entry.num_inference_steps,
+        entry.guidance_scale,
+        entry.strength if entry.kind == "image-to-image" else None,
+        entry.loras or "",
+        entry.num_images,
+        # 패딩 길이가 배치 구성에 따라 달라지지 않도록 청크 수가 같은 프롬프트끼리 묶음
+        prompt_chunks(entry.model_id, entry.translated_prompt or entry.prompt),
+    )
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BulkRunner:
+    """Runs a manifest through batched generation with incremental, resumable output."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        batch_size: int = 4,
+        output_format: str = "png",
+        quality: int = 90,
+        translate: bool = True,
+        translation_batch: int = 64
+    ):
+        """Configure output location, batching and encoding."""
+        self.output_dir = output_dir
+        self.image_dir = os.path.join(output_dir, "images")
+        self.results_path = os.path.join(output_dir, "results.jsonl")
+        self.batch_size = max(1, batch_size)
+        self.output_format = validate_format(output_format)
+        self.quality = quality
+        self.translate = translate
+        self.translation_batch = max(1, translation_batch)
+        self.stats = {"entries": 0, "skipped": 0, "done": 0, "failed": 0, "images": 0, "pipeline_calls": 0}
+        self._pending: List[Tuple[BulkEntry, Dict[str, Any], List[Future]]] = []
+
+    def plan(self, entries: List[BulkEntry]) -> List[Tuple[Tuple[Any, ...], List[BulkEntry]]]:
+        """Group entries by shape, ordered so each model (then kind and size) is visited once."""
+        groups: Dict[Tuple[Any, ...], List[BulkEntry]] = {}
+        for entry in entries:
+            groups.setdefault(group_key(entry), []).append(entry)
+        return sorted(groups.items(), key=lambda item: tuple(str(part) for part in item[0]))
+
+    def run(self, entries: List[BulkEntry]) -> Dict[str, Any]:
+        """Generate every entry not already completed; returns run statistics."""
+        os.makedirs(self.image_dir, exist_ok=True)
+        completed = read_completed(self.results_path, self.output_dir)
+        todo = [entry for entry in entries if entry.id not in completed]
+        self.stats.update(entries=len(entries), skipped=len(entries) - len(todo))
+        print(f"📋 {len(entries)} entries, {len(todo)} to generate ({self.stats['skipped']} already done)")
+        if not todo:
+            return self.stats
+
+        started = time.perf_counter()
+        self._translate(todo)
+        writer = ResultsWriter(self.results_path)
+        try:
+            for key, group in self.plan(todo):
+                model_id, kind, (height, width) = key[0], key[1], key[2]
+                per_call = self._images_per_call(model_id, height, width, group[0].guidance_scale)
+                step = max(1, per_call // group[0].num_images)
+                print(f"📦 {model_id} {kind} {width}x{height}: {len(group)} entries, {step} per call")
+                for start in range(0, len(group), step):
+                    chunk = group[start:start + step]
+                    self._run_chunk(chunk, writer)
+        finally:
+            # 중단되어도 이미 생성된 이미지는 기록해 재개 시 건너뜀
+            self._finish_pending(writer)
+            writer.close()
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["images_per_second"] = round(self.stats["images"] / elapsed, 3) if elapsed else 0.0
+        return self.stats
+
+    def _translate(self, entries: List[BulkEntry]):
+        pending = [e for e in entries if self.translate and e.use_translation]
+        for entry in entries:
+            entry.translated_prompt = entry.prompt
+        if not pending:
+            return
+        translator = get_translator()
+        for start in range(0, len(pending), self.translation_batch):
+            chunk = pending[start:start + self.translation_batch]
+            for entry, translated in zip(chunk, translator.translate_batch([e.prompt for e in chunk])):
+                entry.translated_prompt = translated
+            print(f"🌐 번역 {min(start + len(chunk), len(pending))}/{len(pending)}")
+
+    def _images_per_call(self, model_id: str, height: int, width: int, guidance_scale: float) -> int:
+        if not memory_planning_enabled():
+            return self.batch_size
+        return get_planner(model_id).max_batch_size(height, width, self.batch_size, guidance=guidance_scale > 1)
+
+    def _run_chunk(self, chunk: List[BulkEntry], writer: ResultsWriter):
+        head = chunk[0]
+        started = time.perf_counter()
+        try:
+            seeds = []
+            for entry in chunk:
+                # 시드가 없으면 무작위로 정해 기록 (결과 재현 가능)
+                if entry.seed is None:
+                    entry.seed = random.randint(0, 2 ** 31 - 1)
+                seeds.extend(variant_seeds(entry.num_images, entry.seed))
+            loras = self._loras(head.loras)
+            generator = create_generator(head.model_id)
+            common = dict(
+                num_inference_steps=head.num_inference_steps,
+                guidance_scale=head.guidance_scale,
+                negative_prompt=negative_prompt_for(head.style),
+                seeds=seeds,
+                prompt_suffix=positive_suffix(head.style, head.tone),
+                loras=loras,
+                num_images_per_prompt=head.num_images,
+                profile=head.profile,
+            )
+            prompts = [entry.translated_prompt for entry in chunk]
+            if head.kind == "image-to-image":
+                inputs = []
+                for entry in chunk:
+                    with open(entry.input_image, "rb") as f:
+                        inputs.append(ingest_image(f.read(), entry.model_id))
+                images = generator.generate_image_to_image_batch(prompts, inputs, strength=head.strength, **common)
+            else:
+                images = generator.generate_text_to_image_batch(prompts, height=head.height, width=head.width, **common)
+        except Exception as e:
+            print(f"❌ Batch failed ({len(chunk)} entries): {e}")
+            for entry in chunk:
+                writer.write({"id": entry.id, "status": "error", "error": str(e), "prompt": entry.prompt})
+            self.stats["failed"] += len(chunk)
+            return
+
+        self.stats["pipeline_calls"] += 1
+        seconds = round((time.perf_counter() - started) / len(chunk), 3)
+        # 이전 배치의 인코딩을 마무리하고 이번 배치 인코딩은 다음 추론과 겹쳐 실행
+        self._finish_pending(writer)
+        executor = get_encode_executor()
+        n = head.num_images
+        for i, entry in enumerate(chunk):
+            record = {
+                "id": entry.id,
+                "status": "ok",
+                "kind": entry.kind,
+                "model_id": entry.model_id,
+                "prompt": entry.prompt,
+                "translated_prompt": entry.translated_prompt,
+                "seeds": seeds[i * n:(i + 1) * n],
+                "seconds": seconds,
+            }
+            futures = [
+                executor.submit(encode_image, image, self.output_format, self.quality)
+                for image in images[i * n:(i + 1) * n]
+            ]
+            self._pending.append((entry, record, futures))
+
+    def _finish_pending(self, writer: ResultsWriter):
+        pending, self._pending = self._pending, []
+        for entry, record, futures in pending:
+            paths = []
+            for j, future in enumerate(futures):
+                data, extension = future.result()
+                name = f"{entry.id}.{extension}" if len(futures) == 1 else f"{entry.id}_{j + 1}.{extension}"
+                _write_atomic(os.path.join(self.image_dir, name), data)
+                paths.append(os.path.join("images", name))
+            record["images"] = paths
+            writer.write(record)
+            self.stats["done"] += 1
+            self.stats["images"] += len(paths)
+
+    @staticmethod
+    def _loras(spec: Optional[str]) -> Optional[List[LoraSelection]]:
+        """Manifest loras field: empty = model default, "none" = no LoRA."""
+        if not spec:
+            return None
+        if spec.strip().lower() == "none":
+            return []
+        return [(resolve_lora(name), scale) for name, scale in parse_loras(spec)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Generate a prompt catalog in batches (resumable)")
+    parser.add_argument("manifest", help="prompts as .jsonl or .csv")
+    parser.add_argument("--output-dir", required=True, help="images/ and results.jsonl are written here")
+    parser.add_argument("--model", default="stabilityai/stable-diffusion-xl-base-1.0", help="default model_id")
+    parser.add_argument("--kind", choices=KINDS, default="text-to-image", help="default kind")
+    parser.add_argument("--height", type=int, default=512)
+    parser.add_argument("--width", type=int, default=512)
+    parser.add_argument("--steps", type=int, help="default num_inference_steps (else the profile's, or 20)")
+    parser.add_argument("--profile", choices=PROFILES, help="default speed profile (else SPEED_PROFILE_DEFAULT)")
+    parser.add_argument("--style", help="default prompt catalog style")
+    parser.add_argument("--tone", help="default prompt catalog tone")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_MAX_SIZE", "4")),
+                        help="images per pipeline call (capped by the memory planner)")
+    parser.add_argument("--format", default="png", help="png, jpeg, webp, avif")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--translate", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--translation-batch", type=int, default=64, help="prompts per translate_batch call")
+    parser.add_argument("--limit", type=int, help="only the first N manifest entries")
+    parser.add_argument("--dry-run", action="store_true", help="print the batching plan and exit")
+    args = parser.parse_args(argv)
+
+    defaults = {
+        "model_id": args.model,
+        "kind": args.kind,
+        "height": args.height,
+        "width": args.width,
+        "num_inference_steps": args.steps,
+        "profile": args.profile,
+        "style": args.style,
+        "tone": args.tone,
+    }
+    try:
+        entries = read_manifest(args.manifest, defaults, default_steps=default_num_steps(20))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    if args.limit is not None:
+        entries = entries[:args.limit]
+
+    runner = BulkRunner(
+        args.output_dir,
+        batch_size=args.batch_size,
+        output_format=args.format,
+        quality=args.quality,
+        translate=args.translate,
+        translation_batch=args.translation_batch,
+    )
+    if args.dry_run:
+        completed = read_completed(runner.results_path, args.output_dir)
+        todo = [entry for entry in entries if entry.id not in completed]
+        for key, group in runner.plan(todo):
+            print(json.dumps({"group": [str(part) for part in key], "entries": [e.id for e in group]}, ensure_ascii=False))
+        print(f"{len(todo)} of {len(entries)} entries to generate")
+        return 0
+
+    try:
+        stats = runner.run(entries)
+    except KeyboardInterrupt:
+        print("⏸️  중단됨 - 같은 명령으로 다시 실행하면 이어서 생성합니다")
+        return 130
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
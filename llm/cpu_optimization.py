@@ -0,0 +1,143 @@
+"""
+CPU Optimization
+
+Opt-in tuning for running the diffusion pipelines on CPU-only nodes.
+
+When enabled, pipelines are loaded in bfloat16 (or get dynamic int8
+quantization of their Linear layers), use channels-last memory format,
+attention slicing and VAE tiling to cut peak memory, an optionally
+torch.compile'd UNet, and a DPM-Solver scheduler that needs fewer steps.
+
+int8 quantization replaces the Linear layers LoRA adapters are injected
+into and fused with, so int8 pipelines keep the adapter they were loaded
+with: per-request LoRAs (and LCM-LoRA speed profiles) are rejected.
+"""
+
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+import torch
+from diffusers import DPMSolverMultistepScheduler, EulerAncestralDiscreteScheduler
+
+# 스케줄러 이름 -> 클래스 ("default"는 모델 기본값 유지)
+SCHEDULERS = {
+    "dpm": DPMSolverMultistepScheduler,
+    "euler_a": EulerAncestralDiscreteScheduler,
+}
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+@dataclass
+class CpuOptimizationConfig:
+    """CPU tuning switches, read from the environment."""
+
+    enabled: bool = False
+    precision: str = "bfloat16"  # bfloat16, int8, float32
+    channels_last: bool = True
+    attention_slicing: bool = True
+    vae_tiling: bool = True
+    num_threads: Optional[int] = None
+    torch_compile: bool = False
+    scheduler: str = "dpm"
+    num_steps: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "CpuOptimizationConfig":
+        """Build the config from CPU_* environment variables."""
+        threads = os.getenv("CPU_NUM_THREADS")
+        steps = os.getenv("CPU_NUM_STEPS")
+        return cls(
+            enabled=_env_bool("CPU_OPTIMIZE", False),
+            precision=os.getenv("CPU_PRECISION", "bfloat16").lower(),
+            channels_last=_env_bool("CPU_CHANNELS_LAST", True),
+            attention_slicing=_env_bool("CPU_ATTENTION_SLICING", True),
+            vae_tiling=_env_bool("CPU_VAE_TILING", True),
+            num_threads=int(threads) if threads else None,
+            torch_compile=_env_bool("CPU_TORCH_COMPILE", False),
+            scheduler=os.getenv("CPU_SCHEDULER", "dpm").lower(),
+            num_steps=int(steps) if steps else None,
+        )
+
+    @property
+    def torch_dtype(self) -> torch.dtype:
+        """Weight dtype to load pipelines with."""
+        return torch.bfloat16 if self.enabled and self.precision == "bfloat16" else torch.float32
+
+
+_config: Optional[CpuOptimizationConfig] = None
+_config_lock = threading.Lock()
+
+
+def get_cpu_config() -> CpuOptimizationConfig:
+    """Return the process-wide CPU config, applying thread settings on first use."""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = CpuOptimizationConfig.from_env()
+            if _config.enabled and _config.num_threads:
+                # 워커 프로세스마다 코어를 나눠 쓰도록 intra-op 스레드 수 제한
+                torch.set_num_threads(_config.num_threads)
+        return _config
+
+
+def default_num_steps(fallback: int) -> int:
+    """Steps for requests that don't set them: CPU_NUM_STEPS on optimized CPU nodes, else fallback."""
+    config = get_cpu_config()
+    if config.enabled and config.num_steps and not torch.cuda.is_available():
+        return config.num_steps
+    return fallback
+
+
+def runtime_loras_supported(config: Optional[CpuOptimizationConfig] = None) -> bool:
+    """Whether CPU pipelines can load or switch LoRA adapters after loading (not with int8)."""
+    config = config or get_cpu_config()
+    return not (config.enabled and config.precision == "int8")
+
+
+def optimize_pipeline(pipe, config: CpuOptimizationConfig):
+    """Apply the configured CPU optimizations to a freshly loaded pipeline."""
+    if not config.enabled:
+        return pipe
+
+    if config.scheduler in SCHEDULERS:
+        pipe.scheduler = SCHEDULERS[config.scheduler].from_config(pipe.scheduler.config)
+
+    if config.attention_slicing:
+        pipe.enable_attention_slicing()
+    if config.vae_tiling and hasattr(pipe, "enable_vae_tiling"):
+        pipe.enable_vae_tiling()
+
+    if config.channels_last:
+        pipe.unet.to(memory_format=torch.channels_last)
+        pipe.vae.to(memory_format=torch.channels_last)
+
+    if config.precision == "int8":
+        # Linear 레이어만 동적 int8 양자화 (가중치는 int8, 활성값은 실행 시 양자화)
+        for name in ("unet", "text_encoder", "text_encoder_2"):
+            module = getattr(pipe, name, None)
+            if module is not None:
+                torch.ao.quantization.quantize_dynamic(
+                    module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+
+    if config.torch_compile:
+        try:
+            pipe.unet = torch.compile(pipe.unet)
+        except Exception as e:
+            print(f"⚠️  torch.compile failed, using eager UNet: {e}")
+
+    print(f"⚙️  CPU optimizations applied: {describe(config)}")
+    return pipe
+
+
+def describe(config: Optional[CpuOptimizationConfig] = None) -> Dict[str, Any]:
+    """Active CPU settings, for /models."""
+    config = config or get_cpu_config()
+    info = asdict(config)
+    info["torch_threads"] = torch.get_num_threads()
+    return info
@@ -0,0 +1,413 @@
+"""
+Generation Service
+
+Blocking generation workflow shared by the HTTP handlers and the job workers:
+prompt translation, prompt assembly and submission to the batch scheduler.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from batch_scheduler import get_scheduler
+from image_generator import StepCallback, output_size
+from lora_adapters import LoraSelection
+from result_cache import get_result_cache, hash_image, make_cache_key
+from output_store import get_output_store
+from image_encoding import encode_image, encode_thumbnail, get_encode_executor, validate_format
+from translator import get_translator, translate_text
+from model_registry import get_registry
+from prompt_catalog import get_catalog
+from metrics import ERRORS, GENERATION_SECONDS, GENERATIONS, current_rss_bytes, register_collector
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is cancelled before it completes."""
+
+
+def prepare_prompt(prompt: str, use_translation: bool) -> str:
+    """Translate the prompt if requested."""
+    if use_translation:
+        prompt = translate_text(prompt)
+        print(f"🌐 번역된 프롬프트: {prompt}")
+    return prompt
+
+
+def positive_suffix(style: Optional[str] = None, tone: Optional[str] = None) -> str:
+    """Suffix appended to every prompt: catalog style/tone and common terms (encoded once per model by the generator)."""
+    return " and " + get_catalog().compose(style=style, tone=tone).positive
+
+
+def negative_prompt_for(style: Optional[str] = None) -> str:
+    """Deduplicated, token-budgeted negative prompt for a catalog style (None = common terms only)."""
+    return get_catalog().compose(style=style).negative
+
+
+def wait_for_result(
+    future: Future,
+    cancel_event: Optional[threading.Event] = None,
+    siblings: Sequence[Future] = ()
+):
+    """Block until the scheduler future resolves, honouring cancellation.
+
+    On cancellation, siblings (the other chunks of the same request) are
+    cancelled as well, so queued chunks never reach the generator.
+    """
+    while True:
+        try:
+            return future.result(timeout=0.1)
+        except FutureTimeoutError:
+            if cancel_event is not None and cancel_event.is_set():
+                # 아직 배치에 들어가지 않은 요청만 취소 가능
+                for sibling in siblings:
+                    sibling.cancel()
+                if future.cancel():
+                    raise GenerationCancelled()
+
+
+@contextmanager
+def _observe_generation(model_id: str, kind: str, num_images: int = 1):
+    """Record end-to-end generation latency, generated image count and failures."""
+    start = time.perf_counter()
+    try:
+        yield
+    except GenerationCancelled:
+        raise
+    except Exception:
+        ERRORS.inc(stage="generation", model=model_id, kind=kind)
+        raise
+    GENERATION_SECONDS.observe(time.perf_counter() - start, model=model_id, kind=kind)
+    GENERATIONS.inc(num_images, model=model_id, kind=kind)
+
+
+def max_images_per_request() -> int:
+    """Largest num_images a single request may ask for."""
+    return int(os.getenv("MAX_IMAGES_PER_REQUEST", "8"))
+
+
+def variant_seeds(
+    num_images: int = 1,
+    seed: Optional[int] = None,
+    seeds: Optional[List[int]] = None
+) -> List[Optional[int]]:
+    """Seed per output image: explicit seeds, else seed, seed + 1, ... (None = random).
+
+    Raises ValueError for counts outside 1..MAX_IMAGES_PER_REQUEST or when
+    seeds and num_images disagree.
+    """
+    if seeds:
+        if num_images not in (1, len(seeds)):
+            raise ValueError(f"seeds has {len(seeds)} entries but num_images is {num_images}")
+        num_images = len(seeds)
+    if not 1 <= num_images <= max_images_per_request():
+        raise ValueError(f"num_images must be between 1 and {max_images_per_request()}")
+    if seeds:
+        return list(seeds)
+    return [seed + i if seed is not None else None for i in range(num_images)]
+
+
+def _cached_or_generate(
+    submit: Callable[[List[Optional[int]]], Future],
+    cache_inputs: Dict[str, Any],
+    seeds: List[Optional[int]],
+    chunk_size: int,
+    cancel_event: Optional[threading.Event],
+    expected_size: Tuple[int, int]
+) -> List[Image.Image]:
+    """Serve seeded images from the result cache, generate the rest in batched chunks and cache them.
+
+    Only images rendered at expected_size (width, height) are cached; a
+    memory-planner downgrade depends on what else is resident at the time,
+    so a smaller result must not be served for later identical requests.
+    """
+    # 시드가 지정된 이미지만 결과가 결정적이므로 캐시 대상
+    cache = get_result_cache()
+    keys = [
+        make_cache_key(**cache_inputs, seed=seed) if cache is not None and seed is not None else None
+        for seed in seeds
+    ]
+    images: List[Optional[Image.Image]] = [None] * len(seeds)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            print(f"⚡ 캐시된 결과 사용: {key[:12]}")
+            images[i] = cached
+        else:
+            missing.append(i)
+
+    # 호출당 이미지 한도(배치 크기, 메모리 예산)를 넘는 변형은 여러 요청으로 나눠 제출
+    chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+    futures = [(chunk, submit([seeds[i] for i in chunk])) for chunk in chunks]
+    pending = [future for _, future in futures]
+    try:
+        for chunk, future in futures:
+            for i, image in zip(chunk, wait_for_result(future, cancel_event, pending)):
+                images[i] = image
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled()
+    finally:
+        # 취소나 오류로 빠져나가면 남은 청크가 추론되지 않도록 (완료된 future에는 영향 없음)
+        for future in pending:
+            future.cancel()
+    for key, i in zip([keys[i] for i in missing], missing):
+        if key is None:
+            continue
+        if images[i].size != expected_size:
+            print(f"ℹ️  축소된 결과는 캐시하지 않음: {images[i].size} != {expected_size}")
+            continue
+        cache.put(key, images[i])
+    return images
+
+
+def generate_text_to_image(
+    prompt: str,
+    model_id: str,
+    height: int = 512,
+    width: int = 512,
+    guidance_scale: float = 12.0,
+    num_inference_steps: int = 20,
+    use_translation: bool = True,
+    seed: Optional[int] = None,
+    cancel_event: Optional[threading.Event] = None,
+    step_callback: Optional[StepCallback] = None,
+    loras: Optional[List[LoraSelection]] = None,
+    num_images: int = 1,
+    seeds: Optional[List[int]] = None,
+    profile: Optional[str] = None,
+    style: Optional[str] = None,
+    tone: Optional[str] = None
+) -> List[Image.Image]:
+    """Generate num_images variants from text (seeds as in variant_seeds; style/tone from the prompt catalog)."""
+    image_seeds = variant_seeds(num_images, seed, seeds)
+    final_prompt = prepare_prompt(prompt, use_translation)
+    prompt_suffix = positive_suffix(style, tone)
+    negative_prompt = negative_prompt_for(style)
+    print(f"🛡️ 강화된 네거티브 프롬프트 사용")
+
+    cache_inputs = {
+        "kind": "text-to-image",
+        "prompt": final_prompt + prompt_suffix,
+        "negative_prompt": negative_prompt,
+        "model_id": model_id,
+        "height": height,
+        "width": width,
+        "guidance_scale": guidance_scale,
+        "num_inference_steps": num_inference_steps,
+        "loras": loras,
+        "profile": profile,
+    }
+
+    render_height, render_width = output_size(model_id, height, width)
+    chunk_size = get_scheduler().max_images(model_id, render_height, render_width, guidance_scale)
+    with _observe_generation(model_id, "text-to-image", len(image_seeds)):
+        return _cached_or_generate(
+            lambda chunk_seeds: get_scheduler().submit_text_to_image(
+                model_id=model_id,
+                prompt=final_prompt,
+                height=height,
+                width=width,
+                guidance_scale=guidance_scale,
+                num_inference_steps=num_inference_steps,
+                negative_prompt=negative_prompt,
+                step_callback=step_callback,
+                seeds=chunk_seeds,
+                prompt_suffix=prompt_suffix,
+                loras=loras,
+                profile=profile
+            ),
+            cache_inputs,
+            image_seeds,
+            chunk_size,
+            cancel_event,
+            (render_width, render_height)
+        )
+
+
+def generate_image_to_image(
+    prompt: str,
+    input_image: Image.Image,
+    model_id: str,
+    strength: float = 0.15,
+    guidance_scale: float = 3.0,
+    num_inference_steps: int = 20,
+    use_translation: bool = True,
+    seed: Optional[int] = None,
+    cancel_event: Optional[threading.Event] = None,
+    step_callback: Optional[StepCallback] = None,
+    loras: Optional[List[LoraSelection]] = None,
+    num_images: int = 1,
+    seeds: Optional[List[int]] = None,
+    profile: Optional[str] = None,
+    style: Optional[str] = None,
+    tone: Optional[str] = None
+) -> List[Image.Image]:
+    """Transform an input image into num_images variants (seeds as in variant_seeds; style/tone from the prompt catalog)."""
+    image_seeds = variant_seeds(num_images, seed, seeds)
+    final_prompt = prepare_prompt(prompt, use_translation)
+    prompt_suffix = positive_suffix(style, tone)
+    negative_prompt = negative_prompt_for(style)
+    print(f"🛡️ 강화된 네거티브 프롬프트 사용")
+
+    cache_inputs = {
+        "kind": "image-to-image",
+        "prompt": final_prompt + prompt_suffix,
+        "negative_prompt": negative_prompt,
+        "model_id": model_id,
+        "input_image": hash_image(input_image) if any(s is not None for s in image_seeds) else None,
+        "strength": strength,
+        "guidance_scale": guidance_scale,
+        "num_inference_steps": num_inference_steps,
+        "loras": loras,
+        "profile": profile,
+    }
+
+    chunk_size = get_scheduler().max_images(model_id, input_image.height, input_image.width, guidance_scale)
+    with _observe_generation(model_id, "image-to-image", len(image_seeds)):
+        return _cached_or_generate(
+            lambda chunk_seeds: get_scheduler().submit_image_to_image(
+                model_id=model_id,
+                prompt=final_prompt,
+                input_image=input_image,
+                strength=strength,
+                guidance_scale=guidance_scale,
+                num_inference_steps=num_inference_steps,
+                negative_prompt=negative_prompt,
+                step_callback=step_callback,
+                seeds=chunk_seeds,
+                prompt_suffix=prompt_suffix,
+                loras=loras,
+                profile=profile
+            ),
+            cache_inputs,
+            image_seeds,
+            chunk_size,
+            cancel_event,
+            input_image.size
+        )
+
+
+def store_images(
+    images: List[Image.Image],
+    output_format: str = "png",
+    quality: int = 90,
+    thumbnail: bool = True
+) -> Dict[str, List[Any]]:
+    """Encode images (and thumbnails) on the encoding pool and persist them in the output store.
+
+    sizes holds each image's rendered [width, height], which is smaller than
+    requested when the memory planner downgraded the call.
+    """
+    output_format = validate_format(output_format)
+    store = get_output_store()
+    executor = get_encode_executor()
+
+    pending = []
+    for image in images:
+        if thumbnail:
+            # 두 인코딩 작업이 같은 이미지를 동시에 지연 로딩하지 않도록 미리 디코딩
+            image.load()
+        pending.append((
+            executor.submit(encode_image, image, output_format, quality),
+            executor.submit(encode_thumbnail, image) if thumbnail else None,
+        ))
+
+    result: Dict[str, List[Any]] = {
+        "image_paths": [],
+        "thumbnail_paths": [],
+        "sizes": [list(image.size) for image in images],
+    }
+    for full, thumb in pending:
+        result["image_paths"].append(store.save_bytes(*full.result()))
+        if thumb is not None:
+            result["thumbnail_paths"].append(store.save_bytes(*thumb.result()))
+    return result
+
+
+def run_text_to_image(
+    output_format: str = "png",
+    quality: int = 90,
+    thumbnail: bool = True,
+    **kwargs: Any
+) -> Dict[str, List[Any]]:
+    """Generate from text (see generate_text_to_image) and return stored image/thumbnail ids."""
+    validate_format(output_format)
+    return store_images(generate_text_to_image(**kwargs), output_format, quality, thumbnail)
+
+
+def run_image_to_image(
+    output_format: str = "png",
+    quality: int = 90,
+    thumbnail: bool = True,
+    **kwargs: Any
+) -> Dict[str, List[Any]]:
+    """Transform an image (see generate_image_to_image) and return stored image/thumbnail ids."""
+    validate_format(output_format)
+    return store_images(generate_image_to_image(**kwargs), output_format, quality, thumbnail)
+
+
+def _service_metrics():
+    """Scrape-time gauges/counters from the scheduler, caches, registry and translator."""
+    scheduler = get_scheduler().stats()
+    yield "batch_pending_requests", "gauge", "Requests waiting to be batched", {}, scheduler["pending"]
+    yield "batches_run_total", "counter", "Pipeline batches executed", {}, scheduler["batches_run"]
+    yield "batched_requests_total", "counter", "Requests executed through batches", {}, scheduler["requests_run"]
+    yield "batched_images_total", "counter", "Images generated through batches", {}, scheduler["images_run"]
+
+    cache = get_result_cache()
+    if cache is not None:
+        cache_stats = cache.stats()
+        yield "result_cache_hits_total", "counter", "Result cache hits", {}, cache_stats["hits"]
+        yield "result_cache_misses_total", "counter", "Result cache misses", {}, cache_stats["misses"]
+        yield "result_cache_bytes", "gauge", "Result cache disk usage", {}, cache_stats["bytes"]
+
+    translator = get_translator().stats()
+    yield "translation_cache_hits_total", "counter", "Translation cache hits", {}, translator["hits"]
+    yield "translation_cache_misses_total", "counter", "Translation cache misses", {}, translator["misses"]
+
+    registry = get_registry()
+    registry_stats = registry.stats()
+    yield "model_cache_hits_total", "counter", "Model registry hits", {}, registry_stats["hits"]
+    yield "model_cache_misses_total", "counter", "Model registry misses (pipeline loads)", {}, registry_stats["misses"]
+    yield "model_cache_evictions_total", "counter", "Model registry evictions", {}, registry_stats["evictions"]
+    yield "model_memory_bytes", "gauge", "Memory accounted to resident models", {}, registry_stats["memory_bytes"]
+    for generator in registry.generators():
+        embed_stats = generator.embedding_stats()
+        if embed_stats:
+            labels = {"model": generator.model_id}
+            yield "prompt_embed_cache_hits_total", "counter", "Prompt embedding cache hits", labels, embed_stats["hits"]
+            yield "prompt_embed_cache_misses_total", "counter", "Prompt embedding cache misses", labels, embed_stats["misses"]
+        adapter_stats = generator.adapter_stats()
+        labels = {"model": generator.model_id}
+        yield "lora_adapters_loaded", "gauge", "LoRA adapters resident per model", labels, len(adapter_stats["loaded"])
+        yield "lora_adapter_loads_total", "counter", "LoRA adapter loads", labels, adapter_stats["loads"]
+        yield "lora_adapter_evictions_total", "counter", "LoRA adapter evictions", labels, adapter_stats["evictions"]
+        memory_stats = generator.memory_stats()
+        yield "memory_plan_adjusted_total", "counter", "Calls that needed slicing/tiling/offload", labels, memory_stats["adjusted"]
+        yield "memory_plan_downgrades_total", "counter", "Calls rendered at a lower resolution to fit memory", labels, memory_stats["downgrades"]
+        yield "memory_plan_rejections_total", "counter", "Calls rejected by the memory planner", labels, memory_stats["rejections"]
+        latent_stats = generator.latent_stats()
+        yield "input_latent_cache_hits_total", "counter", "Input latent cache hits", labels, latent_stats["hits"]
+        yield "input_latent_cache_misses_total", "counter", "Input latent cache misses (VAE encodes)", labels, latent_stats["misses"]
+        yield "input_latent_cache_bytes", "gauge", "Memory held by cached input latents", labels, latent_stats["bytes"]
+
+    catalog_stats = get_catalog().cache_info()
+    yield "prompt_catalog_cache_hits_total", "counter", "Composed catalog prompt cache hits", {}, catalog_stats["hits"]
+    yield "prompt_catalog_cache_misses_total", "counter", "Composed catalog prompt cache misses", {}, catalog_stats["misses"]
+    yield "process_resident_memory_bytes", "gauge", "Resident memory of this process", {}, current_rss_bytes()
+
+
+_collectors_registered = False
+
+
+def register_metric_collectors():
+    """Expose service-level stats on /metrics (idempotent)."""
+    global _collectors_registered
+    if not _collectors_registered:
+        register_collector(_service_metrics)
+        _collectors_registered = True
@@ -0,0 +1,102 @@
+"""
+Image Encoding
+
+Output format/quality handling and thumbnail renditions.
+
+Encoding runs on a dedicated thread pool (Pillow releases the GIL while
+encoding), so the full image and its thumbnail are encoded in parallel and
+never on the pipeline's dispatch thread.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from PIL import Image, features
+
+from output_store import encode_png
+from metrics import IMAGE_ENCODE_SECONDS
+
+# 포맷별 (PIL 포맷 이름, 확장자, MIME 타입)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp")
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+
+
+def validate_format(output_format: str) -> str:
+    """Normalize an output format name, raising ValueError if unsupported here."""
+    name = output_format.lower()
+    if name == "jpg":
+        name = "jpeg"
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if name == "avif" and not features.check("avif"):
+        raise ValueError("AVIF encoding is not available in this Pillow build")
+    return name
+
+
+def media_type(output_format: str) -> str:
+    """MIME type for an output format."""
+    return OUTPUT_FORMATS[validate_format(output_format)][2]
+
+
+def encode_image(image: Image.Image, output_format: str = "png", quality: int = 90) -> Tuple[bytes, str]:
+    """Encode an image, returning (bytes, file extension)."""
+    name = validate_format(output_format)
+    with IMAGE_ENCODE_SECONDS.time(format=name):
+        return _encode(image, name, quality)
+
+
+def _encode(image: Image.Image, name: str, quality: int) -> Tuple[bytes, str]:
+    pil_format, extension, _ = OUTPUT_FORMATS[name]
+    if name == "png":
+        return encode_png(image), extension
+
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    if name == "jpeg":
+        image.save(buffer, format=pil_format, quality=quality, progressive=True)
+    elif name == "webp":
+        # method 4: 압축률과 인코딩 속도의 균형
+        image.save(buffer, format=pil_format, quality=quality, method=4)
+    else:
+        image.save(buffer, format=pil_format, quality=quality, speed=6)
+    return buffer.getvalue(), extension
+
+
+def make_thumbnail(image: Image.Image, max_size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """Downscale an image to fit within max_size x max_size."""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return thumbnail
+
+
+def encode_thumbnail(image: Image.Image) -> Tuple[bytes, str]:
+    """Encode the history-view thumbnail rendition of an image."""
+    return encode_image(make_thumbnail(image), THUMBNAIL_FORMAT, THUMBNAIL_QUALITY)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_encode_executor() -> ThreadPoolExecutor:
+    """Return the shared encoding thread pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("ENCODE_WORKERS", "4")),
+                thread_name_prefix="image-encode",
+            )
+        return _executor
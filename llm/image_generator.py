@@ -4,14 +4,60 @@ Image Generator Module
 A reusable class for Stable Diffusion image generation.
 """
 
+import random
+import threading
+import time
+from contextlib import contextmanager
 import torch
-from PIL import Image
+from PIL import Image, ImageOps
 import requests
 from io import BytesIO
-from diffusers import StableDiffusionPipeline, StableDiffusionImg2ImgPipeline, StableDiffusionXLPipeline
-from typing import List, Tuple, Optional, Dict, Any
+from diffusers import (
+    StableDiffusionPipeline,
+    StableDiffusionImg2ImgPipeline,
+    StableDiffusionXLPipeline,
+    StableDiffusionXLImg2ImgPipeline,
+)
+from typing import List, Tuple, Optional, Dict, Any, Callable, Sequence
 from datetime import datetime
 
+from cpu_optimization import get_cpu_config, optimize_pipeline, runtime_loras_supported
+from prompt_embeddings import PromptEmbedder, embed_cache_size, embeddings_enabled
+from lora_adapters import AdapterManager, LoraSelection, lora_cache_size, lora_fuse_enabled
+from latent_cache import LatentCache, latent_cache_bytes, latent_cache_enabled
+from image_ingest import prepare_input_image
+from memory_planner import MemoryPlan, get_planner, memory_planning_enabled
+from speed_profiles import SchedulerSwitcher, get_profile
+from metrics import (
+    DENOISE_STEP_SECONDS,
+    PEAK_MEMORY_BYTES,
+    PIPELINE_CALL_SECONDS,
+    PIPELINE_LOAD_SECONDS,
+    TEXT_ENCODE_SECONDS,
+    VAE_DECODE_SECONDS,
+    current_rss_bytes,
+    log_event,
+)
+
+# (현재 스텝, 전체 스텝, 해당 이미지의 latents) -> True를 반환하면 중단 요청
+StepCallback = Callable[[int, int, torch.Tensor], Optional[bool]]
+
+
+# 요청이 지정하지 않을 때 로드 시점에 적용하는 LoRA
+DEFAULT_LORA_WEIGHTS = "FLUX-kontext-lora-flat-cartoon-style.safetensors"
+
+
+class GeneratorEvictedError(RuntimeError):
+    """Raised when a generator unloaded by the model registry is used again."""
+
+
+def output_size(model_id: str, height: int, width: int) -> Tuple[int, int]:
+    """Size a text-to-image call actually renders at (SDXL renders at least 1024x1024, SDXL Turbo as requested)."""
+    model = model_id.lower()
+    if "xl" in model and "turbo" not in model:
+        return max(height, 1024), max(width, 1024)
+    return height, width
+
 
 class StableDiffusionGenerator:
     """A class for generating images using Stable Diffusion."""
@@ -20,72 +66,252 @@ class StableDiffusionGenerator:
         """Initialize the generator with a model."""
         self.model_id = model_id
         self.device, self.num_steps = self._get_device_info()
+        self.cpu_config = get_cpu_config()
+        if self.device == "cuda":
+            self.torch_dtype = torch.float16
+        else:
+            # CPU 최적화 모드에서는 bfloat16 가중치 사용 가능
+            self.torch_dtype = self.cpu_config.torch_dtype
+            if self.cpu_config.enabled and self.cpu_config.num_steps:
+                self.num_steps = self.cpu_config.num_steps
         self.text_pipe = None
         self.img2img_pipe = None
+        self._embedder: Optional[PromptEmbedder] = None
+        self._latents = LatentCache(model_id, latent_cache_bytes())
+        # 해상도/배치별 최대 메모리 추정과 슬라이싱/타일링/오프로드 설정
+        self._memory = get_planner(model_id, self.device, self.torch_dtype)
+        # 파이프라인은 스레드 안전하지 않으므로 추론 호출을 직렬화
+        self._lock = threading.RLock()
         self.is_sdxl = "xl" in model_id.lower()
         # self.lora_weights = lora_weights or "modamsko/lora-sdxl-flatillustration"
-        self.lora_weights = lora_weights or "FLUX-kontext-lora-flat-cartoon-style.safetensors"
+        self.lora_weights = lora_weights or DEFAULT_LORA_WEIGHTS
+        # 요청별 LoRA 어댑터 (기본 모델 위에서 교체)
+        self._adapters = AdapterManager(model_id, lora_cache_size(), lora_fuse_enabled())
+        # 속도 프로필별 스케줄러 (파이프라인마다 한 번 생성해 재사용)
+        self._schedulers = SchedulerSwitcher()
+        # 파이프라인이 새로 로드될 때 호출 (레지스트리 메모리 재계산용)
+        self.on_pipeline_loaded: Optional[Callable[["StableDiffusionGenerator"], None]] = None
+        # 레지스트리에서 제거된 뒤에는 다시 로드하지 않음 (예산 밖 로드 방지)
+        self._evicted = False
+        self._active = 0  # 진행 중인 추론 수 (잠금 재진입 포함)
         
-    def _get_device_info(self) -> Tuple[str, int]:
+    @staticmethod
+    def _get_device_info() -> Tuple[str, int]:
         """Get device information and optimal inference steps."""
         device = "cuda" if torch.cuda.is_available() else "cpu"
         num_steps = 20 if device == "cuda" else 10
         return device, num_steps
+
+    @property
+    def cache_key(self) -> Tuple[str, Optional[str], str, str]:
+        """Key identifying the weights this generator keeps resident."""
+        return (self.model_id, self.lora_weights, str(self.torch_dtype), self.device)
+
+    @staticmethod
+    def make_cache_key(model_id: str, lora_weights: Optional[str] = None) -> Tuple[str, Optional[str], str, str]:
+        """The cache_key a generator for these arguments would have, without constructing one."""
+        device, _ = StableDiffusionGenerator._get_device_info()
+        dtype = torch.float16 if device == "cuda" else get_cpu_config().torch_dtype
+        return (model_id, lora_weights or DEFAULT_LORA_WEIGHTS, str(dtype), device)
+
+    def is_loaded(self) -> bool:
+        """Whether any pipeline is currently resident."""
+        return self.text_pipe is not None or self.img2img_pipe is not None
+
+    def memory_footprint(self) -> int:
+        """Approximate bytes held by the loaded pipelines (shared weights counted once)."""
+        seen = set()
+        total = 0
+        for pipe in (self.text_pipe, self.img2img_pipe):
+            if pipe is None:
+                continue
+            for component in pipe.components.values():
+                if not isinstance(component, torch.nn.Module):
+                    continue
+                for tensor in list(component.parameters()) + list(component.buffers()):
+                    if tensor.data_ptr() in seen:
+                        continue
+                    seen.add(tensor.data_ptr())
+                    total += tensor.numel() * tensor.element_size()
+        return total
+
+    def unload(self):
+        """Drop the loaded pipelines so their memory can be reclaimed.
+
+        The generator is retired: loading or generating afterwards raises
+        GeneratorEvictedError (get a fresh one from create_generator). An
+        inference already running keeps its pipelines and releases them
+        when it finishes, so this never blocks on the inference lock.
+        """
+        self._evicted = True
+        if self._lock.acquire(blocking=False):
+            try:
+                if not self._active:
+                    self._release_pipelines()
+            finally:
+                self._lock.release()
+
+    def _release_pipelines(self):
+        self.text_pipe = None
+        self.img2img_pipe = None
+        self._embedder = None
+        self._latents = LatentCache(self.model_id, self._latents.max_bytes)
+        self._memory.reset()
+        self._adapters = AdapterManager(self.model_id, self._adapters.max_adapters, self._adapters.fuse)
+        self._schedulers = SchedulerSwitcher()
+
+    def default_loras(self) -> List[LoraSelection]:
+        """Adapters used when a request doesn't choose any."""
+        return [(self.lora_weights, 1.0)] if self.lora_weights else []
+
+    def adapter_stats(self) -> Dict[str, Any]:
+        """Loaded/active LoRA adapters and swap counters."""
+        with self._lock:
+            return self._adapters.stats()
+
+    def embedding_stats(self) -> Optional[Dict[str, Any]]:
+        """Prompt embedding cache counters, if the cache has been used."""
+        return self._embedder.stats() if self._embedder is not None else None
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Memory planner budget, applied settings and counters."""
+        return self._memory.stats()
+
+    def latent_stats(self) -> Dict[str, Any]:
+        """Input latent cache counters."""
+        return self._latents.stats()
+
+    def scheduler_stats(self) -> Dict[str, Any]:
+        """Speed profile scheduler cache counters."""
+        with self._lock:
+            return self._schedulers.stats()
     
     def _load_pipeline(self, pipeline_class):
         """Load pipeline with appropriate settings for CPU/GPU."""
-        if torch.cuda.is_available():
+        load_started = time.perf_counter()
+        if self.device == "cuda":
             print("✅ CUDA available, using GPU")
-            pipe = pipeline_class.from_pretrained(
-                self.model_id,
-                torch_dtype=torch.float16,
-                use_safetensors=True,
-                safety_checker=None  # NSFW 필터 비활성화
-            )
         else:
             print("⚠️  CUDA not available, using CPU")
-            pipe = pipeline_class.from_pretrained(
-                self.model_id,
-                use_safetensors=True,
-                safety_checker=None  # NSFW 필터 비활성화
-            )
+        pipe = pipeline_class.from_pretrained(
+            self.model_id,
+            torch_dtype=self.torch_dtype,
+            use_safetensors=True,
+            safety_checker=None  # NSFW 필터 비활성화
+        )
         
         # Move to device after loading
         pipe = pipe.to(self.device)
         
-        # LoRA 가중치 로드 (PEFT 백엔드가 있는 경우에만)
+        # 기본 LoRA 어댑터 로드 (PEFT 백엔드가 있는 경우에만); 다른 어댑터는 요청 시 로드
         if self.lora_weights:
-            try:
-                pipe.load_lora_weights(self.lora_weights)
-                print(f"✅ LoRA weights loaded: {self.lora_weights}")
-            except Exception as e:
-                print(f"⚠️  LoRA weights loading failed: {e}")
-                print("Continuing without LoRA weights...")
+            self._adapters.activate(pipe, self.default_loras())
         else:
             print("ℹ️  No LoRA weights specified, using base model")
         
+        # LoRA 로드 이후에 적용해야 양자화/컴파일이 어댑터까지 포함
+        if self.device == "cpu":
+            pipe = optimize_pipeline(pipe, self.cpu_config)
+        
+        PIPELINE_LOAD_SECONDS.observe(time.perf_counter() - load_started, model=self.model_id, pipeline=pipeline_class.__name__)
         return pipe
     
+    def _pipeline_classes(self):
+        """Return the (text-to-image, image-to-image) pipeline classes for this model."""
+        if self.is_sdxl:
+            return StableDiffusionXLPipeline, StableDiffusionXLImg2ImgPipeline
+        return StableDiffusionPipeline, StableDiffusionImg2ImgPipeline
+
+    def _pipeline_from(self, pipeline_class, source):
+        """Build a pipeline that reuses the already-loaded components of another one."""
+        # UNet/VAE/텍스트 인코더를 그대로 공유하므로 추가 메모리나 LoRA 재로드가 없음
+        components = dict(source.components)
+        # 스케줄러는 호출마다 timesteps 상태를 바꾸므로 설정만 복사해 별도 인스턴스로 둠
+        # (속도 프로필로 교체된 스케줄러가 아니라 로드 시점의 스케줄러 기준)
+        scheduler = self._schedulers.default(source)
+        components["scheduler"] = scheduler.__class__.from_config(scheduler.config)
+        extra = {} if self.is_sdxl else {"requires_safety_checker": False}
+        return pipeline_class(**components, **extra)
+
     def load_text_pipeline(self):
-        """Load text-to-image pipeline."""
-        if self.text_pipe is None:
-            if self.is_sdxl:
-                self.text_pipe = self._load_pipeline(StableDiffusionXLPipeline)
-            else:
-                self.text_pipe = self._load_pipeline(StableDiffusionPipeline)
-            self.text_pipe = self.text_pipe.to(self.device)
-        return self.text_pipe
+        """Load text-to-image pipeline, sharing weights with the img2img pipeline if loaded."""
+        with self._lock:
+            self._check_resident()
+            if self.text_pipe is None:
+                text_class, _ = self._pipeline_classes()
+                if self.img2img_pipe is not None:
+                    self.text_pipe = self._pipeline_from(text_class, self.img2img_pipe)
+                else:
+                    self.text_pipe = self._load_pipeline(text_class)
+                # 순차 오프로드 중인 파이프라인은 훅이 장치 배치를 관리
+                if not self._memory.offloaded:
+                    self.text_pipe = self.text_pipe.to(self.device)
+                self._notify_loaded()
+            return self.text_pipe
     
     def load_img2img_pipeline(self):
-        """Load image-to-image pipeline."""
-        if self.img2img_pipe is None:
-            if self.is_sdxl:
-                # SDXL doesn't have img2img pipeline, use text-to-image
-                self.img2img_pipe = self.load_text_pipeline()
-            else:
-                self.img2img_pipe = self._load_pipeline(StableDiffusionImg2ImgPipeline)
-            self.img2img_pipe = self.img2img_pipe.to(self.device)
-        return self.img2img_pipe
+        """Load image-to-image pipeline, sharing weights with the text pipeline if loaded."""
+        with self._lock:
+            self._check_resident()
+            if self.img2img_pipe is None:
+                _, img2img_class = self._pipeline_classes()
+                if self.text_pipe is not None:
+                    self.img2img_pipe = self._pipeline_from(img2img_class, self.text_pipe)
+                else:
+                    self.img2img_pipe = self._load_pipeline(img2img_class)
+                if not self._memory.offloaded:
+                    self.img2img_pipe = self.img2img_pipe.to(self.device)
+                self._notify_loaded()
+            return self.img2img_pipe
+
+    def warm_up(
+        self,
+        prompt_suffix: Optional[str] = None,
+        negative_prompt: Optional[str] = None,
+        size: int = 64
+    ):
+        """Load both pipelines and run one tiny inference through each.
+
+        This compiles kernels, allocates workspaces and fills the prompt
+        embedding cache so the first real request doesn't pay for it.
+        """
+        text_pipe = self.load_text_pipeline()
+        img2img_pipe = self.load_img2img_pipeline()
+        runs = (
+            (text_pipe, {"height": size, "width": size}),
+            (img2img_pipe, {"image": Image.new("RGB", (size, size)), "strength": 1.0}),
+        )
+        with self._inference():
+            for pipe, extra in runs:
+                params = {"num_inference_steps": 1, "guidance_scale": 5.0, **extra}
+                self._adapters.activate(pipe, self.default_loras())
+                self._add_prompts(params, pipe, ["warm up"], prompt_suffix, negative_prompt)
+                pipe(**params)
+
+    def _check_resident(self):
+        if self._evicted:
+            raise GeneratorEvictedError(f"{self.model_id} was evicted from the model registry")
+
+    @contextmanager
+    def _inference(self):
+        """Hold the inference lock; an eviction that arrives meanwhile frees the pipelines afterwards."""
+        with self._lock:
+            self._active += 1
+            try:
+                # 로드 후 잠금을 얻기 전에 제거되었을 수 있음
+                self._check_resident()
+                yield
+            finally:
+                self._active -= 1
+                if self._evicted and not self._active:
+                    self._release_pipelines()
+
+    def _notify_loaded(self):
+        pipe = self.text_pipe or self.img2img_pipe
+        if pipe is not None:
+            self._memory.bind(pipe, self.memory_footprint())
+        if self.on_pipeline_loaded is not None:
+            self.on_pipeline_loaded(self)
     
     def generate_text_to_image(
         self, 
@@ -95,25 +321,69 @@ class StableDiffusionGenerator:
         width: int = 512,
         guidance_scale: float = 7.5,
         num_inference_steps: Optional[int] = None,
-        negative_prompt: Optional[str] = None
+        negative_prompt: Optional[str] = None,
+        step_callback: Optional[StepCallback] = None,
+        seed: Optional[int] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        profile: Optional[str] = None
     ) -> Image.Image:
         """Generate image from text prompt."""
+        return self.generate_text_to_image_batch(
+            [prompt],
+            filenames=[filename],
+            height=height,
+            width=width,
+            guidance_scale=guidance_scale,
+            num_inference_steps=num_inference_steps,
+            negative_prompt=negative_prompt,
+            step_callbacks=[step_callback],
+            seeds=[seed],
+            prompt_suffix=prompt_suffix,
+            loras=loras,
+            profile=profile
+        )[0]
+
+    def generate_text_to_image_batch(
+        self,
+        prompts: List[str],
+        filenames: Optional[List[Optional[str]]] = None,
+        height: int = 512,
+        width: int = 512,
+        guidance_scale: float = 7.5,
+        num_inference_steps: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        step_callbacks: Optional[List[Optional[StepCallback]]] = None,
+        seeds: Optional[List[Optional[int]]] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        num_images_per_prompt: int = 1,
+        profile: Optional[str] = None
+    ) -> List[Image.Image]:
+        """Generate num_images_per_prompt images per prompt in a single batched pipeline call.
+
+        prompt_suffix is appended to every prompt; it is encoded once and cached.
+        loras selects the LoRA adapters (weights, scale) for this call; None
+        uses the generator's default adapter and [] the bare base model.
+        profile selects a speed profile's scheduler (and LCM-LoRA); the
+        caller passes the profile's steps/guidance (see speed_profiles.resolve).
+        Images are returned grouped by prompt; seeds and filenames are per
+        output image (see _add_seeds for per-prompt seeds).
+        """
         pipe = self.load_text_pipeline()
         
         if num_inference_steps is None:
             num_inference_steps = self.num_steps
             
-        print(f"📝 Generating: '{prompt}'")
+        print(f"📝 Generating {len(prompts) * num_images_per_prompt} image(s): {prompts}")
         
         # SDXL 모델은 다른 파라미터를 사용
         if self.is_sdxl:
             # SDXL은 기본적으로 1024x1024 해상도 사용
-            height = max(height, 1024)
-            width = max(width, 1024)
+            height, width = output_size(self.model_id, height, width)
             
             # SDXL 파라미터 준비
-            sdxl_params = {
-                "prompt": prompt,
+            params = {
                 "height": height,
                 "width": width,
                 "guidance_scale": guidance_scale,
@@ -123,32 +393,33 @@ class StableDiffusionGenerator:
                 "crops_coords_left": 0,
                 "target_size": (height, width)
             }
-            
-            # 네거티브 프롬프트 추가
-            if negative_prompt:
-                sdxl_params["negative_prompt"] = negative_prompt
-            
-            image = pipe(**sdxl_params).images[0]
         else:
             # 일반 Stable Diffusion 파라미터 준비
             params = {
-                "prompt": prompt,
                 "height": height,
                 "width": width,
                 "guidance_scale": guidance_scale,
                 "num_inference_steps": num_inference_steps
             }
-            
-            # 네거티브 프롬프트 추가
-            if negative_prompt:
-                params["negative_prompt"] = negative_prompt
-            
-            image = pipe(**params).images[0]
         
-        image.save(filename)
-        print(f"✅ Saved as: {filename}")
+        params["num_images_per_prompt"] = num_images_per_prompt
+        self._add_step_hook(params, step_callbacks, num_images_per_prompt)
+        self._add_seeds(params, seeds, len(prompts), num_images_per_prompt)
         
-        return image
+        with self._inference():
+            plan = self._plan_memory(pipe, height, width, len(prompts) * num_images_per_prompt, guidance_scale)
+            if plan is not None and plan.downgraded:
+                params.update(height=plan.height, width=plan.width)
+                if self.is_sdxl:
+                    params.update(original_size=(plan.height, plan.width), target_size=(plan.height, plan.width))
+            # 네거티브 프롬프트는 배치 전체에 동일하게 적용
+            self._activate_profile(pipe, profile, loras)
+            with TEXT_ENCODE_SECONDS.time(model=self.model_id):
+                self._add_prompts(params, pipe, prompts, prompt_suffix, negative_prompt)
+            images = self._run_pipeline(pipe, params, "text-to-image", len(prompts) * num_images_per_prompt, plan)
+        
+        self._save_images(images, filenames)
+        return images
     
     def generate_image_to_image(
         self,
@@ -158,36 +429,267 @@ class StableDiffusionGenerator:
         strength: float = 0.75,
         guidance_scale: float = 7.5,
         num_inference_steps: Optional[int] = None,
-        negative_prompt: Optional[str] = None
+        negative_prompt: Optional[str] = None,
+        step_callback: Optional[StepCallback] = None,
+        seed: Optional[int] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        profile: Optional[str] = None
     ) -> Image.Image:
         """Generate image from input image and prompt."""
-        
+        return self.generate_image_to_image_batch(
+            [prompt],
+            [input_image],
+            filenames=[filename],
+            strength=strength,
+            guidance_scale=guidance_scale,
+            num_inference_steps=num_inference_steps,
+            negative_prompt=negative_prompt,
+            step_callbacks=[step_callback],
+            seeds=[seed],
+            prompt_suffix=prompt_suffix,
+            loras=loras,
+            profile=profile
+        )[0]
+
+    def generate_image_to_image_batch(
+        self,
+        prompts: List[str],
+        input_images: List[Image.Image],
+        filenames: Optional[List[Optional[str]]] = None,
+        strength: float = 0.75,
+        guidance_scale: float = 7.5,
+        num_inference_steps: Optional[int] = None,
+        negative_prompt: Optional[str] = None,
+        step_callbacks: Optional[List[Optional[StepCallback]]] = None,
+        seeds: Optional[List[Optional[int]]] = None,
+        prompt_suffix: Optional[str] = None,
+        loras: Optional[Sequence[LoraSelection]] = None,
+        num_images_per_prompt: int = 1,
+        profile: Optional[str] = None
+    ) -> List[Image.Image]:
+        """Transform each (prompt, input image) pair in a single batched pipeline call.
+
+        All input images must have the same size. Like the text-to-image batch,
+        num_images_per_prompt variants are returned grouped by prompt.
+        """
         pipe = self.load_img2img_pipeline()
+        # 모델 해상도(8의 배수)로 축소/크롭 - 이미 준비된 이미지는 그대로
+        input_images = [prepare_input_image(image, self.model_id) for image in input_images]
         
         if num_inference_steps is None:
             num_inference_steps = self.num_steps
             
-        print(f"📝 Transforming: '{prompt}'")
+        print(f"📝 Transforming {len(prompts)} image(s) x {num_images_per_prompt}: {prompts}")
         
         # 파라미터 준비
+        # 파이프라인은 입력을 [a, b, a, b] 순서로 복제하므로 프롬프트 순서([a, a, b, b])에 맞게 미리 반복
         params = {
-            "prompt": prompt,
-            "image": input_image,
+            "image": [image for image in input_images for _ in range(num_images_per_prompt)],
             "strength": strength,
             "guidance_scale": guidance_scale,
-            "num_inference_steps": num_inference_steps
+            "num_inference_steps": num_inference_steps,
+            "num_images_per_prompt": num_images_per_prompt
         }
         
-        # 네거티브 프롬프트 추가
-        if negative_prompt:
-            params["negative_prompt"] = negative_prompt
+        self._add_step_hook(params, step_callbacks, num_images_per_prompt)
+        self._add_seeds(params, seeds, len(prompts), num_images_per_prompt)
         
-        image = pipe(**params).images[0]
+        with self._inference():
+            width, height = input_images[0].size
+            plan = self._plan_memory(pipe, height, width, len(prompts) * num_images_per_prompt, guidance_scale)
+            if plan is not None and plan.downgraded:
+                input_images = [ImageOps.fit(image, (plan.width, plan.height), Image.Resampling.LANCZOS) for image in input_images]
+                params["image"] = [image for image in input_images for _ in range(num_images_per_prompt)]
+            self._activate_profile(pipe, profile, loras)
+            if latent_cache_enabled():
+                # 같은 입력 이미지는 VAE 인코딩을 한 번만 수행
+                latents = torch.cat([self._latents.encode(pipe, image) for image in input_images])
+                params["image"] = latents.repeat_interleave(num_images_per_prompt, dim=0)
+            with TEXT_ENCODE_SECONDS.time(model=self.model_id):
+                self._add_prompts(params, pipe, prompts, prompt_suffix, negative_prompt)
+            images = self._run_pipeline(pipe, params, "image-to-image", len(prompts) * num_images_per_prompt, plan)
         
-        image.save(filename)
-        print(f"✅ Saved as: {filename}")
-        
-        return image
+        self._save_images(images, filenames)
+        return images
+
+    def _run_pipeline(
+        self,
+        pipe,
+        params: Dict[str, Any],
+        kind: str,
+        batch_size: int,
+        plan: Optional[MemoryPlan] = None
+    ) -> List[Image.Image]:
+        """Call the pipeline, recording per-step, decode and peak-memory metrics."""
+        user_hook = params.get("callback_on_step_end")
+        resident_before = self._memory.resident_bytes() if plan is not None else 0
+        start = time.perf_counter()
+        timing = {"last_step": start, "steps": 0}
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            now = time.perf_counter()
+            DENOISE_STEP_SECONDS.observe(now - timing["last_step"], model=self.model_id)
+            timing["last_step"] = now
+            timing["steps"] += 1
+            if user_hook is not None:
+                return user_hook(pipe, step, timestep, callback_kwargs)
+            return callback_kwargs
+
+        params["callback_on_step_end"] = on_step_end
+        if self.device == "cuda":
+            torch.cuda.reset_peak_memory_stats()
+
+        images = pipe(**params).images
+
+        end = time.perf_counter()
+        # 마지막 스텝 이후 시간 = VAE 디코딩 + 후처리
+        decode_seconds = end - timing["last_step"]
+        peak_memory = torch.cuda.max_memory_allocated() if self.device == "cuda" else current_rss_bytes()
+        VAE_DECODE_SECONDS.observe(decode_seconds, model=self.model_id)
+        PIPELINE_CALL_SECONDS.observe(end - start, model=self.model_id, kind=kind)
+        PEAK_MEMORY_BYTES.observe(peak_memory, model=self.model_id)
+        if plan is not None:
+            # 실측 최대 메모리로 추정 계수 보정 (CUDA)
+            self._memory.observe(plan, resident_before, peak_memory)
+        log_event(
+            "pipeline_call",
+            model=self.model_id,
+            kind=kind,
+            batch_size=batch_size,
+            steps=timing["steps"],
+            seconds=round(end - start, 3),
+            decode_seconds=round(decode_seconds, 3),
+            peak_memory_bytes=peak_memory,
+            estimated_memory_bytes=plan.estimated_bytes if plan is not None else None,
+        )
+        return images
+
+    def _plan_memory(self, pipe, height: int, width: int, batch_size: int, guidance_scale: float) -> Optional[MemoryPlan]:
+        """Fit the call into the memory budget, switching slicing/tiling/offload as needed.
+
+        Raises MemoryBudgetError when it can't fit (see MEMORY_POLICY).
+        """
+        if not memory_planning_enabled():
+            return None
+        plan = self._memory.plan(height, width, batch_size, guidance=guidance_scale > 1)
+        # CPU 최적화 설정으로 켠 절약 기능은 끄지 않음
+        cpu = self.cpu_config if self.device == "cpu" and self.cpu_config.enabled else None
+        keep = {
+            "attention_slicing": bool(cpu and cpu.attention_slicing),
+            "vae_tiling": bool(cpu and cpu.vae_tiling),
+        }
+        self._memory.apply(pipe, plan, keep)
+        return plan
+
+    def _activate_loras(self, pipe, loras: Optional[Sequence[LoraSelection]]) -> Tuple[LoraSelection, ...]:
+        """Switch to the requested adapters (None = default); re-measure memory after new loads."""
+        loads = self._adapters.loads
+        applied = self._adapters.activate(pipe, self.default_loras() if loras is None else loras)
+        if self._adapters.loads != loads:
+            self._notify_loaded()
+        return applied
+
+    def _activate_profile(self, pipe, profile: Optional[str], loras: Optional[Sequence[LoraSelection]]):
+        """Switch the scheduler and adapters for a speed profile (None = loaded scheduler)."""
+        spec = get_profile(profile or "quality", self.model_id)
+        if self.device == "cpu" and not runtime_loras_supported(self.cpu_config):
+            # int8 양자화된 Linear 레이어에는 어댑터를 새로 넣거나 병합할 수 없음
+            if loras is not None or spec.lora is not None:
+                raise ValueError("CPU_PRECISION=int8 pipelines only use the model's default LoRA")
+        if spec.lora is None:
+            self._activate_loras(pipe, loras)
+            self._schedulers.activate(pipe, spec.scheduler)
+            return
+        selections = list(self.default_loras() if loras is None else loras)
+        applied = self._activate_loras(pipe, selections + [(spec.lora, 1.0)])
+        if any(weights == spec.lora for weights, _ in applied):
+            self._schedulers.activate(pipe, spec.scheduler)
+        else:
+            # LCM-LoRA 없이 LCM 스케줄러를 쓰면 결과가 깨지므로 대체 스케줄러 사용
+            self._schedulers.activate(pipe, spec.fallback_scheduler or "default")
+
+    def _add_prompts(
+        self,
+        params: Dict[str, Any],
+        pipe,
+        prompts: List[str],
+        prompt_suffix: Optional[str],
+        negative_prompt: Optional[str]
+    ):
+        """Pass cached, chunked prompt embeddings (or plain strings when the cache is disabled)."""
+        if not embeddings_enabled():
+            params["prompt"] = [prompt + (prompt_suffix or "") for prompt in prompts]
+            if negative_prompt:
+                params["negative_prompt"] = [negative_prompt] * len(prompts)
+            return
+        if self._embedder is None:
+            # 두 파이프라인이 텍스트 인코더를 공유하므로 모델당 하나의 캐시
+            self._embedder = PromptEmbedder(pipe, self.is_sdxl, embed_cache_size())
+        # 텍스트 인코더를 바꾸는 LoRA가 활성화되어 있으면 별도 캐시 항목 사용
+        variant = self._adapters.text_encoder_key()
+        params.update(self._embedder.pipeline_kwargs(prompts, prompt_suffix, negative_prompt, variant))
+
+    def _add_seeds(
+        self,
+        params: Dict[str, Any],
+        seeds: Optional[List[Optional[int]]],
+        num_prompts: int = 1,
+        num_images_per_prompt: int = 1
+    ):
+        """Give each output image its own seeded RNG so results don't depend on batch composition.
+
+        seeds holds one entry per output image, or one per prompt, in which case
+        variant j of a prompt seeded s uses s + j (the same image a single
+        request with seed s + j produces).
+        """
+        if not seeds or all(seed is None for seed in seeds):
+            return
+        if num_images_per_prompt > 1 and len(seeds) == num_prompts:
+            seeds = [
+                seed + j if seed is not None else None
+                for seed in seeds
+                for j in range(num_images_per_prompt)
+            ]
+        params["generator"] = [
+            torch.Generator(device=self.device).manual_seed(
+                seed if seed is not None else random.randint(0, 2 ** 32 - 1)
+            )
+            for seed in seeds
+        ]
+
+    def _add_step_hook(
+        self,
+        params: Dict[str, Any],
+        step_callbacks: Optional[List[Optional[StepCallback]]],
+        num_images_per_prompt: int = 1
+    ):
+        """Fan out per-step latents to each prompt's callback (its first variant)."""
+        if not step_callbacks or all(cb is None for cb in step_callbacks):
+            return
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            latents = callback_kwargs["latents"]
+            total_steps = getattr(pipe, "num_timesteps", None) or params["num_inference_steps"]
+            stop = []
+            for i, callback in enumerate(step_callbacks):
+                if callback is None:
+                    stop.append(False)
+                    continue
+                first = i * num_images_per_prompt
+                stop.append(bool(callback(step + 1, total_steps, latents[first:first + 1])))
+            # 배치의 모든 요청이 중단을 원할 때만 파이프라인을 멈춤
+            if all(stop):
+                pipe._interrupt = True
+            return callback_kwargs
+
+        params["callback_on_step_end"] = on_step_end
+
+    def _save_images(self, images: List[Image.Image], filenames: Optional[List[Optional[str]]]):
+        for image, filename in zip(images, filenames or []):
+            if filename:
+                image.save(filename)
+                print(f"✅ Saved as: {filename}")
     
     def download_image(self, url: str) -> Image.Image:
         """Download image from URL."""
@@ -202,32 +704,73 @@ class StableDiffusionGenerator:
         self, 
         prompts: List[str], 
         base_filename: str = "text_to_img",
+        batch_size: int = 4,
+        num_images_per_prompt: int = 1,
+        seed: Optional[int] = None,
         **kwargs
     ) -> List[Image.Image]:
-        """Generate multiple images from text prompts."""
-        images = []
-        for i, prompt in enumerate(prompts):
-            filename = f"{base_filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{i+1}.png"
-            image = self.generate_text_to_image(prompt, filename, **kwargs)
-            images.append(image)
-        return images
+        """Generate images for many prompts, batch_size images per pipeline call."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return self._batch_generate(
+            prompts,
+            lambda i, j: f"{base_filename}_{timestamp}_{i+1}" + (f"_{j+1}" if num_images_per_prompt > 1 else "") + ".png",
+            lambda chunk, **chunk_kwargs: self.generate_text_to_image_batch(chunk, **chunk_kwargs, **kwargs),
+            batch_size,
+            num_images_per_prompt,
+            seed
+        )
     
     def batch_generate_image_to_image(
         self,
         prompts: List[str],
         input_image: Image.Image,
         base_filename: str = "img_to_img",
+        batch_size: int = 4,
+        num_images_per_prompt: int = 1,
+        seed: Optional[int] = None,
         **kwargs
     ) -> List[Image.Image]:
-        """Generate multiple images from input image and prompts."""
+        """Transform one input image with many prompts, batch_size images per pipeline call."""
+        return self._batch_generate(
+            prompts,
+            lambda i, j: f"{base_filename}_{i+1}" + (f"_{j+1}" if num_images_per_prompt > 1 else "") + ".png",
+            lambda chunk, **chunk_kwargs: self.generate_image_to_image_batch(
+                chunk, [input_image] * len(chunk), **chunk_kwargs, **kwargs
+            ),
+            batch_size,
+            num_images_per_prompt,
+            seed
+        )
+
+    def _batch_generate(
+        self,
+        prompts: List[str],
+        filename: Callable[[int, int], str],
+        run: Callable[..., List[Image.Image]],
+        batch_size: int,
+        num_images_per_prompt: int,
+        seed: Optional[int]
+    ) -> List[Image.Image]:
+        """Run prompts through batched pipeline calls of at most batch_size images."""
+        # 변형이 batch_size보다 많으면 프롬프트 하나를 여러 호출로 나눔
+        per_call = max(1, min(num_images_per_prompt, batch_size))
+        prompts_per_call = max(1, batch_size // per_call)
         images = []
-        for i, prompt in enumerate(prompts):
-            filename = f"{base_filename}_{i+1}.png"
-            image = self.generate_image_to_image(prompt, input_image, filename, **kwargs)
-            images.append(image)
+        for start in range(0, len(prompts), prompts_per_call):
+            chunk = list(range(start, min(start + prompts_per_call, len(prompts))))
+            for offset in range(0, num_images_per_prompt, per_call):
+                count = min(per_call, num_images_per_prompt - offset)
+                images.extend(run(
+                    [prompts[i] for i in chunk],
+                    filenames=[filename(i, offset + j) for i in chunk for j in range(count)],
+                    seeds=[seed + offset + j if seed is not None else None for i in chunk for j in range(count)],
+                    num_images_per_prompt=count
+                ))
         return images
 
 
 def create_generator(model_id: str = "runwayml/stable-diffusion-v1-5", lora_weights: Optional[str] = None) -> StableDiffusionGenerator:
-    """Factory function to create a generator instance."""
-    return StableDiffusionGenerator(model_id, lora_weights)
+    """Return a warm generator from the shared model registry, loading it on first use."""
+    from model_registry import get_registry
+
+    return get_registry().get(model_id, lora_weights)
@@ -0,0 +1,96 @@
+"""
+Image Ingest
+
+Upload handling and preprocessing for image-to-image inputs.
+
+Uploads are read in chunks against a byte limit, large JPEGs are decoded
+directly at a reduced scale (draft mode) instead of at full resolution, and
+every input is resized/cropped to the model's working resolution in
+multiples of 8 before it reaches the scheduler or the pipeline.
+"""
+
+import os
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds UPLOAD_MAX_MB."""
+
+
+def max_upload_bytes() -> int:
+    """Largest accepted upload in bytes."""
+    return int(float(os.getenv("UPLOAD_MAX_MB", "20")) * 1024 ** 2)
+
+
+def max_decode_pixels() -> int:
+    """Largest accepted source image (width * height), checked before decoding."""
+    return int(float(os.getenv("UPLOAD_MAX_MEGAPIXELS", "50")) * 1_000_000)
+
+
+def max_input_side(model_id: str) -> int:
+    """Longest side the pipeline input is scaled down to for a model."""
+    if "xl" in model_id.lower():
+        return int(os.getenv("INPUT_MAX_SIDE_SDXL", "1024"))
+    return int(os.getenv("INPUT_MAX_SIDE_SD", "768"))
+
+
+async def read_upload(upload, max_bytes: Optional[int] = None) -> bytes:
+    """Read an UploadFile in chunks, failing as soon as it exceeds max_bytes."""
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    too_large = UploadTooLargeError(f"Upload exceeds {max_bytes / 1024 ** 2:g} MB")
+    if upload.size is not None and upload.size > max_bytes:
+        raise too_large
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def decode_image(data: bytes, max_side: int) -> Image.Image:
+    """Decode image bytes to RGB, letting JPEGs decode at the smallest scale >= max_side."""
+    image = Image.open(BytesIO(data))
+    if image.width * image.height > max_decode_pixels():
+        raise ValueError(f"Image too large: {image.width}x{image.height}")
+    if image.format == "JPEG":
+        # DCT 스케일링으로 1/2, 1/4, 1/8 해상도에서 바로 디코딩 (전체 해상도 디코딩 생략)
+        image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    return image.convert("RGB")
+
+
+def fit_to_model(image: Image.Image, max_side: int, multiple: int = 8) -> Image.Image:
+    """Downscale so the longest side is at most max_side and crop both sides to a multiple of 8."""
+    width, height = image.size
+    scale = min(1.0, max_side / max(width, height))
+    target = (
+        max(multiple, int(width * scale) // multiple * multiple),
+        max(multiple, int(height * scale) // multiple * multiple),
+    )
+    if target == image.size:
+        return image
+    # 비율을 유지하며 가장자리 몇 픽셀만 잘라냄
+    return ImageOps.fit(image, target, Image.Resampling.LANCZOS)
+
+
+def prepare_input_image(image: Image.Image, model_id: str) -> Image.Image:
+    """RGB, model-sized, multiple-of-8 pipeline input (no-op for already prepared images)."""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return fit_to_model(image, max_input_side(model_id))
+
+
+def ingest_image(data: bytes, model_id: str) -> Image.Image:
+    """Decode uploaded bytes and prepare them for a model."""
+    return prepare_input_image(decode_image(data, max_input_side(model_id)), model_id)
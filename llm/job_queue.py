@@ -0,0 +1,211 @@
+"""
+Job Queue
+
+Asynchronous generation jobs: a bounded work queue drained by dedicated
+inference worker threads so the event loop never runs the pipeline itself.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from generation_service import GenerationCancelled
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job."""
+
+
+@dataclass(eq=False)
+class Job:
+    """A queued or running generation job."""
+
+    kind: str
+    params: Dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    progress: Optional[Dict[str, int]] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _events_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """Append an event for streaming clients."""
+        with self._events_lock:
+            self.events.append({"id": len(self.events), "event": event, "data": data})
+
+    def events_since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Return events published after the cursor and the new cursor."""
+        with self._events_lock:
+            return self.events[cursor:], len(self.events)
+
+    def record_progress(self, step: int, total_steps: int, preview: Optional[str] = None):
+        """Update progress and publish a progress event."""
+        self.progress = {"step": step, "total_steps": total_steps}
+        data: Dict[str, Any] = dict(self.progress)
+        if preview is not None:
+            data["preview"] = preview
+        self.publish("progress", data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job for status endpoints."""
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Bounded job queue with a pool of inference worker threads."""
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Dict[str, Any]],
+        max_queue_size: int = 32,
+        num_workers: int = 4,
+        max_finished_jobs: int = 1000
+    ):
+        """Initialize the queue and start the worker threads."""
+        self.handler = handler
+        self.max_queue_size = max_queue_size
+        self.max_finished_jobs = max_finished_jobs
+        # 취소된 대기 작업은 큐에 남아 있다가 버려지므로 용량은 대기 중인 작업 수로 제한
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._queued = 0
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(max(1, num_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Job:
+        """Enqueue a job. Raises QueueFullError when max_queue_size jobs are already waiting."""
+        job = Job(kind=kind, params=params)
+        with self._lock:
+            if 0 < self.max_queue_size <= self._queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queue_size} jobs)")
+            self._jobs[job.id] = job
+            self._queued += 1
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation. Queued jobs never start; running jobs stop when possible."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in FINISHED_STATUSES:
+                return job
+            job.cancel_event.set()
+            if job.status == JobStatus.QUEUED:
+                self._queued -= 1
+                self._finish_locked(job, JobStatus.CANCELLED)
+        return job
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker (cancelled ones excluded)."""
+        with self._lock:
+            return self._queued
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and job counts by status."""
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_size": self.max_queue_size,
+            "workers": len(self._workers),
+            "jobs": counts,
+        }
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    if job.status != JobStatus.QUEUED:
+                        continue
+                    self._queued -= 1
+                    job.status = JobStatus.RUNNING
+                    job.started_at = time.time()
+                job.publish("status", {"status": job.status.value})
+                try:
+                    result = self.handler(job)
+                except GenerationCancelled:
+                    with self._lock:
+                        self._finish_locked(job, JobStatus.CANCELLED)
+                except Exception as e:
+                    with self._lock:
+                        job.error = str(e)
+                        self._finish_locked(job, JobStatus.FAILED)
+                else:
+                    with self._lock:
+                        job.result = result
+                        self._finish_locked(job, JobStatus.SUCCEEDED)
+            finally:
+                self._queue.task_done()
+
+    def _finish_locked(self, job: Job, status: JobStatus):
+        job.finished_at = time.time()
+        # 스트림이 마지막 이벤트를 놓치지 않도록 상태 변경 전에 발행
+        job.publish("status", {"status": status.value, "result": job.result, "error": job.error})
+        job.status = status
+        self._prune_locked()
+
+    def _prune_locked(self):
+        # 완료된 작업은 오래된 것부터 정리
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+
+def create_job_manager(handler: Callable[[Job], Dict[str, Any]]) -> JobManager:
+    """Create a job manager configured from the environment."""
+    return JobManager(
+        handler,
+        max_queue_size=int(os.getenv("JOB_QUEUE_MAX_SIZE", "32")),
+        num_workers=int(os.getenv("JOB_WORKERS", "4")),
+        max_finished_jobs=int(os.getenv("JOB_MAX_FINISHED", "1000")),
+    )
@@ -0,0 +1,113 @@
+"""
+Latent Cache
+
+Cached VAE encodings of image-to-image inputs.
+
+The img2img pipeline accepts already-encoded 4-channel latents as its image
+argument and then skips its own VAE encode. Inputs are encoded here once
+(with the latent distribution's mode rather than a random sample, so the
+result depends only on the image) and kept in a bounded LRU keyed by the
+image's pixel hash, so re-submitting the same input with another prompt,
+strength or seed skips the encoder entirely.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+import torch
+from PIL import Image
+
+from metrics import VAE_ENCODE_SECONDS
+from prompt_embeddings import execution_device
+from result_cache import hash_image
+
+
+class LatentCache:
+    """Bounded LRU of scaled VAE latents for one model's img2img pipeline."""
+
+    def __init__(self, model_id: str, max_bytes: int):
+        """Configure the memory budget for cached latents."""
+        self.model_id = model_id
+        self.max_bytes = max_bytes
+        self._cache: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, pipe, image: Image.Image) -> torch.Tensor:
+        """Return (1, 4, H/8, W/8) latents for an image, encoding it on a miss."""
+        key = hash_image(image)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        start = time.perf_counter()
+        latents = encode_latents(pipe, image)
+        VAE_ENCODE_SECONDS.observe(time.perf_counter() - start, model=self.model_id)
+
+        size = latents.numel() * latents.element_size()
+        with self._lock:
+            if key not in self._cache and size <= self.max_bytes:
+                self._cache[key] = latents
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._bytes -= evicted.numel() * evicted.element_size()
+        return latents
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and memory held."""
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def encode_latents(pipe, image: Image.Image) -> torch.Tensor:
+    """VAE-encode an image the way the img2img pipeline would, returning scaled latents."""
+    vae = pipe.vae
+    pixels = pipe.image_processor.preprocess(image)
+    # SDXL VAE는 float16에서 오버플로하므로 파이프라인과 같이 float32로 인코딩
+    upcast = vae.dtype == torch.float16 and getattr(vae.config, "force_upcast", False)
+    dtype = vae.dtype
+    with torch.inference_mode():
+        if upcast:
+            vae.to(dtype=torch.float32)
+        try:
+            # 순차 오프로드 중에는 vae.device가 meta이므로 실행 장치 사용
+            pixels = pixels.to(device=execution_device(pipe), dtype=vae.dtype)
+            latents = vae.encode(pixels).latent_dist.mode()
+        finally:
+            if upcast:
+                vae.to(dtype=dtype)
+        latents = latents.to(dtype)
+
+        mean = getattr(vae.config, "latents_mean", None)
+        std = getattr(vae.config, "latents_std", None)
+        if mean is not None and std is not None:
+            mean = torch.tensor(mean).view(1, -1, 1, 1).to(latents.device, latents.dtype)
+            std = torch.tensor(std).view(1, -1, 1, 1).to(latents.device, latents.dtype)
+            return (latents - mean) * vae.config.scaling_factor / std
+        return latents * vae.config.scaling_factor
+
+
+def latent_cache_enabled() -> bool:
+    """Whether img2img inputs are encoded through the latent cache."""
+    return os.getenv("INPUT_LATENT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def latent_cache_bytes() -> int:
+    """Memory budget for cached input latents per model."""
+    return int(float(os.getenv("INPUT_LATENT_CACHE_MB", "64")) * 1024 ** 2)
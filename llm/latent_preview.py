@@ -0,0 +1,78 @@
+"""
+Latent Preview
+
+Cheap approximate previews of in-progress latents.
+
+Instead of running the full VAE decoder, each latent channel is projected to
+RGB with a fixed linear map, producing a 1/8-resolution preview in well under
+a millisecond.
+"""
+
+import base64
+import os
+from io import BytesIO
+from typing import Callable, Optional
+
+import torch
+from PIL import Image
+
+# 미리보기를 보낼 스텝 간격 (0 이하는 매 스텝)
+PREVIEW_INTERVAL = max(1, int(os.getenv("PREVIEW_INTERVAL", "5")))
+
+# 잠재 공간 4채널 -> RGB 근사 변환 계수
+SD_LATENT_RGB_FACTORS = [
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177],
+]
+SD_LATENT_RGB_BIAS = [0.0, 0.0, 0.0]
+
+SDXL_LATENT_RGB_FACTORS = [
+    [0.3651, 0.4232, 0.4341],
+    [-0.2533, -0.0042, 0.1068],
+    [0.1076, 0.1111, -0.0362],
+    [-0.3165, -0.2492, -0.2188],
+]
+SDXL_LATENT_RGB_BIAS = [0.1084, -0.0175, -0.0011]
+
+
+def latents_to_preview(latents: torch.Tensor, is_sdxl: bool = False) -> Image.Image:
+    """Approximate an RGB image from a single (1, 4, h, w) or (4, h, w) latent."""
+    if latents.dim() == 4:
+        latents = latents[0]
+    factors = SDXL_LATENT_RGB_FACTORS if is_sdxl else SD_LATENT_RGB_FACTORS
+    bias = SDXL_LATENT_RGB_BIAS if is_sdxl else SD_LATENT_RGB_BIAS
+
+    latents = latents.detach().float().cpu()
+    weight = torch.tensor(factors)
+    rgb = torch.einsum("chw,cr->hwr", latents, weight) + torch.tensor(bias)
+    rgb = ((rgb + 1.0) / 2.0).clamp(0.0, 1.0)
+    return Image.fromarray((rgb * 255).byte().numpy())
+
+
+def latents_to_data_url(latents: torch.Tensor, is_sdxl: bool = False, quality: int = 70) -> str:
+    """Encode a latent preview as a JPEG data URL for streaming to clients."""
+    buffer = BytesIO()
+    latents_to_preview(latents, is_sdxl).save(buffer, format="JPEG", quality=quality)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def make_step_callback(
+    model_id: str,
+    preview: bool,
+    report: Callable[[int, int, Optional[str]], None],
+    is_cancelled: Callable[[], bool]
+) -> Callable[[int, int, torch.Tensor], bool]:
+    """Build a generator step callback that reports progress (and periodic previews)."""
+    is_sdxl = "xl" in model_id.lower()
+
+    def on_step(step: int, total_steps: int, latents: torch.Tensor) -> bool:
+        preview_url = None
+        if preview and (step % PREVIEW_INTERVAL == 0 or step == total_steps):
+            preview_url = latents_to_data_url(latents, is_sdxl)
+        report(step, total_steps, preview_url)
+        # 취소 요청 시 디노이징 루프를 조기 종료
+        return is_cancelled()
+
+    return on_step
@@ -0,0 +1,208 @@
+"""
+LoRA Adapters
+
+Per-request LoRA selection on a shared, resident base pipeline.
+
+Each adapter is loaded once under its own adapter name and switched with
+set_adapters instead of reloading the model. A bounded LRU deletes the least
+recently used adapters, and with LORA_FUSE enabled the active combination is
+fused into the base weights (and unfused before the next swap) so repeated
+requests with the same style pay no per-layer LoRA overhead.
+"""
+
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from metrics import LORA_SWAP_SECONDS
+
+# (가중치 파일 또는 허브 ID, 적용 강도)
+LoraSelection = Tuple[str, float]
+
+
+def adapter_name(weights: str) -> str:
+    """PEFT-safe adapter name for a weights path (no dots, stable per path)."""
+    stem = os.path.splitext(os.path.basename(weights.rstrip("/")))[0]
+    stem = re.sub(r"[^0-9A-Za-z_]", "_", stem)[:40]
+    return f"{stem}_{hashlib.sha1(weights.encode('utf-8')).hexdigest()[:8]}"
+
+
+class AdapterManager:
+    """Loads, activates and evicts LoRA adapters on one model's pipelines.
+
+    The text-to-image and img2img pipelines share their UNet and text
+    encoders, so one manager per generator covers both. Callers must hold
+    the generator's inference lock.
+    """
+
+    def __init__(self, model_id: str, max_adapters: int = 8, fuse: bool = False):
+        """Configure the LRU size and whether active adapters are fused."""
+        self.model_id = model_id
+        self.max_adapters = max(1, max_adapters)
+        self.fuse = fuse
+        self._loaded: "OrderedDict[str, str]" = OrderedDict()  # weights -> adapter name
+        self._failed: Set[str] = set()
+        self._text_encoder_adapters: Set[str] = set()
+        self._active: Tuple[LoraSelection, ...] = ()
+        self._applied: Tuple[LoraSelection, ...] = ()
+        self._fused = False
+        self._disabled = False
+        self.loads = 0
+        self.evictions = 0
+        self.swaps = 0
+        self.swap_seconds = 0.0
+
+    def activate(self, pipe, selections: Sequence[LoraSelection]) -> Tuple[LoraSelection, ...]:
+        """Make exactly these adapters active on pipe. Returns the ones actually applied."""
+        requested = tuple((weights, float(scale)) for weights, scale in selections)
+        for weights, _ in requested:
+            if weights in self._loaded:
+                self._loaded.move_to_end(weights)
+        if requested == self._active:
+            return self._applied
+
+        start = time.perf_counter()
+        if self._fused:
+            with LORA_SWAP_SECONDS.time(model=self.model_id, action="unfuse"):
+                pipe.unfuse_lora()
+            self._fused = False
+
+        keep = {weights for weights, _ in requested}
+        applied = tuple(
+            (weights, scale) for weights, scale in requested
+            if self._ensure_loaded(pipe, weights, keep)
+        )
+        if applied:
+            names = [self._loaded[weights] for weights, _ in applied]
+            if self._disabled:
+                pipe.enable_lora()
+                self._disabled = False
+            pipe.set_adapters(names, adapter_weights=[scale for _, scale in applied])
+            if self.fuse:
+                with LORA_SWAP_SECONDS.time(model=self.model_id, action="fuse"):
+                    pipe.fuse_lora(adapter_names=names)
+                self._fused = True
+        elif self._loaded and not self._disabled:
+            # 로드된 어댑터는 유지하고 기본 모델로만 추론
+            pipe.disable_lora()
+            self._disabled = True
+
+        elapsed = time.perf_counter() - start
+        LORA_SWAP_SECONDS.observe(elapsed, model=self.model_id, action="swap")
+        self.swaps += 1
+        self.swap_seconds += elapsed
+        self._active = requested
+        self._applied = applied
+        print(f"🎨 LoRA 전환 ({elapsed:.2f}s): {[w for w, _ in applied] or '기본 모델'}")
+        return applied
+
+    def text_encoder_key(self) -> str:
+        """Identifies the active adapters that change text-encoder outputs (for embedding caches)."""
+        return ",".join(
+            f"{weights}:{scale}" for weights, scale in self._applied
+            if self._loaded.get(weights) in self._text_encoder_adapters
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded/active adapters and swap counters."""
+        return {
+            "loaded": list(self._loaded),
+            "active": [{"weights": weights, "scale": scale} for weights, scale in self._applied],
+            "failed": sorted(self._failed),
+            "fused": self._fused,
+            "max_adapters": self.max_adapters,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "swaps": self.swaps,
+            "avg_swap_seconds": round(self.swap_seconds / self.swaps, 4) if self.swaps else 0.0,
+        }
+
+    def _ensure_loaded(self, pipe, weights: str, keep: Set[str]) -> bool:
+        if weights in self._loaded:
+            return True
+        if weights in self._failed:
+            return False
+
+        while len(self._loaded) >= self.max_adapters:
+            victim = next((w for w in self._loaded if w not in keep), None)
+            if victim is None:
+                break
+            with LORA_SWAP_SECONDS.time(model=self.model_id, action="evict"):
+                pipe.delete_adapters(self._loaded.pop(victim))
+            self._text_encoder_adapters.discard(adapter_name(victim))
+            self.evictions += 1
+            print(f"🗑️  LoRA evicted: {victim}")
+
+        name = adapter_name(weights)
+        try:
+            with LORA_SWAP_SECONDS.time(model=self.model_id, action="load"):
+                pipe.load_lora_weights(weights, adapter_name=name)
+        except Exception as e:
+            # 실패한 어댑터는 기억해 두고 요청마다 재시도하지 않음
+            self._failed.add(weights)
+            print(f"⚠️  LoRA weights loading failed: {weights}: {e}")
+            print("Continuing without this adapter...")
+            return False
+
+        self._loaded[weights] = name
+        self.loads += 1
+        for encoder in (getattr(pipe, "text_encoder", None), getattr(pipe, "text_encoder_2", None)):
+            if name in (getattr(encoder, "peft_config", None) or {}):
+                self._text_encoder_adapters.add(name)
+        print(f"✅ LoRA weights loaded: {weights} (adapter {name})")
+        return True
+
+
+def lora_dir() -> str:
+    """Directory whose *.safetensors files can be selected by name."""
+    return os.getenv("LORA_DIR", "loras")
+
+
+def available_loras() -> List[str]:
+    """Names accepted in a request's loras list."""
+    names = []
+    directory = lora_dir()
+    if os.path.isdir(directory):
+        names.extend(sorted(f for f in os.listdir(directory) if f.endswith(".safetensors")))
+    names.extend(w.strip() for w in os.getenv("LORA_ALLOWED", "").split(",") if w.strip())
+    return names
+
+
+def resolve_lora(name: str) -> str:
+    """Map a requested LoRA name to loadable weights. Raises ValueError for unknown names."""
+    name = name.strip()
+    allowed = {w.strip() for w in os.getenv("LORA_ALLOWED", "").split(",") if w.strip()}
+    if name in allowed:
+        return name
+    # 경로 조작을 막기 위해 LORA_DIR 바로 아래 파일 이름만 허용
+    if name and os.path.basename(name) == name:
+        filename = name if name.endswith(".safetensors") else f"{name}.safetensors"
+        path = os.path.join(lora_dir(), filename)
+        if os.path.isfile(path):
+            return path
+    raise ValueError(f"Unknown LoRA: {name}. Available: {available_loras()}")
+
+
+def parse_loras(spec: str) -> List[Tuple[str, float]]:
+    """Parse "name[:scale],name[:scale]" (form fields). Raises ValueError on bad scales."""
+    selections = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, scale = entry.rpartition(":") if ":" in entry else (entry, "", "1.0")
+        selections.append((name.strip(), float(scale)))
+    return selections
+
+
+def lora_cache_size() -> int:
+    """Adapters kept loaded per model."""
+    return int(os.getenv("LORA_CACHE_SIZE", "8"))
+
+
+def lora_fuse_enabled() -> bool:
+    """Whether active adapters are fused into the base weights."""
+    return os.getenv("LORA_FUSE", "false").lower() in ("1", "true", "yes")
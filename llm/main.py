@@ -4,22 +4,59 @@ FastAPI Application for Stable Diffusion Image Generation
 A FastAPI-based service for generating images using Stable Diffusion models.
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import json
+import hashlib
+import asyncio
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+import torch
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from PIL import Image
-import io
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse, Response
+
+from model_registry import get_registry
+from batch_scheduler import get_scheduler
+import generation_service
+from output_store import get_output_store, media_type_for
+from image_encoding import encode_image, media_type, validate_format
+from job_queue import Job, JobStatus, FINISHED_STATUSES, QueueFullError, create_job_manager
+from latent_preview import make_step_callback
+from translator import get_translator
+from result_cache import get_result_cache
+from cpu_optimization import default_num_steps, describe as describe_cpu_optimization, runtime_loras_supported
+from worker_pool import WorkerPool, create_worker_pool, serving_mode
+from lora_adapters import available_loras, parse_loras, resolve_lora
+from image_ingest import UploadTooLargeError, ingest_image, max_upload_bytes, read_upload
+from image_generator import output_size
+import memory_planner
+import speed_profiles
+from prompt_catalog import get_catalog
+from warmup import StartupState, run_warmup, warmup_mode, warmup_targets_from_env, warmup_translator
+import metrics
+
+# 시작 단계별 소요 시간 (import 포함)
+startup_state = StartupState()
+startup_state.record("imports", time.perf_counter() - _IMPORT_STARTED)
 
-from image_generator import create_generator
-from translator import translate_text
-from negative_prompts import get_strong_negative_prompt
-from positive_prompts import get_positive_prompts
+# LOG_FORMAT=json 이면 print 출력도 JSON 라인으로 기록
+metrics.install_json_logging()
+generation_service.register_metric_collectors()
 
 # Pydantic models
+class LoraRequest(BaseModel):
+    name: str  # LORA_DIR 안의 파일 이름 또는 LORA_ALLOWED 항목
+    scale: float = 1.0
+
 class TextToImageRequest(BaseModel):
     prompt: str
     height: int = 512
@@ -28,18 +65,73 @@ class TextToImageRequest(BaseModel):
     num_inference_steps: int = 20
     use_translation: bool = True
     model_id: str = "stabilityai/stable-diffusion-xl-base-1.0"
+    seed: Optional[int] = None  # 지정 시 결과가 결정적이며 결과 캐시 대상
+    num_images: int = 1  # 한 번의 배치 호출로 생성할 변형 수 (시드 seed, seed+1, ...)
+    seeds: Optional[List[int]] = None  # 변형별 시드를 직접 지정
+    preview: bool = False  # 작업 이벤트 스트림에 저해상도 미리보기 포함
+    return_image: bool = False  # True면 저장 없이 이미지 바이트를 바로 응답
+    output_format: str = "png"  # png, jpeg, webp, avif
+    quality: int = 90  # jpeg/webp/avif 품질
+    thumbnail: bool = True  # 히스토리용 썸네일 생성
+    loras: Optional[List[LoraRequest]] = None  # None이면 모델 기본 LoRA, []이면 LoRA 없이
+    profile: Optional[str] = None  # quality, balanced, fast (None이면 SPEED_PROFILE_DEFAULT); 지정하지 않은 steps/guidance는 프로필 기본값
+    style: Optional[str] = None  # 프롬프트 카탈로그 스타일 (GET /elearning-options)
+    tone: Optional[str] = None  # 프롬프트 카탈로그 분위기
 
 class GenerationResponse(BaseModel):
     success: bool
     message: str
     image_paths: List[str] = []
+    thumbnail_paths: List[str] = []
+    sizes: List[List[int]] = []  # 실제 생성된 [width, height] (메모리 부족으로 축소되면 요청보다 작음)
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+# SERVING_MODE=workers 일 때 추론을 담당하는 워커 프로세스 풀
+worker_pool: Optional[WorkerPool] = None
+
+# 종료 시 워커가 남은 작업을 끝낼 때까지 기다리는 최대 시간
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "60"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the worker pool and warm-up (if configured); drain the pool on shutdown."""
+    global worker_pool
+    with startup_state.phase("worker_pool"):
+        worker_pool = create_worker_pool()
+
+    # 워커 모드에서는 모델과 번역기를 각 워커 프로세스가 예열
+    if worker_pool is not None:
+        targets, translator = [], False
+    else:
+        targets, translator = warmup_targets_from_env(), warmup_translator()
+    mode = warmup_mode()
+    if mode == "off":
+        startup_state.finish()
+    elif mode == "blocking":
+        await run_in_threadpool(run_warmup, startup_state, targets, translator)
+    else:
+        threading.Thread(
+            target=run_warmup,
+            args=(startup_state, targets, translator),
+            name="warmup",
+            daemon=True
+        ).start()
+    yield
+    if worker_pool is not None:
+        await run_in_threadpool(worker_pool.shutdown, DRAIN_TIMEOUT_SECONDS)
 
 
 # FastAPI app
 app = FastAPI(
     title="Stable Diffusion Image Generator",
     description="A FastAPI service for generating images using Stable Diffusion",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -52,6 +144,45 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject uploads by Content-Length before the multipart body is parsed."""
+    content_length = request.headers.get("content-length")
+    # 폼 필드용 여유분 1MB
+    if content_length and content_length.isdigit() and int(content_length) > max_upload_bytes() + 1024 ** 2:
+        return JSONResponse(status_code=413, content={"detail": "Upload too large"})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency, count and server errors per endpoint."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # 경로 파라미터별로 라벨이 늘어나지 않도록 라우트 템플릿 사용
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint)
+        metrics.REQUESTS.inc(method=request.method, endpoint=endpoint, status=status)
+        if status >= 500:
+            metrics.ERRORS.inc(stage="http", endpoint=endpoint)
+        if metrics.json_logs_enabled():
+            metrics.log_event(
+                "http_request",
+                method=request.method,
+                endpoint=endpoint,
+                path=request.url.path,
+                status=status,
+                seconds=round(elapsed, 4),
+            )
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -62,115 +193,546 @@ async def root():
         "endpoints": {
             "text_to_image": "/generate/text-to-image",
             "image_to_image": "/generate/image-to-image",
+            "jobs": "/jobs",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "model_registry": "/models/registry",
+            "loras": "/loras",
+            "elearning_options": "/elearning-options",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
 
+def _is_ready() -> bool:
+    return startup_state.is_ready() and (worker_pool is None or worker_pool.all_ready())
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return {"status": "healthy", "ready": _is_ready(), "serving_mode": serving_mode()}
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: warm-up finished (and every inference worker is ready)."""
+    body = {"ready": _is_ready(), "startup": startup_state.to_dict()}
+    if worker_pool is not None:
+        body["workers"] = worker_pool.stats()["workers"]
+    if not body["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/health/startup")
+async def startup_timings():
+    """Per-phase startup timings."""
+    return startup_state.to_dict()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of this process (and every inference worker)."""
+    families = metrics.collect()
+    if worker_pool is not None:
+        for index, snapshot in worker_pool.metrics_snapshots().items():
+            metrics.merge(families, snapshot, worker=index)
+    return PlainTextResponse(metrics.render(families), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/workers")
+async def get_workers():
+    """Get per-worker health, readiness and model placement (SERVING_MODE=workers)."""
+    if worker_pool is None:
+        return {"serving_mode": serving_mode(), "workers": []}
+    return {"serving_mode": serving_mode(), **worker_pool.stats()}
+
+
+def _execute(
+    name: str,
+    on_progress: Optional[Callable[[int, int, Optional[str]], None]] = None,
+    preview: bool = False,
+    cancel_event: Optional[threading.Event] = None,
+    **params: Any
+):
+    """Run a generation_service function in-process or on an inference worker process."""
+    if worker_pool is not None:
+        return worker_pool.run(name, params, on_progress, preview, cancel_event)
+    if cancel_event is not None:
+        params["cancel_event"] = cancel_event
+    if on_progress is not None:
+        is_cancelled = cancel_event.is_set if cancel_event is not None else (lambda: False)
+        params["step_callback"] = make_step_callback(params["model_id"], preview, on_progress, is_cancelled)
+    return getattr(generation_service, name)(**params)
 
 
 @app.post("/generate/text-to-image", response_model=GenerationResponse)
 async def text_to_image(request: TextToImageRequest):
 
     try:
-        # Translate prompt if requested
-        prompt = request.prompt
-        if request.use_translation:
-            prompt = translate_text(request.prompt)
-            print(f"🌐 번역된 프롬프트: {prompt}")
-        
-        # Create generator
-        generator = create_generator(request.model_id)
-        
-        # Get negative prompt
-        negative_prompt = get_strong_negative_prompt()
-        positive_prompt = get_positive_prompts()    
-        print(f"🛡️ 강화된 네거티브 프롬프트 사용")
-        
-        # Generate image
-        image = generator.generate_text_to_image(
-            prompt=prompt + " and " + positive_prompt,
-            filename=f"text_to_img_{os.getpid()}.png",
-            height=request.height,
-            width=request.width,
-            guidance_scale=request.guidance_scale,
-            num_inference_steps=request.num_inference_steps,
-            negative_prompt=negative_prompt
+        _validate_output_format(request.output_format)
+        _validate_variants(request.num_images, request.seed, request.seeds, request.return_image)
+        _validate_prompt_options(request.style, request.tone)
+        sampling = _request_sampling(request)
+        _check_memory(request.model_id, *output_size(request.model_id, request.height, request.width), sampling["guidance_scale"])
+        params = request.model_dump(
+            exclude={"preview", "return_image", "output_format", "quality", "thumbnail", "loras"}
+        )
+        params.update(sampling)
+        params["loras"] = _resolve_loras(request.loras)
+        _check_runtime_loras(request.model_id, sampling["profile"], params["loras"])
+        # 추론은 이벤트 루프 밖의 스레드에서 실행
+        if request.return_image:
+            images = await run_in_threadpool(_execute, "generate_text_to_image", **params)
+            return await _image_response(images[0], request.output_format, request.quality)
+        stored = await run_in_threadpool(
+            _execute,
+            "run_text_to_image",
+            output_format=request.output_format,
+            quality=request.quality,
+            thumbnail=request.thumbnail,
+            **params
         )
         
         return GenerationResponse(
             success=True,
             message="Image generated successfully",
-            image_paths=[f"text_to_img_{os.getpid()}.png"]
+            **stored
         )
         
+    except HTTPException:
+        raise
+    except memory_planner.MemoryBudgetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 
+def _validate_output_format(output_format: str):
+    try:
+        validate_format(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _validate_variants(
+    num_images: int,
+    seed: Optional[int],
+    seeds: Optional[List[int]],
+    return_image: bool = False
+):
+    """Check num_images/seeds (400 on mismatch or over MAX_IMAGES_PER_REQUEST)."""
+    try:
+        count = len(generation_service.variant_seeds(num_images, seed, seeds))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if return_image and count > 1:
+        raise HTTPException(status_code=400, detail="return_image supports a single image; use num_images=1")
+
+
+def _validate_prompt_options(style: Optional[str], tone: Optional[str]):
+    """Check style/tone against the prompt catalog (400 for unknown names)."""
+    try:
+        get_catalog().validate(style=style, tone=tone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _resolve_profile(
+    profile: Optional[str],
+    model_id: str,
+    num_inference_steps: Optional[int],
+    guidance_scale: Optional[float],
+    strength: Optional[float] = None,
+    default_steps: int = 20,
+    default_guidance: float = 3.0
+) -> Dict[str, Any]:
+    """Speed profile plus steps/guidance, unset values taking the profile's defaults (400 for unknown profiles).
+
+    Without a profile step count, unset steps fall back to CPU_NUM_STEPS on optimized CPU nodes.
+    """
+    try:
+        name, steps, guidance = speed_profiles.resolve(
+            profile, model_id, num_inference_steps, guidance_scale, strength,
+            default_num_steps(default_steps), default_guidance
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"profile": name, "num_inference_steps": steps, "guidance_scale": guidance}
+
+
+def _check_runtime_loras(model_id: str, profile: str, loras: Optional[List[Tuple[str, float]]]):
+    """Reject per-request LoRAs and LCM-LoRA profiles on int8-quantized CPU pipelines (400)."""
+    if torch.cuda.is_available() or runtime_loras_supported():
+        return
+    if loras is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Per-request LoRAs are not supported with CPU_PRECISION=int8; omit loras to use the model's default"
+        )
+    if speed_profiles.get_profile(profile, model_id).lora is not None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The {profile} profile needs LCM-LoRA, which is not supported with CPU_PRECISION=int8; use balanced"
+        )
+
+
+def _request_sampling(request: TextToImageRequest) -> Dict[str, Any]:
+    """Profile, steps and guidance for a JSON request (fields the client didn't send count as unset)."""
+    explicit = request.model_fields_set
+    return _resolve_profile(
+        request.profile,
+        request.model_id,
+        request.num_inference_steps if "num_inference_steps" in explicit else None,
+        request.guidance_scale if "guidance_scale" in explicit else None,
+        default_steps=request.num_inference_steps,
+        default_guidance=request.guidance_scale
+    )
+
+
+def _check_memory(model_id: str, height: int, width: int, guidance_scale: float):
+    """Reject requests that can't fit the memory budget up front (MEMORY_POLICY=reject, in-process serving)."""
+    if worker_pool is not None or not memory_planner.memory_planning_enabled():
+        return
+    if memory_planner.memory_policy() != "reject":
+        return
+    planner = memory_planner.get_planner(model_id)
+    if not planner.fits(height, width, guidance=guidance_scale > 1):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{width}x{height} does not fit the memory budget for {model_id}"
+        )
+
+
+def _parse_seeds_form(spec: Optional[str]) -> Optional[List[int]]:
+    """Parse a comma-separated seeds form field."""
+    if not spec:
+        return None
+    try:
+        return [int(seed) for seed in spec.split(",") if seed.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid seeds: {spec}")
+
+
+def _resolve_loras(selections: Optional[List[LoraRequest]]) -> Optional[List[Tuple[str, float]]]:
+    """Map requested LoRA names to weights (400 for unknown names)."""
+    if selections is None:
+        return None
+    try:
+        return [(resolve_lora(s.name), s.scale) for s in selections]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _resolve_lora_form(spec: Optional[str]) -> Optional[List[Tuple[str, float]]]:
+    """Parse a "name[:scale],..." form field; empty = model default, "none" = no LoRA."""
+    if not spec:
+        return None
+    if spec.strip().lower() == "none":
+        return []
+    try:
+        selections = parse_loras(spec)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid loras: {spec}")
+    return _resolve_loras([LoraRequest(name=name, scale=scale) for name, scale in selections])
+
+
+async def _image_response(image: Image.Image, output_format: str, quality: int) -> Response:
+    """Return encoded image bytes directly, skipping the output store."""
+    data, _ = await run_in_threadpool(encode_image, image, output_format, quality)
+    # 메모리 부족으로 축소 생성된 경우 클라이언트가 알 수 있도록 실제 크기 전달
+    headers = {"X-Image-Width": str(image.width), "X-Image-Height": str(image.height)}
+    return Response(content=data, media_type=media_type(output_format), headers=headers)
+
+
+async def _read_input_image(image: UploadFile, model_id: str) -> Image.Image:
+    """Validate, decode and resize an uploaded image for the target model."""
+    if not image.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    try:
+        image_data = await read_upload(image)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        # 디코딩/리사이즈는 CPU 작업이므로 이벤트 루프 밖에서 수행
+        return await run_in_threadpool(ingest_image, image_data, model_id)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+
 @app.post("/generate/image-to-image", response_model=GenerationResponse)
 async def image_to_image(
     image: UploadFile = File(...),
     prompt: str = Form(...),
     use_translation: bool = Form(True),
     strength: float = Form(0.15),  # 0.25에서 0.15로 낮춤 (매우 보수적)
-    guidance_scale: float = Form(3.0),  # 7.0에서 3.0으로 낮춤 (매우 부드러운 프롬프트)
-    num_inference_steps: int = Form(20),
-    model_id: str = Form("stabilityai/stable-diffusion-xl-base-1.0")
+    guidance_scale: Optional[float] = Form(None),  # 기본 3.0 (7.0에서 낮춤, 매우 부드러운 프롬프트) 또는 프로필 값
+    num_inference_steps: Optional[int] = Form(None),  # 기본 20 또는 프로필 값
+    model_id: str = Form("stabilityai/stable-diffusion-xl-base-1.0"),
+    seed: Optional[int] = Form(None),
+    return_image: bool = Form(False),
+    output_format: str = Form("png"),
+    quality: int = Form(90),
+    thumbnail: bool = Form(True),
+    loras: Optional[str] = Form(None),  # "name[:scale],..." / "none"
+    num_images: int = Form(1),
+    seeds: Optional[str] = Form(None),  # "1,2,3"
+    profile: Optional[str] = Form(None),  # quality, balanced, fast
+    style: Optional[str] = Form(None),  # 프롬프트 카탈로그 스타일
+    tone: Optional[str] = Form(None)  # 프롬프트 카탈로그 분위기
 ):
 
     try:
-        # Validate image file
-        if not image.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Read and convert image
-        image_data = await image.read()
-        input_image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        
-        # Translate prompt if requested
-        final_prompt = prompt
-        if use_translation:
-            final_prompt = translate_text(prompt)
-            print(f"🌐 번역된 프롬프트: {final_prompt}")
-        
-        # Create generator
-        generator = create_generator(model_id)
+        _validate_output_format(output_format)
+        seed_list = _parse_seeds_form(seeds)
+        _validate_variants(num_images, seed, seed_list, return_image)
+        lora_selections = _resolve_lora_form(loras)
+        _validate_prompt_options(style, tone)
+        sampling = _resolve_profile(profile, model_id, num_inference_steps, guidance_scale, strength)
+        _check_runtime_loras(model_id, sampling["profile"], lora_selections)
+        # Validate, read and convert image
+        input_image = await _read_input_image(image, model_id)
+        _check_memory(model_id, input_image.height, input_image.width, sampling["guidance_scale"])
         
-        # Get negative prompt
-        negative_prompt = get_strong_negative_prompt()
-        positive_prompt = get_positive_prompts()    
-        print(f"🛡️ 강화된 네거티브 프롬프트 사용")
-        
-        # Generate image
-        image = generator.generate_image_to_image(
-            prompt=final_prompt + " and " + positive_prompt,
-            input_image=input_image,
-            filename=f"img_to_img_{os.getpid()}.png",
-            strength=strength,
-            guidance_scale=guidance_scale,
-            num_inference_steps=num_inference_steps,
-            negative_prompt=negative_prompt
+        params = {
+            "prompt": prompt,
+            "input_image": input_image,
+            "model_id": model_id,
+            "strength": strength,
+            **sampling,
+            "use_translation": use_translation,
+            "seed": seed,
+            "loras": lora_selections,
+            "num_images": num_images,
+            "seeds": seed_list,
+            "style": style,
+            "tone": tone,
+        }
+        if return_image:
+            images = await run_in_threadpool(_execute, "generate_image_to_image", **params)
+            return await _image_response(images[0], output_format, quality)
+        stored = await run_in_threadpool(
+            _execute,
+            "run_image_to_image",
+            output_format=output_format,
+            quality=quality,
+            thumbnail=thumbnail,
+            **params
         )
         
         return GenerationResponse(
             success=True,
             message="Image transformed successfully",
-            image_paths=[f"img_to_img_{os.getpid()}.png"]
+            **stored
         )
         
+    except HTTPException:
+        raise
+    except memory_planner.MemoryBudgetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image transformation failed: {str(e)}")
 
 
-@app.get('/image/{image_path}')
-async def get_image_path(image_path: str): 
-    return FileResponse(f"{image_path}")
+def _run_job(job: Job) -> dict:
+    """Execute a queued job on an inference worker thread."""
+    params = dict(job.params)
+    preview = params.pop("preview", False)
+    params.pop("return_image", None)
+    name = "run_image_to_image" if job.kind == "image-to-image" else "run_text_to_image"
+    # 진행 상황과 미리보기를 작업 이벤트로 발행
+    return _execute(
+        name,
+        on_progress=job.record_progress,
+        preview=preview,
+        cancel_event=job.cancel_event,
+        **params
+    )
+
+
+job_manager = create_job_manager(_run_job)
+
+
+def _job_metrics():
+    """Scrape-time job queue gauges (jobs are always queued in the API process)."""
+    stats = job_manager.stats()
+    yield "job_queue_depth", "gauge", "Jobs waiting for a job worker", {}, stats["queue_depth"]
+    yield "job_queue_capacity", "gauge", "Queued jobs accepted before 429 (JOB_QUEUE_MAX_SIZE)", {}, stats["max_queue_size"]
+    for status, count in stats["jobs"].items():
+        yield "jobs", "gauge", "Tracked jobs by status", {"status": status}, count
+
+
+metrics.register_collector(_job_metrics)
+
+
+def _submit_job(kind: str, params: dict) -> JobResponse:
+    try:
+        job = job_manager.submit(kind, params)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return JobResponse(job_id=job.id, status=job.status.value)
+
+
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs/text-to-image", response_model=JobResponse, status_code=202)
+async def submit_text_to_image_job(request: TextToImageRequest):
+    """Queue a text-to-image job and return its id immediately."""
+    _validate_output_format(request.output_format)
+    _validate_variants(request.num_images, request.seed, request.seeds)
+    _validate_prompt_options(request.style, request.tone)
+    sampling = _request_sampling(request)
+    _check_memory(request.model_id, *output_size(request.model_id, request.height, request.width), sampling["guidance_scale"])
+    params = request.model_dump()
+    params.update(sampling)
+    params["loras"] = _resolve_loras(request.loras)
+    _check_runtime_loras(request.model_id, sampling["profile"], params["loras"])
+    return _submit_job("text-to-image", params)
+
+
+@app.post("/jobs/image-to-image", response_model=JobResponse, status_code=202)
+async def submit_image_to_image_job(
+    image: UploadFile = File(...),
+    prompt: str = Form(...),
+    use_translation: bool = Form(True),
+    strength: float = Form(0.15),
+    guidance_scale: Optional[float] = Form(None),  # 기본 3.0 또는 프로필 값
+    num_inference_steps: Optional[int] = Form(None),  # 기본 20 또는 프로필 값
+    model_id: str = Form("stabilityai/stable-diffusion-xl-base-1.0"),
+    seed: Optional[int] = Form(None),
+    preview: bool = Form(False),
+    output_format: str = Form("png"),
+    quality: int = Form(90),
+    thumbnail: bool = Form(True),
+    loras: Optional[str] = Form(None),  # "name[:scale],..." / "none"
+    num_images: int = Form(1),
+    seeds: Optional[str] = Form(None),  # "1,2,3"
+    profile: Optional[str] = Form(None),  # quality, balanced, fast
+    style: Optional[str] = Form(None),  # 프롬프트 카탈로그 스타일
+    tone: Optional[str] = Form(None)  # 프롬프트 카탈로그 분위기
+):
+    """Queue an image-to-image job and return its id immediately."""
+    _validate_output_format(output_format)
+    seed_list = _parse_seeds_form(seeds)
+    _validate_variants(num_images, seed, seed_list)
+    lora_selections = _resolve_lora_form(loras)
+    _validate_prompt_options(style, tone)
+    sampling = _resolve_profile(profile, model_id, num_inference_steps, guidance_scale, strength)
+    _check_runtime_loras(model_id, sampling["profile"], lora_selections)
+    input_image = await _read_input_image(image, model_id)
+    _check_memory(model_id, input_image.height, input_image.width, sampling["guidance_scale"])
+    return _submit_job("image-to-image", {
+        "prompt": prompt,
+        "input_image": input_image,
+        "model_id": model_id,
+        "strength": strength,
+        **sampling,
+        "use_translation": use_translation,
+        "seed": seed,
+        "preview": preview,
+        "output_format": output_format,
+        "quality": quality,
+        "thumbnail": thumbnail,
+        "loras": lora_selections,
+        "num_images": num_images,
+        "seeds": seed_list,
+        "style": style,
+        "tone": tone,
+    })
+
+
+@app.get("/jobs")
+async def get_job_stats():
+    """Get queue depth and job counts."""
+    return job_manager.stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status (and result once finished) of a job."""
+    return _get_job_or_404(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job status, per-step progress and previews as Server-Sent Events."""
+    job = _get_job_or_404(job_id)
+
+    async def event_stream():
+        cursor = 0
+        while True:
+            events, cursor = job.events_since(cursor)
+            for event in events:
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            if not events and job.status in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(0.1)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, request: Request, index: int = 0, thumbnail: bool = False):
+    """Stream a finished job's image (or its thumbnail)."""
+    job = _get_job_or_404(job_id)
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status.value}")
+    image_paths = job.result["thumbnail_paths" if thumbnail else "image_paths"]
+    if not 0 <= index < len(image_paths):
+        raise HTTPException(status_code=404, detail="Image index out of range")
+    return _stored_image_response(image_paths[index], request)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+# 이미지 id는 내용이 바뀌지 않으므로 장기 캐시 허용
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _stored_image_response(image_id: str, request: Request) -> Response:
+    """Serve a stored image with ETag/Cache-Control and HTTP range support."""
+    path = get_output_store().resolve(image_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    etag = f'"{image_id}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    # FileResponse가 Range 요청(206)을 처리
+    return FileResponse(path, media_type=media_type_for(image_id), headers=headers)
+
+
+@app.get('/image/{image_id}')
+async def get_image(image_id: str, request: Request):
+    """Fetch a generated image by id."""
+    return _stored_image_response(image_id, request)
 
 
 
@@ -195,26 +757,131 @@ async def get_available_models():
             "name": "Stable Diffusion XL",
             "description": "High quality XL model (requires more memory)",
             "size": "6GB"
+        },
+        {
+            "id": "stabilityai/sdxl-turbo",
+            "name": "SDXL Turbo",
+            "description": "Distilled SDXL for 1-4 step generation at 512x512 (use the fast profile)",
+            "size": "7GB"
         }
     ]
-    return {"models": models}
+    # 요청별로 선택 가능한 속도 프로필 (모델 계열마다 스케줄러/스텝이 다름)
+    for model in models:
+        model["profiles"] = speed_profiles.describe(model["id"])
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return {
+        "models": models,
+        "device": device,
+        "default_profile": speed_profiles.default_profile(),
+        "schedulers": {
+            generator.model_id: generator.scheduler_stats()
+            for generator in get_registry().generators()
+        },
+        "cpu_optimization": describe_cpu_optimization() if device == "cpu" else None,
+    }
 
 
-@app.get("/elearning-options")
-async def get_elearning_options():
-    """Get available e-learning prompt options."""
-    from positive_prompts import ELEARNING_PROMPTS, ELEARNING_STYLES, ELEARNING_TONES
-    
+@app.get("/models/registry")
+async def get_model_registry():
+    """Get resident models and registry hit/miss/load-time statistics."""
+    return get_registry().stats()
+
+
+@app.get("/models/embeddings")
+async def get_prompt_embedding_stats():
+    """Get prompt embedding cache statistics per resident model."""
+    return {
+        generator.model_id: generator.embedding_stats()
+        for generator in get_registry().generators()
+    }
+
+
+@app.get("/models/memory")
+async def get_memory_plans():
+    """Get memory budget, applied memory savings and downgrade/rejection counts per model."""
+    return memory_planner.describe()
+
+
+@app.get("/models/latents")
+async def get_input_latent_stats():
+    """Get image-to-image input latent cache statistics per resident model."""
+    return {
+        generator.model_id: generator.latent_stats()
+        for generator in get_registry().generators()
+    }
+
+
+@app.get("/loras")
+async def get_loras():
+    """Get selectable LoRA adapters and the adapters resident on each model."""
     return {
-        "categories": {
-            category: list(subcategories.keys()) 
-            for category, subcategories in ELEARNING_PROMPTS.items()
+        "available": available_loras(),
+        "models": {
+            generator.model_id: generator.adapter_stats()
+            for generator in get_registry().generators()
         },
-        "styles": list(ELEARNING_STYLES.keys()),
-        "tones": list(ELEARNING_TONES.keys())
     }
 
 
+@app.get("/translator/stats")
+async def get_translator_stats():
+    """Get translation cache and batching statistics."""
+    return get_translator().stats()
+
+
+@app.get("/cache/stats")
+async def get_result_cache_stats():
+    """Get result cache hit/miss statistics."""
+    cache = get_result_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Get request batching statistics."""
+    return get_scheduler().stats()
+
+
+# 카탈로그는 프로세스 수명 동안 바뀌지 않으므로 짧게 캐시하고 ETag로 재검증
+CATALOG_CACHE_CONTROL = "public, max-age=3600"
+
+
+def _catalog_response(request: Request, etag: str, build: Callable[[], Any]) -> Response:
+    """JSON catalog response with ETag/Cache-Control; 304 without a body when the client's copy is current."""
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=build(), headers=headers)
+
+
+@app.get("/elearning-options")
+async def get_elearning_options(request: Request, detail: bool = False):
+    """Get available e-learning prompt options (detail=true includes every entry's prompt terms)."""
+    catalog = get_catalog()
+    if detail:
+        return _catalog_response(request, f"{catalog.etag}-detail", catalog.to_dict)
+    return _catalog_response(request, catalog.etag, catalog.options)
+
+
+@app.get("/elearning-options/prompt")
+async def get_elearning_prompt(
+    request: Request,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    style: Optional[str] = None,
+    tone: Optional[str] = None
+):
+    """Get the composed (deduplicated, token-budgeted) positive/negative prompt for a catalog selection."""
+    catalog = get_catalog()
+    try:
+        composed = catalog.compose(category, subcategory, style, tone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    selection = hashlib.sha1(json.dumps([category, subcategory, style, tone]).encode("utf-8")).hexdigest()[:12]
+    return _catalog_response(request, f"{catalog.etag}-{selection}", lambda: asdict(composed))
+
+
 def main():
     """Main function to run the FastAPI application."""
     port = int(os.getenv("PORT", 8000))
@@ -224,12 +891,14 @@ def main():
     print(f"📡 Server will be available at: http://{host}:{port}")
     print(f"📚 API Documentation: http://{host}:{port}/docs")
     
+    # 워커 모드(운영)에서는 자동 리로드를 끔: 리로더가 워커 프로세스를 중복 생성하지 않도록
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=True,
-        log_level="info"
+        reload=serving_mode() != "workers",
+        log_level="info",
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT_SECONDS)
     )
 
 
@@ -0,0 +1,348 @@
+"""
+Memory Planner
+
+Peak-memory estimates and per-call memory settings for the diffusion pipelines.
+
+Peak memory is modelled as the memory already in use (resident weights)
+plus UNet activations, which grow linearly with latent pixels and batch size
+and double under classifier-free guidance, plus the attention score matrices
+when the UNet does not use a memory-efficient attention kernel, plus VAE
+decode activations, which grow linearly with output pixels. The coefficients
+are rough defaults; on CUDA they are corrected per model from the peak
+memory observed on real calls.
+
+When a call would exceed the budget the planner turns on, in order, VAE
+slicing, VAE tiling, attention slicing and (CUDA only) sequential CPU
+offload. If the call still doesn't fit, it lowers the resolution
+(MEMORY_POLICY=downgrade) or rejects the request (MEMORY_POLICY=reject).
+"""
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+import torch
+
+from metrics import current_rss_bytes
+
+# 잠재 픽셀당 UNet 활성값 원소 수, 출력 픽셀당 VAE 디코딩 활성값 원소 수
+UNET_ACTIVATION_FACTOR = float(os.getenv("MEMORY_UNET_FACTOR", "32000"))
+VAE_ACTIVATION_FACTOR = float(os.getenv("MEMORY_VAE_FACTOR", "1500"))
+
+# 모델이 아직 로드되지 않았을 때 가정하는 가중치 파라미터 수
+DEFAULT_PARAMETERS = {"sd": 1.1e9, "sdxl": 3.5e9}
+
+# 어텐션 점수 행렬을 만들지 않는 프로세서
+_MEMORY_EFFICIENT_PROCESSORS = ("AttnProcessor2_0", "XFormersAttnProcessor", "SlicedAttnProcessor")
+
+
+class MemoryBudgetError(ValueError):
+    """Raised when a request cannot fit the memory budget."""
+
+
+@dataclass
+class MemoryPlan:
+    """Resolution, batch and memory-saving settings chosen for one pipeline call."""
+
+    height: int
+    width: int
+    batch_size: int
+    estimated_bytes: int
+    budget_bytes: int
+    attention_slicing: bool = False
+    vae_slicing: bool = False
+    vae_tiling: bool = False
+    sequential_offload: bool = False
+    downgraded: bool = False
+
+    @property
+    def fits(self) -> bool:
+        """Whether the estimate is within the budget."""
+        return self.estimated_bytes <= self.budget_bytes
+
+
+class MemoryPlanner:
+    """Estimates peak memory for one model and picks settings that fit the budget."""
+
+    def __init__(self, model_id: str, device: str, dtype: torch.dtype):
+        """Configure the planner for a model on a device."""
+        self.model_id = model_id
+        self.is_sdxl = "xl" in model_id.lower()
+        self.device = device
+        self.dtype_bytes = torch.tensor([], dtype=dtype).element_size()
+        self.weights_bytes: Optional[int] = None  # 로드 후 측정값
+        self.memory_efficient_attention = True
+        self.vae_tile_size = 1024 if self.is_sdxl else 512
+        self.vae_bytes = 4 if self.is_sdxl else self.dtype_bytes  # SDXL VAE는 float32로 업캐스트
+        self.offloaded = False
+        self.calibration = 1.0
+        self._applied = {"attention_slicing": False, "vae_slicing": False, "vae_tiling": False}
+        self._lock = threading.Lock()
+        self.plans = 0
+        self.adjusted = 0
+        self.downgrades = 0
+        self.rejections = 0
+
+    def bind(self, pipe, weights_bytes: int):
+        """Record the loaded pipeline's weight size, attention kernel and VAE tile size."""
+        self.weights_bytes = weights_bytes
+        processors = getattr(pipe.unet, "attn_processors", {})
+        self.memory_efficient_attention = all(
+            type(p).__name__ in _MEMORY_EFFICIENT_PROCESSORS for p in processors.values()
+        )
+        self.vae_tile_size = int(getattr(pipe.vae.config, "sample_size", self.vae_tile_size) or self.vae_tile_size)
+        force_upcast = getattr(pipe.vae.config, "force_upcast", False)
+        self.vae_bytes = 4 if force_upcast and pipe.vae.dtype == torch.float16 else pipe.vae.dtype.itemsize
+
+    def reset(self):
+        """Forget applied settings after the generator unloads its pipelines."""
+        self._applied = {"attention_slicing": False, "vae_slicing": False, "vae_tiling": False}
+        self.offloaded = False
+        self.weights_bytes = None
+
+    def estimate(
+        self,
+        height: int,
+        width: int,
+        batch_size: int,
+        guidance: bool = True,
+        attention_slicing: bool = False,
+        vae_slicing: bool = False,
+        vae_tiling: bool = False,
+        sequential_offload: bool = False
+    ) -> int:
+        """Estimated peak bytes for one pipeline call with the given settings."""
+        latent_pixels = (height // 8) * (width // 8)
+        unet_batch = batch_size * (2 if guidance else 1)
+        unet = latent_pixels * unet_batch * UNET_ACTIVATION_FACTOR * self.dtype_bytes
+
+        attention = 0.0
+        if not self.memory_efficient_attention:
+            # SD는 최고 해상도에서, SDXL은 1/2 해상도부터 셀프 어텐션 (헤드 8/10개)
+            tokens = latent_pixels / (4 if self.is_sdxl else 1)
+            heads = 10 if self.is_sdxl else 8
+            attention = unet_batch * heads * tokens * tokens * self.dtype_bytes
+            if attention_slicing:
+                attention /= 2  # slice_size="auto" = 헤드 절반씩
+
+        pixels = height * width
+        if vae_tiling:
+            pixels = min(pixels, self.vae_tile_size * self.vae_tile_size)
+        vae = pixels * (1 if vae_slicing else batch_size) * VAE_ACTIVATION_FACTOR * self.vae_bytes
+
+        activations = max(unet + attention, vae) * self.calibration
+        return int(self._resident_bytes(sequential_offload) + activations)
+
+    def plan(self, height: int, width: int, batch_size: int, guidance: bool = True) -> MemoryPlan:
+        """Choose memory settings (and, per MEMORY_POLICY, a lower resolution) for a call.
+
+        Raises MemoryBudgetError when nothing fits and downgrading is not allowed.
+        """
+        budget = memory_budget_bytes(self.device)
+        plan = self._fit(height, width, batch_size, guidance, budget)
+        with self._lock:
+            self.plans += 1
+            if plan.attention_slicing or plan.vae_slicing or plan.vae_tiling or plan.sequential_offload:
+                self.adjusted += 1
+        if plan.fits:
+            return plan
+
+        if memory_policy() == "downgrade":
+            # 픽셀 수를 줄여가며 맞는 해상도를 찾음 (최소 MEMORY_MIN_SIDE)
+            min_side = memory_min_side()
+            scale = 1.0
+            while True:
+                scale *= 0.9
+                new_height = max(8, int(height * scale) // 8 * 8)
+                new_width = max(8, int(width * scale) // 8 * 8)
+                if min(new_height, new_width) < min(min_side, height, width):
+                    break
+                smaller = self._fit(new_height, new_width, batch_size, guidance, budget)
+                if smaller.fits:
+                    with self._lock:
+                        self.downgrades += 1
+                    print(f"📉 메모리 부족으로 해상도 축소: {width}x{height} → {new_width}x{new_height}")
+                    return replace(smaller, downgraded=True)
+
+        with self._lock:
+            self.rejections += 1
+        raise MemoryBudgetError(
+            f"{width}x{height} (batch {batch_size}) needs ~{plan.estimated_bytes / 1024 ** 3:.1f} GB "
+            f"but the memory budget is {budget / 1024 ** 3:.1f} GB"
+        )
+
+    def fits(self, height: int, width: int, batch_size: int = 1, guidance: bool = True) -> bool:
+        """Whether a call fits the budget with every available memory saving."""
+        return self._fit(height, width, batch_size, guidance, memory_budget_bytes(self.device)).fits
+
+    def max_batch_size(self, height: int, width: int, limit: int, guidance: bool = True) -> int:
+        """Largest batch (up to limit, at least 1) that fits the budget with memory savings."""
+        budget = memory_budget_bytes(self.device)
+        for batch_size in range(limit, 1, -1):
+            if self._fit(height, width, batch_size, guidance, budget).fits:
+                return batch_size
+        return 1
+
+    def apply(self, pipe, plan: MemoryPlan, keep: Optional[Dict[str, bool]] = None):
+        """Switch the pipeline's memory settings to the plan (settings in keep are never turned off)."""
+        keep = keep or {}
+        vae = pipe.vae
+        wanted = {
+            "attention_slicing": plan.attention_slicing or keep.get("attention_slicing", False),
+            "vae_slicing": plan.vae_slicing or keep.get("vae_slicing", False),
+            "vae_tiling": plan.vae_tiling or keep.get("vae_tiling", False),
+        }
+        # 텍스트/img2img 파이프라인이 UNet과 VAE를 공유하므로 변경이 있을 때만 전환
+        if wanted["attention_slicing"] != self._applied["attention_slicing"]:
+            if wanted["attention_slicing"]:
+                pipe.enable_attention_slicing()
+            else:
+                pipe.disable_attention_slicing()
+        if wanted["vae_slicing"] != self._applied["vae_slicing"]:
+            if wanted["vae_slicing"]:
+                vae.enable_slicing()
+            else:
+                vae.disable_slicing()
+        if wanted["vae_tiling"] != self._applied["vae_tiling"]:
+            if wanted["vae_tiling"]:
+                vae.enable_tiling()
+            else:
+                vae.disable_tiling()
+        self._applied = wanted
+
+        if plan.sequential_offload and not self.offloaded:
+            # 되돌릴 수 없으므로 이후 모든 호출에 유지
+            pipe.enable_sequential_cpu_offload()
+            self.offloaded = True
+            print(f"💾 Sequential CPU offload enabled for {self.model_id}")
+
+    def observe(self, plan: MemoryPlan, resident_before: int, peak_bytes: int):
+        """Correct the activation coefficients from a measured peak (CUDA allocator only)."""
+        if self.device != "cuda":
+            return
+        estimated = plan.estimated_bytes - resident_before
+        if estimated <= 0 or peak_bytes <= resident_before:
+            return
+        ratio = (peak_bytes - resident_before) / (estimated / self.calibration)
+        with self._lock:
+            # 지수 이동 평균, 극단값은 제한
+            self.calibration = min(4.0, max(0.25, 0.8 * self.calibration + 0.2 * ratio))
+
+    def resident_bytes(self) -> int:
+        """Memory in use before a call (device allocator on CUDA, process RSS on CPU)."""
+        return self._resident_bytes(False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Planner settings and counters."""
+        with self._lock:
+            return {
+                "budget_bytes": memory_budget_bytes(self.device),
+                "policy": memory_policy(),
+                "weights_bytes": self.weights_bytes,
+                "memory_efficient_attention": self.memory_efficient_attention,
+                "calibration": round(self.calibration, 3),
+                "offloaded": self.offloaded,
+                "applied": dict(self._applied),
+                "plans": self.plans,
+                "adjusted": self.adjusted,
+                "downgrades": self.downgrades,
+                "rejections": self.rejections,
+            }
+
+    def _fit(self, height: int, width: int, batch_size: int, guidance: bool, budget: int) -> MemoryPlan:
+        """Cheapest settings that fit, or every saving enabled if none do."""
+        settings: Dict[str, bool] = {"sequential_offload": self.offloaded}
+        steps = ["vae_slicing", "vae_tiling"]
+        if not self.memory_efficient_attention:
+            steps.append("attention_slicing")
+        if self.device == "cuda" and memory_offload_allowed():
+            steps.append("sequential_offload")
+        steps = [None] + steps
+
+        estimated = 0
+        for step in steps:
+            if step is not None:
+                if step == "vae_slicing" and batch_size == 1:
+                    continue
+                settings[step] = True
+            estimated = self.estimate(height, width, batch_size, guidance, **settings)
+            if estimated <= budget:
+                break
+        return MemoryPlan(height, width, batch_size, estimated, budget, **settings)
+
+    def _resident_bytes(self, sequential_offload: bool) -> int:
+        if self.device == "cuda":
+            in_use = torch.cuda.memory_allocated()
+        else:
+            in_use = current_rss_bytes()
+        weights = self.weights_bytes
+        if weights is None:
+            # 아직 로드되지 않은 모델의 가중치를 더함
+            weights = int(DEFAULT_PARAMETERS["sdxl" if self.is_sdxl else "sd"] * self.dtype_bytes)
+            in_use += weights
+        if sequential_offload or self.offloaded:
+            # 가중치는 CPU에 두고 실행 중인 서브모듈만 GPU로 옮김
+            in_use -= int(weights * 0.9)
+        return max(0, in_use)
+
+
+def memory_budget_bytes(device: str) -> int:
+    """Memory a pipeline call may use in total (MEMORY_BUDGET_GB or a fraction of device/system memory)."""
+    explicit = os.getenv("MEMORY_BUDGET_GB")
+    if explicit:
+        return int(float(explicit) * 1024 ** 3)
+    fraction = float(os.getenv("MEMORY_BUDGET_FRACTION", "0.9"))
+    if device == "cuda":
+        total = torch.cuda.get_device_properties(torch.cuda.current_device()).total_memory
+    else:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return int(total * fraction)
+
+
+def memory_policy() -> str:
+    """What to do with requests that don't fit: downgrade (lower the resolution) or reject."""
+    policy = os.getenv("MEMORY_POLICY", "downgrade").lower()
+    return policy if policy in ("downgrade", "reject") else "downgrade"
+
+
+def memory_min_side() -> int:
+    """Smallest side a downgrade may produce."""
+    return int(os.getenv("MEMORY_MIN_SIDE", "512"))
+
+
+def memory_offload_allowed() -> bool:
+    """Whether the planner may enable sequential CPU offload on CUDA."""
+    return os.getenv("MEMORY_ALLOW_OFFLOAD", "true").lower() in ("1", "true", "yes")
+
+
+def memory_planning_enabled() -> bool:
+    """Whether pipeline calls are planned against the memory budget."""
+    return os.getenv("MEMORY_PLANNER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+_planners: Dict[str, MemoryPlanner] = {}
+_planners_lock = threading.Lock()
+
+
+def get_planner(model_id: str, device: Optional[str] = None, dtype: Optional[torch.dtype] = None) -> MemoryPlanner:
+    """Return the process-wide planner for a model (shared by its generator and the scheduler)."""
+    with _planners_lock:
+        planner = _planners.get(model_id)
+        if planner is None:
+            device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+            planner = _planners[model_id] = MemoryPlanner(
+                model_id, device, dtype or (torch.float16 if device == "cuda" else torch.float32)
+            )
+        elif dtype is not None:
+            # 스케줄러가 먼저 만든 플래너는 생성기의 실제 dtype으로 갱신
+            planner.dtype_bytes = torch.tensor([], dtype=dtype).element_size()
+        return planner
+
+
+def describe() -> Dict[str, Any]:
+    """Per-model planner stats, for /models/memory."""
+    with _planners_lock:
+        planners = list(_planners.values())
+    return {planner.model_id: planner.stats() for planner in planners}
+
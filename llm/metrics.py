@@ -0,0 +1,271 @@
+"""
+Metrics
+
+Prometheus-style counters, gauges and histograms with a text exposition
+renderer, plus optional structured JSON logging.
+
+The metrics are process-local. In worker mode each inference worker ships a
+snapshot with its heartbeat and the API process merges them under a
+"worker" label, so a single /metrics scrape covers the whole service.
+"""
+
+import abc
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+MEMORY_BUCKETS = tuple(float(2 ** i) * 1024 ** 2 for i in range(8, 17))  # 256MB ~ 64GB
+
+# (sample 이름, 라벨, 값)
+Sample = Tuple[str, Dict[str, str], float]
+# 이름 -> {"type", "help", "samples"}
+Families = Dict[str, Dict[str, Any]]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    @abc.abstractmethod
+    def samples(self) -> List[Sample]:
+        """Current (name, labels, value) samples for exposition."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        """Increase the counter for a label set."""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(f"{self.name}_total", dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: Any):
+        """Set the gauge for a label set."""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 -> (버킷별 누적 개수, 합계, 개수)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        """Record one observation."""
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Observe the duration of a block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(key)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", dict(labels, le=repr(bound)), bucket_count))
+                samples.append((f"{self.name}_bucket", dict(labels, le="+Inf"), count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+_metrics: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]):
+    """Register a callback yielding (name, type, help, labels, value) at scrape time."""
+    _collectors.append(collector)
+
+
+def collect() -> Families:
+    """Snapshot every metric and collector of this process."""
+    families: Families = {}
+    for metric in _metrics:
+        families[metric.name] = {"type": metric.type, "help": metric.documentation, "samples": metric.samples()}
+    for collector in _collectors:
+        try:
+            for name, metric_type, documentation, labels, value in collector():
+                family = families.setdefault(name, {"type": metric_type, "help": documentation, "samples": []})
+                family["samples"].append((name, {k: str(v) for k, v in labels.items()}, value))
+        except Exception as e:
+            print(f"⚠️  Metrics collector failed: {e}")
+    return families
+
+
+def merge(families: Families, other: Families, **labels: Any):
+    """Add another process's snapshot into families, tagging its samples with labels."""
+    extra = {k: str(v) for k, v in labels.items()}
+    for name, family in other.items():
+        target = families.setdefault(name, {"type": family["type"], "help": family["help"], "samples": []})
+        target["samples"].extend((sample, dict(sample_labels, **extra), value) for sample, sample_labels, value in family["samples"])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: Optional[Families] = None) -> str:
+    """Render families in the Prometheus text exposition format."""
+    families = collect() if families is None else families
+    lines = []
+    for name, family in families.items():
+        if not family["samples"]:
+            continue
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for sample, labels, value in family["samples"]:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{sample}{{{label_text}}} {value}" if label_text else f"{sample} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # /proc 이 없는 환경: 프로세스 최대 RSS로 대체 (Linux는 KB 단위)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# 단계별 지연 시간
+TRANSLATION_SECONDS = Histogram("translation_seconds", "Translation model generate() time per batch")
+PIPELINE_LOAD_SECONDS = Histogram("pipeline_load_seconds", "Time to load a pipeline from disk")
+TEXT_ENCODE_SECONDS = Histogram("text_encode_seconds", "Prompt encoding time per pipeline call")
+DENOISE_STEP_SECONDS = Histogram("denoise_step_seconds", "Time per denoising step")
+VAE_DECODE_SECONDS = Histogram("vae_decode_seconds", "Time from the last denoising step to decoded images (VAE decode and postprocess)")
+PIPELINE_CALL_SECONDS = Histogram("pipeline_call_seconds", "Total pipeline call time per batch")
+IMAGE_ENCODE_SECONDS = Histogram("image_encode_seconds", "Output image encoding time")
+IMAGE_SAVE_SECONDS = Histogram("image_save_seconds", "Output image write time")
+GENERATION_SECONDS = Histogram("generation_seconds", "End-to-end generation time including queueing")
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency")
+LORA_SWAP_SECONDS = Histogram("lora_swap_seconds", "LoRA adapter load/evict/fuse/unfuse and total swap time")
+VAE_ENCODE_SECONDS = Histogram("vae_encode_seconds", "Image-to-image input VAE encode time (latent cache misses)")
+
+# 카운터
+REQUESTS = Counter("http_requests", "HTTP requests by endpoint and status")
+ERRORS = Counter("errors", "Failed requests and generations")
+GENERATIONS = Counter("generations", "Generated images")
+
+# 요청별 최대 메모리
+PEAK_MEMORY_BYTES = Histogram("pipeline_peak_memory_bytes", "Peak memory per pipeline call (CUDA allocator peak, or process RSS on CPU)", MEMORY_BUCKETS)
+
+
+def json_logs_enabled() -> bool:
+    """Whether LOG_FORMAT=json is set."""
+    return os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+
+def log_event(event: str, **fields: Any):
+    """Emit a structured event (a JSON line when JSON logging is on)."""
+    if json_logs_enabled():
+        record = {"ts": time.time(), "event": event, **fields}
+        _write_raw(json.dumps(record, ensure_ascii=False, default=str))
+    else:
+        details = " ".join(f"{k}={v}" for k, v in fields.items())
+        print(f"📈 {event} {details}")
+
+
+_raw_stdout = sys.stdout
+
+
+def _write_raw(line: str):
+    _raw_stdout.write(line + "\n")
+    _raw_stdout.flush()
+
+
+class _JsonLineWriter:
+    """stdout replacement that turns print() output into JSON log lines."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self._buffer += text
+            while "\n" in self._buffer:
+                line, self._buffer = self._buffer.split("\n", 1)
+                if line.strip():
+                    record = {"ts": time.time(), "event": "log", "thread": threading.current_thread().name, "message": line}
+                    self._stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+def install_json_logging():
+    """Route print() output through the JSON line writer when LOG_FORMAT=json."""
+    if json_logs_enabled() and not isinstance(sys.stdout, _JsonLineWriter):
+        sys.stdout = _JsonLineWriter(_raw_stdout)
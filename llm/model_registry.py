@@ -0,0 +1,202 @@
+"""
+Model Registry
+
+Process-wide cache of warm StableDiffusionGenerator instances.
+
+Generators are keyed by (model_id, lora_weights, dtype, device) and kept
+resident until the configured memory budget is exceeded, at which point the
+least recently used ones are unloaded. An unloaded generator is retired
+(see StableDiffusionGenerator.unload); callers get a fresh one from get().
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from image_generator import StableDiffusionGenerator
+
+RegistryKey = Tuple[str, Optional[str], str, str]
+
+
+class ModelRegistry:
+    """Thread-safe LRU registry of loaded generators."""
+
+    def __init__(self, max_memory_bytes: Optional[int] = None, max_models: Optional[int] = None):
+        """Initialize the registry with an optional memory budget and model cap."""
+        self.max_memory_bytes = max_memory_bytes
+        self.max_models = max_models
+        self._entries: "OrderedDict[RegistryKey, StableDiffusionGenerator]" = OrderedDict()
+        self._sizes: Dict[RegistryKey, int] = {}
+        self._load_times: Dict[RegistryKey, float] = {}
+        self._key_locks: Dict[RegistryKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_seconds = 0.0
+
+    def get(self, model_id: str, lora_weights: Optional[str] = None) -> StableDiffusionGenerator:
+        """Return a warm generator, loading it on a miss."""
+        # 히트 경로에서는 생성기를 만들지 않고 키만 계산
+        key = StableDiffusionGenerator.make_cache_key(model_id, lora_weights)
+
+        with self._lock:
+            generator = self._entries.get(key)
+            if generator is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return generator
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 같은 모델을 동시에 두 번 로드하지 않도록 키 단위로 직렬화
+        with key_lock:
+            with self._lock:
+                generator = self._entries.get(key)
+                if generator is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return generator
+                self.misses += 1
+
+            candidate = StableDiffusionGenerator(model_id, lora_weights)
+            start = time.perf_counter()
+            candidate.load_text_pipeline()
+            elapsed = time.perf_counter() - start
+            size = candidate.memory_footprint()
+            print(f"📦 Registry loaded {model_id} in {elapsed:.1f}s ({size / 1024 ** 3:.2f} GB)")
+
+            with self._lock:
+                candidate.on_pipeline_loaded = self.refresh_size
+                self._entries[key] = candidate
+                self._sizes[key] = size
+                self._load_times[key] = elapsed
+                self.total_load_seconds += elapsed
+                self._evict_locked(keep=key)
+            return candidate
+
+    def refresh_size(self, generator: StableDiffusionGenerator):
+        """Re-measure a generator after it loaded additional pipelines."""
+        with self._lock:
+            key = generator.cache_key
+            if self._entries.get(key) is generator:
+                self._sizes[key] = generator.memory_footprint()
+                self._evict_locked(keep=key)
+
+    def evict(self, model_id: str, lora_weights: Optional[str] = None) -> bool:
+        """Explicitly unload a generator. Returns True if it was resident."""
+        key = StableDiffusionGenerator.make_cache_key(model_id, lora_weights)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove_locked(key)
+        self._release_memory()
+        return True
+
+    def clear(self):
+        """Unload every resident generator."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_locked(key)
+        self._release_memory()
+
+    def generators(self) -> List[StableDiffusionGenerator]:
+        """Resident generators, least recently used first."""
+        with self._lock:
+            return list(self._entries.values())
+
+    def total_memory(self) -> int:
+        """Bytes currently accounted to resident generators."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, load times and resident models."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "total_load_seconds": round(self.total_load_seconds, 3),
+                "memory_bytes": sum(self._sizes.values()),
+                "max_memory_bytes": self.max_memory_bytes,
+                "max_models": self.max_models,
+                "models": [
+                    {
+                        "model_id": key[0],
+                        "lora_weights": key[1],
+                        "dtype": key[2],
+                        "device": key[3],
+                        "memory_bytes": self._sizes.get(key, 0),
+                        "load_seconds": round(self._load_times.get(key, 0.0), 3),
+                    }
+                    # 최근 사용 순서 (마지막이 가장 최근)
+                    for key in self._entries
+                ],
+            }
+
+    def _over_budget_locked(self) -> bool:
+        if self.max_models is not None and len(self._entries) > self.max_models:
+            return True
+        if self.max_memory_bytes is not None and sum(self._sizes.values()) > self.max_memory_bytes:
+            return True
+        return False
+
+    def _evict_locked(self, keep: RegistryKey):
+        evicted = False
+        while self._over_budget_locked():
+            victim = next((key for key in self._entries if key != keep), None)
+            if victim is None:
+                break
+            print(f"♻️  Evicting {victim[0]} from registry")
+            self._remove_locked(victim)
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            self._release_memory()
+
+    def _remove_locked(self, key: RegistryKey):
+        generator = self._entries.pop(key)
+        self._sizes.pop(key, None)
+        self._load_times.pop(key, None)
+        generator.on_pipeline_loaded = None
+        # 추론 중이면 끝난 뒤 해제되며 잠금을 기다리지 않음
+        generator.unload()
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _env_gb(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(float(value) * 1024 ** 3) if value else None
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide registry, configured from the environment."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(
+                max_memory_bytes=_env_gb("MODEL_REGISTRY_MAX_MEMORY_GB"),
+                max_models=_env_int("MODEL_REGISTRY_MAX_MODELS"),
+            )
+        return _registry
@@ -44,7 +44,3 @@ STRONG_NEGATIVE_PROMPTS = [
     "bokeh, motion blur, chromatic aberration, lens flare, film grain, high dynamic range",
     "photogrammetry, photoscan, lidar scan, 3D scan, real life, real world"
 ]
-
-def get_strong_negative_prompt():
-    """Get a comprehensive negative prompt to prevent weird results."""
-    return ", ".join(STRONG_NEGATIVE_PROMPTS)
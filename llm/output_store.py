@@ -0,0 +1,172 @@
+"""
+Output Store
+
+Collision-free storage for generated images.
+
+Every result gets a unique id and is written atomically into a sharded
+directory layout (ab/cd/<id>.png). Files are swept after a TTL and when the
+store grows past its size budget, and only ids issued by the store can be
+resolved back to a path.
+"""
+
+import io
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from metrics import IMAGE_SAVE_SECONDS
+
+_IMAGE_ID_RE = re.compile(r"^[0-9a-f]{32}\.(png|jpg|webp|avif)$")
+
+_MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+
+def media_type_for(image_id: str) -> str:
+    """MIME type for a stored image id based on its extension."""
+    return _MEDIA_TYPES.get(image_id.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def encode_png(image: Image.Image) -> bytes:
+    """PNG-encode an image, reusing the file bytes when it was opened from a PNG on disk."""
+    source = getattr(image, "filename", None)
+    if source and image.format == "PNG":
+        try:
+            with open(source, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # 캐시 축출 등으로 원본이 사라졌으면 로드된 픽셀로 다시 인코딩
+            pass
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class OutputStore:
+    """Sharded on-disk store for generated images with TTL and size-based retention."""
+
+    def __init__(self, directory: str, ttl_seconds: Optional[float] = None, max_bytes: Optional[int] = None):
+        """Create the storage directory if needed."""
+        self.directory = os.path.abspath(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.removed = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, image_id: str) -> str:
+        """On-disk location of an image id."""
+        return os.path.join(self.directory, image_id[:2], image_id[2:4], image_id)
+
+    def save(self, image: Image.Image) -> str:
+        """Store an image as PNG and return its id."""
+        return self.save_bytes(encode_png(image), "png")
+
+    def save_bytes(self, data: bytes, extension: str) -> str:
+        """Store already-encoded image bytes and return the new id."""
+        image_id = f"{uuid.uuid4().hex}.{extension}"
+        path = self.path_for(image_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with IMAGE_SAVE_SECONDS.time():
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return image_id
+
+    def resolve(self, image_id: str) -> Optional[str]:
+        """Return the file path for a valid, existing id (never an arbitrary path)."""
+        if not _IMAGE_ID_RE.match(image_id):
+            return None
+        path = self.path_for(image_id)
+        return path if os.path.isfile(path) else None
+
+    def sweep(self) -> int:
+        """Delete expired files, then the oldest ones until under the size budget."""
+        files: List[Tuple[float, int, str]] = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            expired = self.ttl_seconds is not None and now - mtime > self.ttl_seconds
+            over_budget = self.max_bytes is not None and total > self.max_bytes
+            if not expired and not over_budget:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            self.removed += removed
+            print(f"🧹 Removed {removed} expired output file(s)")
+        return removed
+
+    def start_sweeper(self, interval_seconds: float):
+        """Run sweep() periodically on a background thread."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"⚠️  Output sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="output-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retention settings and sweep counters."""
+        return {
+            "directory": self.directory,
+            "ttl_seconds": self.ttl_seconds,
+            "max_bytes": self.max_bytes,
+            "removed": self.removed,
+        }
+
+
+_store: Optional[OutputStore] = None
+_store_lock = threading.Lock()
+
+
+def get_output_store() -> OutputStore:
+    """Return the process-wide output store, configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl_hours = os.getenv("OUTPUT_TTL_HOURS", "24")
+            max_mb = os.getenv("OUTPUT_MAX_MB", "4096")
+            _store = OutputStore(
+                directory=os.getenv("OUTPUT_DIR", "outputs"),
+                ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else None,
+                max_bytes=int(float(max_mb) * 1024 ** 2) if max_mb else None,
+            )
+            _store.start_sweeper(float(os.getenv("OUTPUT_SWEEP_INTERVAL_SECONDS", "300")))
+        return _store
@@ -3,6 +3,70 @@ POSITIVE_PROMPTS = [
 ]
 
 
-def get_positive_prompts():
-    """Get a comprehensive positive prompt to prevent weird results."""
-    return ", ".join(POSITIVE_PROMPTS)
\ No newline at end of file
+# 이러닝 주제 카테고리 -> 세부 주제 -> 장면 묘사
+ELEARNING_PROMPTS = {
+    "business": {
+        "meeting": "team meeting around a table, colleagues discussing ideas, office setting",
+        "presentation": "presenter pointing at a chart on a screen, audience listening, conference room",
+        "teamwork": "diverse team collaborating on a project, sticky notes on a board",
+        "customer_service": "friendly support agent with a headset helping a customer",
+        "negotiation": "two professionals shaking hands across a desk, agreement reached",
+    },
+    "technology": {
+        "coding": "developer writing code on a laptop, code editor on screen",
+        "data_analysis": "analyst reviewing dashboards with bar charts and line graphs",
+        "cybersecurity": "shield and padlock protecting a computer network, secure data",
+        "online_learning": "student taking an online course on a laptop at home",
+        "artificial_intelligence": "friendly robot assistant next to a person at a computer",
+    },
+    "science": {
+        "biology": "plant cell diagram with labeled parts, microscope on a lab bench",
+        "chemistry": "laboratory flasks and test tubes with colorful liquids, molecule model",
+        "physics": "pendulum and gears demonstrating motion, simple machine diagram",
+        "environment": "green landscape with wind turbines and solar panels, recycling",
+    },
+    "safety": {
+        "workplace_safety": "worker wearing a hard hat and safety vest, warning signs",
+        "fire_safety": "fire extinguisher and emergency exit sign, evacuation route",
+        "first_aid": "first aid kit and a person applying a bandage",
+        "data_privacy": "personal data folder with a lock, privacy protection",
+    },
+    "soft_skills": {
+        "communication": "two people talking with speech bubbles, active listening",
+        "leadership": "team leader guiding a group toward a goal flag",
+        "time_management": "calendar, clock and checklist on a desk, organized schedule",
+        "problem_solving": "person connecting puzzle pieces, lightbulb idea",
+    },
+}
+
+# 그림 스타일 -> 추가 긍정/부정 프롬프트
+ELEARNING_STYLES = {
+    "flat_illustration": {
+        "positive": "flat design style, clean vector style, simple shapes, solid colors, modern illustration",
+        "negative": "photorealistic, realistic, photo, 3D render, gradients, heavy shading, texture",
+    },
+    "infographic": {
+        "positive": "educational infographic, icons, clear layout, labeled diagram, clean vector style",
+        "negative": "photorealistic, photo, 3D render, cluttered layout, busy background",
+    },
+    "cartoon": {
+        "positive": "friendly cartoon style, rounded characters, bright colors, approachable illustration",
+        "negative": "photorealistic, realistic, photo, 3D render, scary, dark, gritty",
+    },
+    "line_art": {
+        "positive": "minimal line art, thin outlines, limited color palette, white background",
+        "negative": "photorealistic, photo, 3D render, heavy shading, color gradients, painterly",
+    },
+    "isometric": {
+        "positive": "isometric illustration, 3/4 top view, clean geometric shapes, soft colors",
+        "negative": "photorealistic, photo, perspective distortion, fisheye, cluttered",
+    },
+}
+
+# 분위기 -> 추가 긍정 프롬프트
+ELEARNING_TONES = {
+    "professional": "professional, business-like illustration, formal education style, clean professional appearance",
+    "friendly": "warm and welcoming, approachable illustration, smiling people, inclusive education visual",
+    "calm": "calm and peaceful illustration, soft pastel colors, relaxed learning environment",
+    "energetic": "vibrant colors, dynamic composition, inspiring learning atmosphere, motivating",
+}
@@ -0,0 +1,244 @@
+"""
+Prompt Catalog
+
+E-learning prompt categories, styles and tones, indexed once, plus
+deduplicated, token-budgeted composition of positive/negative prompts.
+
+Prompts are lists of comma-separated terms. Composition concatenates the
+subject, style, tone and base terms in priority order, drops repeated terms
+(case and whitespace insensitive) and stops adding terms once the token
+budget is reached, so the text encoder sees as few 75-token chunks as
+possible. Composed prompts are cached per (category, subcategory, style,
+tone) and the catalog carries a content hash used as its ETag.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from negative_prompts import STRONG_NEGATIVE_PROMPTS
+from positive_prompts import ELEARNING_PROMPTS, ELEARNING_STYLES, ELEARNING_TONES, POSITIVE_PROMPTS
+
+# CLIP BPE 토큰 수 근사: 단어와 구두점을 각각 하나로 셈
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@dataclass(frozen=True)
+class ComposedPrompt:
+    """Positive/negative prompt for one catalog selection."""
+
+    positive: str
+    negative: str
+    positive_tokens: int
+    negative_tokens: int
+    dropped: Tuple[str, ...] = ()  # 토큰 예산 때문에 제외된 항목
+
+
+def split_terms(texts: Iterable[str]) -> List[str]:
+    """Comma-separated prompts to a flat list of stripped terms."""
+    return [term.strip() for text in texts for term in text.split(",") if term.strip()]
+
+
+def dedupe_terms(terms: Iterable[str]) -> List[str]:
+    """Drop repeated terms, keeping the first occurrence (case and whitespace insensitive)."""
+    seen = set()
+    unique = []
+    for term in terms:
+        key = " ".join(term.lower().split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(term)
+    return unique
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate CLIP token count of a prompt."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def fit_terms(terms: List[str], budget: int) -> Tuple[List[str], List[str]]:
+    """(kept, dropped): terms in priority order up to the first one that exceeds the budget (0 = unlimited).
+
+    Everything from that term on is dropped, so a lower-priority term is
+    never kept while a higher-priority one is cut.
+    """
+    if budget <= 0:
+        return terms, []
+    kept: List[str] = []
+    dropped: List[str] = []
+    used = 0
+    for term in terms:
+        # 구분자 ", " 도 토큰 하나
+        cost = estimate_tokens(term) + (1 if kept else 0)
+        if used + cost > budget:
+            dropped = terms[len(kept):]
+            break
+        kept.append(term)
+        used += cost
+    return kept, dropped
+
+
+def positive_token_budget() -> int:
+    """Token budget for composed positive prompts (0 = unlimited)."""
+    return int(os.getenv("PROMPT_POSITIVE_TOKEN_BUDGET", "75"))
+
+
+def negative_token_budget() -> int:
+    """Token budget for composed negative prompts (0 = unlimited)."""
+    return int(os.getenv("PROMPT_NEGATIVE_TOKEN_BUDGET", "150"))
+
+
+class PromptCatalog:
+    """Indexed categories/styles/tones with cached prompt composition."""
+
+    def __init__(
+        self,
+        prompts: Mapping[str, Mapping[str, str]],
+        styles: Mapping[str, Mapping[str, str]],
+        tones: Mapping[str, str],
+        base_positive: Iterable[str],
+        base_negative: Iterable[str],
+        positive_budget: int = 75,
+        negative_budget: int = 150
+    ):
+        """Split every entry into deduplicated terms once."""
+        self._subjects: Dict[str, Dict[str, Tuple[str, ...]]] = {
+            category: {name: tuple(dedupe_terms(split_terms([text]))) for name, text in subcategories.items()}
+            for category, subcategories in prompts.items()
+        }
+        self._styles: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+            name: (
+                tuple(dedupe_terms(split_terms([style.get("positive", "")]))),
+                tuple(dedupe_terms(split_terms([style.get("negative", "")]))),
+            )
+            for name, style in styles.items()
+        }
+        self._tones: Dict[str, Tuple[str, ...]] = {
+            name: tuple(dedupe_terms(split_terms([text]))) for name, text in tones.items()
+        }
+        self._base_positive = tuple(dedupe_terms(split_terms(base_positive)))
+        self._base_negative = tuple(dedupe_terms(split_terms(base_negative)))
+        self.positive_budget = positive_budget
+        self.negative_budget = negative_budget
+        # 카탈로그는 고정이므로 조합 결과를 무제한 캐시 (조합 수가 유한)
+        self._compose = lru_cache(maxsize=None)(self._compose_uncached)
+        self.etag = hashlib.sha256(
+            json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def options(self) -> Dict[str, Any]:
+        """Category/subcategory, style and tone names."""
+        return {
+            "categories": {category: list(subcategories) for category, subcategories in self._subjects.items()},
+            "styles": list(self._styles),
+            "tones": list(self._tones),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full catalog with every entry's terms and the composition budgets."""
+        return {
+            "categories": {
+                category: {name: ", ".join(terms) for name, terms in subcategories.items()}
+                for category, subcategories in self._subjects.items()
+            },
+            "styles": {
+                name: {"positive": ", ".join(positive), "negative": ", ".join(negative)}
+                for name, (positive, negative) in self._styles.items()
+            },
+            "tones": {name: ", ".join(terms) for name, terms in self._tones.items()},
+            "positive_token_budget": self.positive_budget,
+            "negative_token_budget": self.negative_budget,
+        }
+
+    def validate(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        style: Optional[str] = None,
+        tone: Optional[str] = None
+    ):
+        """Raise ValueError for names that aren't in the catalog."""
+        if subcategory is not None and category is None:
+            raise ValueError("subcategory requires a category")
+        if category is not None and category not in self._subjects:
+            raise ValueError(f"Unknown category: {category}. Available: {list(self._subjects)}")
+        if subcategory is not None and subcategory not in self._subjects[category]:
+            raise ValueError(f"Unknown subcategory: {subcategory}. Available: {list(self._subjects[category])}")
+        if style is not None and style not in self._styles:
+            raise ValueError(f"Unknown style: {style}. Available: {list(self._styles)}")
+        if tone is not None and tone not in self._tones:
+            raise ValueError(f"Unknown tone: {tone}. Available: {list(self._tones)}")
+
+    def compose(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        style: Optional[str] = None,
+        tone: Optional[str] = None
+    ) -> ComposedPrompt:
+        """Deduplicated, budgeted prompts for a selection (cached). Raises ValueError for unknown names."""
+        self.validate(category, subcategory, style, tone)
+        return self._compose(category, subcategory, style, tone)
+
+    def cache_info(self) -> Dict[str, int]:
+        """Composition cache counters."""
+        info = self._compose.cache_info()
+        return {"entries": info.currsize, "hits": info.hits, "misses": info.misses}
+
+    def _compose_uncached(
+        self,
+        category: Optional[str],
+        subcategory: Optional[str],
+        style: Optional[str],
+        tone: Optional[str]
+    ) -> ComposedPrompt:
+        subject: Tuple[str, ...] = ()
+        if category is not None:
+            subcategories = self._subjects[category]
+            names = [subcategory] if subcategory is not None else list(subcategories)
+            subject = tuple(term for name in names for term in subcategories[name])
+        style_positive, style_negative = self._styles[style] if style is not None else ((), ())
+        tone_terms = self._tones[tone] if tone is not None else ()
+
+        # 우선순위: 주제 > 스타일 > 분위기 > 공통 프롬프트 (예산 초과 시 뒤쪽부터 제외)
+        positive, dropped_positive = fit_terms(
+            dedupe_terms(subject + style_positive + tone_terms + self._base_positive), self.positive_budget
+        )
+        negative, dropped_negative = fit_terms(
+            dedupe_terms(style_negative + self._base_negative), self.negative_budget
+        )
+        positive_text = ", ".join(positive)
+        negative_text = ", ".join(negative)
+        return ComposedPrompt(
+            positive=positive_text,
+            negative=negative_text,
+            positive_tokens=estimate_tokens(positive_text),
+            negative_tokens=estimate_tokens(negative_text),
+            dropped=tuple(dropped_positive + dropped_negative),
+        )
+
+
+_catalog: Optional[PromptCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> PromptCatalog:
+    """Return the process-wide catalog, built on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = PromptCatalog(
+                ELEARNING_PROMPTS,
+                ELEARNING_STYLES,
+                ELEARNING_TONES,
+                POSITIVE_PROMPTS,
+                STRONG_NEGATIVE_PROMPTS,
+                positive_token_budget(),
+                negative_token_budget(),
+            )
+        return _catalog
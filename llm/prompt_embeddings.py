@@ -0,0 +1,224 @@
+"""
+Prompt Embeddings
+
+Cached text-encoder outputs for a loaded pipeline.
+
+CLIP only sees 77 tokens, so long prompts are split into 75-token chunks that
+are encoded separately and concatenated along the sequence axis instead of
+being silently truncated. The constant negative prompt and positive suffix
+are encoded once per model and kept pinned; user prompts go through a bounded
+LRU. The result is passed to the pipeline as prompt_embeds /
+negative_prompt_embeds (plus the pooled embeddings for SDXL).
+
+Entries are keyed by a variant string as well as the text, so active LoRA
+adapters that change the text encoder get their own embeddings.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import AutoTokenizer
+
+
+@dataclass
+class EncodedPrompt:
+    """Text-encoder output for one prompt segment."""
+
+    embeds: torch.Tensor  # (1, 77 * chunks, hidden)
+    pooled: Optional[torch.Tensor] = None  # (1, projection) - SDXL 전용
+
+    def nbytes(self) -> int:
+        """Bytes held by the cached tensors."""
+        total = self.embeds.numel() * self.embeds.element_size()
+        if self.pooled is not None:
+            total += self.pooled.numel() * self.pooled.element_size()
+        return total
+
+
+def execution_device(pipe) -> torch.device:
+    """Device a pipeline computes on; with sequential CPU offload its weights sit on meta."""
+    return getattr(pipe, "_execution_device", None) or pipe.device
+
+
+class PromptEmbedder:
+    """Chunked, cached prompt encoding for one pipeline's text encoder(s)."""
+
+    def __init__(self, pipe, is_sdxl: bool, cache_size: int = 256):
+        """Bind to the tokenizers/text encoders of a loaded pipeline."""
+        self.is_sdxl = is_sdxl
+        self.encoders = [
+            (tokenizer, encoder)
+            for tokenizer, encoder in (
+                (getattr(pipe, "tokenizer", None), getattr(pipe, "text_encoder", None)),
+                (getattr(pipe, "tokenizer_2", None), getattr(pipe, "text_encoder_2", None)),
+            )
+            if tokenizer is not None and encoder is not None
+        ]
+        # SDXL은 네거티브 프롬프트가 없을 때 0 임베딩을 사용
+        self.zero_negative = is_sdxl and getattr(pipe.config, "force_zeros_for_empty_prompt", False)
+        self._pipe = pipe
+        self.cache_size = cache_size
+        # (variant, text) -> 임베딩
+        self._pinned: Dict[Tuple[str, str], EncodedPrompt] = {}
+        self._cache: "OrderedDict[Tuple[str, str], EncodedPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def device(self) -> torch.device:
+        """Device the text encoders run on (not the meta device of offloaded weights)."""
+        return execution_device(self._pipe)
+
+    def encode(self, text: str, pin: bool = False, variant: str = "") -> EncodedPrompt:
+        """Return the (cached) embeddings for a prompt segment."""
+        key = (variant, text)
+        with self._lock:
+            cached = self._pinned.get(key)
+            if cached is None:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        encoded = self._encode_uncached(text)
+        with self._lock:
+            if pin:
+                self._pinned[key] = encoded
+            else:
+                self._cache[key] = encoded
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return encoded
+
+    def pipeline_kwargs(
+        self,
+        prompts: List[str],
+        prompt_suffix: Optional[str],
+        negative_prompt: Optional[str],
+        variant: str = ""
+    ) -> Dict[str, torch.Tensor]:
+        """Build prompt_embeds / negative_prompt_embeds (and pooled) for a batch."""
+        suffix = self.encode(prompt_suffix, pin=True, variant=variant) if prompt_suffix else None
+        positives = [self._join([self.encode(p, variant=variant)] + ([suffix] if suffix else [])) for p in prompts]
+        negative = self.encode(negative_prompt or "", pin=True, variant=variant)
+        negatives = [negative] * len(prompts)
+
+        # 배치 안의 모든 임베딩을 같은 길이(청크 수)로 맞춤
+        # (배치 스케줄러는 prompt_chunks가 같은 요청만 묶으므로 요청별 길이는 배치와 무관)
+        length = max(e.embeds.shape[1] for e in positives + negatives)
+        padding = self.encode("", pin=True, variant=variant)
+        embeds = torch.cat([self._pad(e.embeds, length, padding.embeds) for e in positives])
+        negative_embeds = torch.cat([self._pad(e.embeds, length, padding.embeds) for e in negatives])
+        if negative_prompt is None and self.zero_negative:
+            negative_embeds = torch.zeros_like(negative_embeds)
+
+        kwargs = {"prompt_embeds": embeds, "negative_prompt_embeds": negative_embeds}
+        if self.is_sdxl:
+            pooled = torch.cat([e.pooled for e in positives])
+            negative_pooled = torch.cat([e.pooled for e in negatives])
+            if negative_prompt is None and self.zero_negative:
+                negative_pooled = torch.zeros_like(negative_pooled)
+            kwargs["pooled_prompt_embeds"] = pooled
+            kwargs["negative_pooled_prompt_embeds"] = negative_pooled
+        return kwargs
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters and memory held."""
+        with self._lock:
+            entries = list(self._pinned.values()) + list(self._cache.values())
+            return {
+                "pinned": len(self._pinned),
+                "cached": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": sum(e.nbytes() for e in entries),
+            }
+
+    def _encode_uncached(self, text: str) -> EncodedPrompt:
+        hidden_states = []
+        pooled = None
+        with torch.inference_mode():
+            for tokenizer, encoder in self.encoders:
+                chunk_outputs = []
+                for i, input_ids in enumerate(self._chunk_ids(tokenizer, text)):
+                    output = encoder(input_ids.to(self.device), output_hidden_states=True)
+                    if self.is_sdxl:
+                        # SDXL은 끝에서 두 번째 레이어 출력을 사용하고 pooled는 두 번째 인코더의 첫 청크에서 가져옴
+                        chunk_outputs.append(output.hidden_states[-2])
+                        if i == 0 and output[0].ndim == 2:
+                            pooled = output[0]
+                    else:
+                        chunk_outputs.append(output[0])
+                hidden_states.append(torch.cat(chunk_outputs, dim=1))
+        embeds = torch.cat(hidden_states, dim=-1)
+        return EncodedPrompt(embeds=embeds, pooled=pooled)
+
+    @staticmethod
+    def _chunk_ids(tokenizer, text: str) -> List[torch.Tensor]:
+        """Split a prompt into BOS + 75 tokens + EOS windows padded to 77."""
+        max_length = tokenizer.model_max_length
+        size = max_length - 2
+        ids = tokenizer(text, truncation=False, add_special_tokens=False, verbose=False).input_ids
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        chunks = []
+        for start in range(0, max(len(ids), 1), size):
+            chunk = [tokenizer.bos_token_id] + ids[start:start + size] + [tokenizer.eos_token_id]
+            chunk += [pad_id] * (max_length - len(chunk))
+            chunks.append(torch.tensor([chunk]))
+        if len(ids) > size:
+            print(f"✂️  프롬프트 {len(ids)} 토큰 → {len(chunks)}개 청크로 인코딩")
+        return chunks
+
+    @staticmethod
+    def _join(parts: List[EncodedPrompt]) -> EncodedPrompt:
+        return EncodedPrompt(
+            embeds=torch.cat([p.embeds for p in parts], dim=1),
+            pooled=parts[0].pooled,
+        )
+
+    @staticmethod
+    def _pad(embeds: torch.Tensor, length: int, padding: torch.Tensor) -> torch.Tensor:
+        # 빈 프롬프트 청크 임베딩을 반복해 길이를 맞춤
+        while embeds.shape[1] < length:
+            embeds = torch.cat([embeds, padding], dim=1)
+        return embeds
+
+
+@lru_cache(maxsize=16)
+def _tokenizer(model_id: str):
+    return AutoTokenizer.from_pretrained(model_id, subfolder="tokenizer")
+
+
+def prompt_chunks(model_id: str, text: str) -> int:
+    """Number of 75-token chunks a prompt is encoded in (1 when embeddings are disabled).
+
+    A batch pads every prompt to its longest entry, so only prompts with the
+    same chunk count may share a pipeline call; otherwise a seeded image
+    would depend on its batch-mates.
+    """
+    if not embeddings_enabled():
+        return 1
+    tokenizer = _tokenizer(model_id)
+    ids = tokenizer(text, truncation=False, add_special_tokens=False, verbose=False).input_ids
+    return max(1, math.ceil(len(ids) / (tokenizer.model_max_length - 2)))
+
+
+def embeddings_enabled() -> bool:
+    """Whether pipelines should receive cached embeddings instead of prompt strings."""
+    return os.getenv("PROMPT_EMBED_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def embed_cache_size() -> int:
+    """Number of user-prompt embeddings kept per model."""
+    return int(os.getenv("PROMPT_EMBED_CACHE_SIZE", "256"))
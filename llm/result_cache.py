@@ -0,0 +1,149 @@
+"""
+Result Cache
+
+Content-addressed disk cache for deterministic generations.
+
+A result is keyed by a hash of every generation input (final prompt,
+negative prompt, model, size, steps, guidance, seed, strength and input
+image hash), so repeating a seeded request returns the stored image without
+touching the pipeline.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+
+def hash_image(image: Image.Image) -> str:
+    """Stable hash of an image's pixels."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def make_cache_key(**inputs: Any) -> str:
+    """Hash all generation inputs into a cache key."""
+    canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of generated images on disk."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """Open (or create) the cache directory and index existing entries."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def path_for(self, key: str) -> str:
+        """On-disk location of a cache entry (sharded by key prefix)."""
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """Return the cached image (already decoded), or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self.path_for(key)
+            try:
+                # 잠금 안에서 디코딩까지 끝내야 다른 요청의 축출로 파일이 지워져도 안전
+                image = Image.open(path)
+                image.load()
+                # 재시작 후에도 LRU 순서를 복원할 수 있도록 접근 시각 갱신
+                os.utime(path)
+            except FileNotFoundError:
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return image
+
+    def put(self, key: str, image: Image.Image) -> str:
+        """Store an image under the key and evict old entries if over budget."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict_locked()
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and disk usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _scan(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide result cache, or None when disabled."""
+    global _cache
+    if os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                directory=os.getenv("RESULT_CACHE_DIR", ".cache/results"),
+                max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "2048")) * 1024 ** 2),
+            )
+        return _cache
@@ -0,0 +1,177 @@
+"""
+Speed Profiles
+
+Named quality/latency trade-offs selectable per request.
+
+A profile picks a scheduler and default step count / guidance scale for a
+model family: "quality" keeps the scheduler the pipeline was loaded with,
+"balanced" swaps in DPM-Solver++ (Karras sigmas) at fewer steps, and "fast"
+runs few-step sampling — LCM with the LCM-LoRA adapter on regular SD/SDXL
+models, LCM alone on LCM-distilled models, and trailing Euler ancestral
+without guidance on turbo models. Swapped schedulers are built from each
+pipeline's own config once and cached per pipeline.
+"""
+
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+PROFILES = ("quality", "balanced", "fast")
+
+# 스케줄러 이름 -> (diffusers 클래스 이름, from_config 추가 인자) ("default"는 로드된 스케줄러 유지)
+# 클래스는 처음 사용할 때 가져옴 (프로필 해석만 하는 매니페스트 검증은 diffusers 없이 동작)
+SCHEDULERS = {
+    "dpm++": ("DPMSolverMultistepScheduler", {"algorithm_type": "dpmsolver++", "use_karras_sigmas": True}),
+    "euler_a_trailing": ("EulerAncestralDiscreteScheduler", {"timestep_spacing": "trailing"}),
+    "lcm": ("LCMScheduler", {}),
+}
+
+# img2img는 strength 비율만큼만 스텝을 실행하므로 전체 스텝 수 상한
+MAX_IMG2IMG_STEPS = 50
+
+
+@dataclass(frozen=True)
+class SpeedProfile:
+    """Scheduler and sampling defaults of one profile for one model."""
+
+    name: str
+    scheduler: str = "default"
+    num_inference_steps: Optional[int] = None  # None이면 요청 값 사용
+    guidance_scale: Optional[float] = None  # None이면 요청 값 사용
+    lora: Optional[str] = None  # 함께 활성화할 LoRA (LCM-LoRA)
+    fallback_scheduler: Optional[str] = None  # lora를 로드할 수 없을 때 사용할 스케줄러
+    description: str = ""
+
+
+def default_profile() -> str:
+    """Profile used when a request doesn't choose one."""
+    name = os.getenv("SPEED_PROFILE_DEFAULT", "quality").lower()
+    return name if name in PROFILES else "quality"
+
+
+def balanced_steps() -> int:
+    """Steps of the balanced profile."""
+    return int(os.getenv("SPEED_BALANCED_STEPS", "12"))
+
+
+def fast_steps() -> int:
+    """Steps of the fast profile."""
+    return int(os.getenv("SPEED_FAST_STEPS", "4"))
+
+
+def lcm_lora(model_id: str) -> str:
+    """LCM-LoRA weights for a model family."""
+    if "xl" in model_id.lower():
+        return os.getenv("SPEED_LCM_LORA_SDXL", "latent-consistency/lcm-lora-sdxl")
+    return os.getenv("SPEED_LCM_LORA_SD", "latent-consistency/lcm-lora-sdv1-5")
+
+
+def get_profile(name: Optional[str], model_id: str) -> SpeedProfile:
+    """Resolve a profile name (None = SPEED_PROFILE_DEFAULT) for a model. Raises ValueError for unknown names."""
+    name = (name or default_profile()).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile: {name}. Available: {list(PROFILES)}")
+    model = model_id.lower()
+    if name == "quality":
+        return SpeedProfile(name, description="Model's own scheduler at the requested steps")
+    if name == "balanced":
+        return SpeedProfile(
+            name,
+            scheduler="dpm++",
+            num_inference_steps=balanced_steps(),
+            description="DPM-Solver++ (Karras) at fewer steps",
+        )
+    if "turbo" in model:
+        # 적대적 증류 모델: 가이던스 없이 1~4 스텝
+        return SpeedProfile(
+            name,
+            scheduler="euler_a_trailing",
+            num_inference_steps=fast_steps(),
+            guidance_scale=0.0,
+            description="Turbo model, trailing Euler ancestral without guidance",
+        )
+    if "lcm" in model:
+        return SpeedProfile(
+            name,
+            scheduler="lcm",
+            num_inference_steps=fast_steps(),
+            guidance_scale=1.0,
+            description="LCM-distilled model with the LCM scheduler",
+        )
+    return SpeedProfile(
+        name,
+        scheduler="lcm",
+        num_inference_steps=fast_steps(),
+        guidance_scale=1.0,
+        lora=lcm_lora(model_id),
+        fallback_scheduler="dpm++",
+        description="LCM-LoRA with the LCM scheduler (DPM-Solver++ if the LoRA is unavailable)",
+    )
+
+
+def resolve(
+    name: Optional[str],
+    model_id: str,
+    num_inference_steps: Optional[int] = None,
+    guidance_scale: Optional[float] = None,
+    strength: Optional[float] = None,
+    default_steps: int = 20,
+    default_guidance: float = 7.5
+) -> Tuple[str, int, float]:
+    """(profile name, steps, guidance) for a request; explicitly requested values win.
+
+    For image-to-image (strength given) the profile's steps are the steps
+    actually run, so the total is scaled up by 1 / strength.
+    """
+    profile = get_profile(name, model_id)
+    if num_inference_steps is None:
+        num_inference_steps = profile.num_inference_steps or default_steps
+        if strength and profile.num_inference_steps:
+            num_inference_steps = min(MAX_IMG2IMG_STEPS, math.ceil(num_inference_steps / strength))
+    if guidance_scale is None:
+        guidance_scale = profile.guidance_scale if profile.guidance_scale is not None else default_guidance
+    return profile.name, num_inference_steps, guidance_scale
+
+
+def describe(model_id: str) -> Dict[str, Dict[str, Any]]:
+    """Profiles available for a model, for /models."""
+    return {name: asdict(get_profile(name, model_id)) for name in PROFILES}
+
+
+class SchedulerSwitcher:
+    """Swaps and caches schedulers on one generator's pipelines.
+
+    Each pipeline keeps the scheduler it was loaded with as "default"; other
+    schedulers are built from that config on first use and reused after.
+    Callers must hold the generator's inference lock.
+    """
+
+    def __init__(self):
+        """Start with an empty cache."""
+        self._cache: Dict[Tuple[int, str], Any] = {}
+        self.builds = 0
+        self.swaps = 0
+
+    def default(self, pipe):
+        """The scheduler pipe was loaded with."""
+        return self._cache.setdefault((id(pipe), "default"), pipe.scheduler)
+
+    def activate(self, pipe, name: str):
+        """Make the named scheduler active on pipe."""
+        scheduler = self.default(pipe) if name == "default" else self._cache.get((id(pipe), name))
+        if scheduler is None:
+            import diffusers
+
+            class_name, kwargs = SCHEDULERS[name]
+            scheduler = getattr(diffusers, class_name).from_config(self.default(pipe).config, **kwargs)
+            self._cache[(id(pipe), name)] = scheduler
+            self.builds += 1
+        if pipe.scheduler is not scheduler:
+            pipe.scheduler = scheduler
+            self.swaps += 1
+            print(f"⏱️  Scheduler: {name} ({scheduler.__class__.__name__})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Build and swap counters."""
+        return {"cached": len(self._cache), "builds": self.builds, "swaps": self.swaps}
@@ -0,0 +1,82 @@
+"""Request batching in the batch scheduler."""
+
+import pytest
+from PIL import Image
+
+import batch_scheduler
+from batch_scheduler import BatchScheduler, _PendingRequest
+
+
+class _RecordingGenerator:
+    """Fake generator that records every batched call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_text_to_image_batch(self, prompts, filenames=None, seeds=None, num_images_per_prompt=1, **kwargs):
+        self.calls.append(
+            {"prompts": list(prompts), "filenames": list(filenames), "seeds": list(seeds), **kwargs}
+        )
+        return [Image.new("RGB", (64, 64)) for _ in seeds]
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setenv("PROMPT_EMBED_CACHE_ENABLED", "false")
+    monkeypatch.setenv("MEMORY_PLANNER_ENABLED", "false")
+    generator = _RecordingGenerator()
+    monkeypatch.setattr(batch_scheduler, "create_generator", lambda model_id: generator)
+    scheduler = BatchScheduler(max_batch_size=4, max_wait_ms=200)
+    yield scheduler, generator
+    scheduler.shutdown()
+
+
+def test_variants_get_their_own_filenames(scheduler):
+    scheduler, generator = scheduler
+
+    images = scheduler.submit_text_to_image(
+        "model", "a cat", filename="cat.png", height=64, width=64, seeds=[1, 2, 3]
+    ).result(5)
+
+    assert len(images) == 3
+    assert generator.calls[0]["filenames"] == ["cat_1.png", "cat_2.png", "cat_3.png"]
+
+
+def _submit(scheduler, prompt, **kwargs):
+    return scheduler.submit_text_to_image("model", prompt, height=64, width=64, **kwargs)
+
+
+def test_compatible_requests_share_one_call(scheduler):
+    scheduler, generator = scheduler
+
+    futures = [_submit(scheduler, prompt, num_inference_steps=4) for prompt in ("a cat", "a dog", "a fox")]
+    for future in futures:
+        assert len(future.result(5)) == 1
+
+    assert len(generator.calls) == 1
+    assert generator.calls[0]["prompts"] == ["a cat", "a dog", "a fox"]
+
+
+def test_incompatible_requests_run_separately(scheduler):
+    scheduler, generator = scheduler
+
+    futures = [
+        _submit(scheduler, "a cat", num_inference_steps=4),
+        _submit(scheduler, "a dog", num_inference_steps=8),
+        _submit(scheduler, "a fox", num_inference_steps=4, profile="fast"),
+        _submit(scheduler, "an owl", num_inference_steps=4),
+    ]
+    for future in futures:
+        future.result(5)
+
+    # 머리 요청과 키가 같은 요청만 한 배치로 묶임
+    batches = sorted(call["prompts"] for call in generator.calls)
+    assert batches == [["a cat", "an owl"], ["a dog"], ["a fox"]]
+
+
+def test_batch_key_includes_prompt_chunks():
+    short = _PendingRequest("text", "model", "a cat", None, 7.5, 4, None)
+    long = _PendingRequest("text", "model", "a cat", None, 7.5, 4, None, prompt_chunks=2)
+
+    assert short.batch_key() == _PendingRequest("text", "model", "a dog", None, 7.5, 4, None).batch_key()
+    assert short.batch_key() != long.batch_key()
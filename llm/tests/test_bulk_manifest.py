@@ -0,0 +1,85 @@
+"""Manifest parsing and resume bookkeeping for the bulk runner (no torch needed)."""
+
+import json
+
+import pytest
+
+from bulk_manifest import ResultsWriter, read_completed, read_manifest
+
+MODEL = "runwayml/stable-diffusion-v1-5"
+
+
+def _write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_ids_are_stable_across_formats_and_order(tmp_path):
+    rows = [{"prompt": "a cat", "seed": 3}, {"prompt": "a dog"}]
+    jsonl = read_manifest(_write_jsonl(tmp_path / "a.jsonl", rows), {"model_id": MODEL})
+    reordered = read_manifest(_write_jsonl(tmp_path / "b.jsonl", rows[::-1]), {"model_id": MODEL})
+    (tmp_path / "c.csv").write_text("prompt,seed\na cat,3\na dog,\n", encoding="utf-8")
+    csv_entries = read_manifest(str(tmp_path / "c.csv"), {"model_id": MODEL})
+
+    ids = [entry.id for entry in jsonl]
+    assert len(set(ids)) == 2
+    assert [entry.id for entry in reordered] == ids[::-1]
+    assert [entry.id for entry in csv_entries] == ids
+
+
+def test_ids_follow_resolved_defaults(tmp_path):
+    path = _write_jsonl(tmp_path / "m.jsonl", [{"prompt": "a cat"}])
+    base = read_manifest(path, {"model_id": MODEL})[0]
+    more_steps = read_manifest(path, {"model_id": MODEL, "num_inference_steps": 8})[0]
+    balanced = read_manifest(path, {"model_id": MODEL, "profile": "balanced"})[0]
+
+    # CLI 기본값이 바뀌면 완료된 항목으로 건너뛰지 않도록 다른 id
+    assert len({base.id, more_steps.id, balanced.id}) == 3
+    assert balanced.num_inference_steps == 12
+
+
+def test_explicit_ids_and_duplicates(tmp_path):
+    rows = [{"id": "intro", "prompt": "a cat"}, {"prompt": "a dog"}, {"prompt": "a dog"}]
+    entries = read_manifest(_write_jsonl(tmp_path / "m.jsonl", rows), {"model_id": MODEL})
+
+    assert entries[0].id == "intro"
+    assert len(entries) == 2
+
+
+def test_bad_rows_name_the_line(tmp_path):
+    path = _write_jsonl(tmp_path / "m.jsonl", [{"prompt": "a cat"}, {"seed": 1}])
+
+    with pytest.raises(ValueError, match=r"m\.jsonl:2: missing prompt"):
+        read_manifest(path)
+
+
+def test_read_completed_resume_semantics(tmp_path):
+    (tmp_path / "images").mkdir()
+    for name in ("a.png", "c.png", "d.png"):
+        (tmp_path / "images" / name).write_bytes(b"x")
+    results = tmp_path / "results.jsonl"
+    records = [
+        {"id": "a", "status": "ok", "images": ["images/a.png"]},
+        {"id": "b", "status": "ok", "images": ["images/missing.png"]},
+        {"id": "c", "status": "ok", "images": ["images/c.png"]},
+        {"id": "c", "status": "error", "error": "boom"},
+        {"id": "d", "status": "error", "error": "boom"},
+        {"id": "d", "status": "ok", "images": ["images/d.png"]},
+    ]
+    # 마지막 줄은 기록 도중 중단되어 잘린 상태
+    results.write_text("".join(json.dumps(r) + "\n" for r in records) + '{"id": "e", "sta', encoding="utf-8")
+
+    completed = read_completed(str(results), str(tmp_path))
+
+    assert sorted(completed) == ["a", "d"]
+
+
+def test_results_writer_starts_after_a_truncated_line(tmp_path):
+    results = tmp_path / "results.jsonl"
+    results.write_text('{"id": "a", "status": "ok", "images": []}\n{"id": "b", "sta', encoding="utf-8")
+
+    writer = ResultsWriter(str(results))
+    writer.write({"id": "c", "status": "ok", "images": []})
+    writer.close()
+
+    assert sorted(read_completed(str(results), str(tmp_path))) == ["a", "c"]
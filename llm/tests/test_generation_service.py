@@ -0,0 +1,98 @@
+"""Chunked variant generation and cancellation."""
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+import batch_scheduler
+import generation_service
+from batch_scheduler import BatchScheduler
+from generation_service import GenerationCancelled, _cached_or_generate
+from result_cache import ResultCache
+
+
+class _BlockingGenerator:
+    """Fake generator whose first call blocks until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def generate_text_to_image_batch(self, prompts, seeds=None, **kwargs):
+        self.calls.append(list(seeds))
+        self.started.set()
+        self.release.wait(5)
+        return [Image.new("RGB", (64, 64)) for _ in seeds]
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setenv("PROMPT_EMBED_CACHE_ENABLED", "false")
+    monkeypatch.setenv("MEMORY_PLANNER_ENABLED", "false")
+    monkeypatch.setenv("RESULT_CACHE_ENABLED", "false")
+    generator = _BlockingGenerator()
+    monkeypatch.setattr(batch_scheduler, "create_generator", lambda model_id: generator)
+    scheduler = BatchScheduler(max_batch_size=1, max_wait_ms=0)
+    yield scheduler, generator
+    generator.release.set()
+    scheduler.shutdown()
+
+
+def _submit(scheduler):
+    return lambda chunk_seeds: scheduler.submit_text_to_image(
+        "model", "a cat", height=64, width=64, num_inference_steps=1, seeds=chunk_seeds
+    )
+
+
+def test_chunks_cover_every_variant(scheduler):
+    scheduler, generator = scheduler
+    generator.release.set()
+
+    images = _cached_or_generate(_submit(scheduler), {}, [1, 2, 3], 1, None, (64, 64))
+
+    assert len(images) == 3
+    assert sorted(generator.calls) == [[1], [2], [3]]
+
+
+def test_cancel_drops_queued_chunks(scheduler):
+    scheduler, generator = scheduler
+    cancel_event = threading.Event()
+    outcome = {}
+
+    def run():
+        try:
+            _cached_or_generate(_submit(scheduler), {}, [1, 2, 3], 1, cancel_event, (64, 64))
+        except GenerationCancelled:
+            outcome["cancelled"] = True
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    assert generator.started.wait(5)
+    cancel_event.set()
+    # 실행 중인 첫 청크는 끝까지 돌지만 대기 중인 청크는 취소되어야 함
+    threading.Event().wait(0.3)
+    generator.release.set()
+    worker.join(5)
+
+    assert outcome == {"cancelled": True}
+    assert generator.calls == [[1]]
+    assert scheduler.pending_count() == 0
+
+
+def test_downgraded_results_are_not_cached(monkeypatch, tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    monkeypatch.setattr(generation_service, "get_result_cache", lambda: cache)
+    rendered = {1: (64, 64), 2: (56, 56)}  # 시드 2는 메모리 플래너가 축소
+
+    def submit(chunk_seeds):
+        future = Future()
+        future.set_result([Image.new("RGB", rendered[seed]) for seed in chunk_seeds])
+        return future
+
+    images = _cached_or_generate(submit, {"prompt": "a cat"}, [1, 2], 2, None, (64, 64))
+
+    assert [image.size for image in images] == [(64, 64), (56, 56)]
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,58 @@
+"""Input image preparation: model-sized, multiple-of-8 pipeline inputs."""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from image_ingest import fit_to_model, ingest_image, prepare_input_image
+
+
+def _encode(image, format):
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("size", [(515, 301), (1000, 700), (9, 1), (64, 64)])
+def test_fit_crops_to_multiples_of_8_within_max_side(size):
+    fitted = fit_to_model(Image.new("RGB", size), max_side=512)
+
+    assert fitted.width % 8 == 0 and fitted.height % 8 == 0
+    assert max(fitted.size) <= 512
+    assert fitted.width >= 8 and fitted.height >= 8
+
+
+def test_prepared_images_are_left_alone():
+    image = Image.new("RGB", (512, 384))
+
+    assert prepare_input_image(image, "runwayml/stable-diffusion-v1-5") is image
+
+
+def test_max_side_follows_the_model_family(monkeypatch):
+    monkeypatch.setenv("INPUT_MAX_SIDE_SD", "256")
+    monkeypatch.setenv("INPUT_MAX_SIDE_SDXL", "512")
+    image = Image.new("RGBA", (1030, 770))
+
+    sd = prepare_input_image(image, "runwayml/stable-diffusion-v1-5")
+    sdxl = prepare_input_image(image, "stabilityai/stable-diffusion-xl-base-1.0")
+
+    assert (sd.mode, sd.size) == ("RGB", (256, 184))
+    assert sdxl.size == (512, 376)
+
+
+def test_ingest_decodes_large_jpegs_to_model_size(monkeypatch):
+    monkeypatch.setenv("INPUT_MAX_SIDE_SD", "512")
+    data = _encode(Image.new("RGB", (2050, 1030), "red"), "JPEG")
+
+    image = ingest_image(data, "runwayml/stable-diffusion-v1-5")
+
+    assert image.mode == "RGB"
+    assert image.size == (512, 256)
+
+
+def test_ingest_rejects_oversized_sources(monkeypatch):
+    monkeypatch.setenv("UPLOAD_MAX_MEGAPIXELS", "0.01")
+
+    with pytest.raises(ValueError, match="Image too large"):
+        ingest_image(_encode(Image.new("RGB", (200, 100)), "PNG"), "runwayml/stable-diffusion-v1-5")
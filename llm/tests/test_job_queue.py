@@ -0,0 +1,83 @@
+"""Job queue capacity and cancellation."""
+
+import threading
+
+import pytest
+
+from job_queue import JobManager, JobStatus, QueueFullError
+
+
+class _Gate:
+    """Handler that blocks every job until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.ran = []
+
+    def __call__(self, job):
+        self.ran.append(job.id)
+        self.started.set()
+        self.release.wait(5)
+        return {"ok": True}
+
+
+@pytest.fixture
+def gate():
+    gate = _Gate()
+    yield gate
+    gate.release.set()
+
+
+def _wait_for(job, status):
+    for _ in range(100):
+        if job.status == status:
+            return True
+        threading.Event().wait(0.02)
+    return False
+
+
+def test_capacity_counts_only_waiting_jobs(gate):
+    manager = JobManager(gate, max_queue_size=2, num_workers=1)
+    running = manager.submit("text", {})
+    assert gate.started.wait(5)
+
+    # 실행 중인 작업은 용량에 포함되지 않음
+    queued = [manager.submit("text", {}), manager.submit("text", {})]
+    with pytest.raises(QueueFullError):
+        manager.submit("text", {})
+
+    # 대기 작업을 취소하면 자리가 생김
+    manager.cancel(queued[0].id)
+    assert manager.queue_depth() == 1
+    manager.submit("text", {})
+    assert manager.stats()["queue_depth"] == 2
+    assert running.status == JobStatus.RUNNING
+
+
+def test_cancelled_queued_job_never_runs(gate):
+    manager = JobManager(gate, max_queue_size=4, num_workers=1)
+    first = manager.submit("text", {})
+    assert gate.started.wait(5)
+    second = manager.submit("text", {})
+
+    assert manager.cancel(second.id).status == JobStatus.CANCELLED
+    gate.release.set()
+
+    assert _wait_for(first, JobStatus.SUCCEEDED)
+    threading.Event().wait(0.1)
+    assert gate.ran == [first.id]
+    assert manager.queue_depth() == 0
+    assert manager.stats()["jobs"]["cancelled"] == 1
+
+
+def test_cancel_signals_running_job_and_ignores_unknown_ids(gate):
+    manager = JobManager(gate, max_queue_size=4, num_workers=1)
+    job = manager.submit("text", {})
+    assert gate.started.wait(5)
+
+    manager.cancel(job.id)
+
+    assert job.cancel_event.is_set()
+    assert job.status == JobStatus.RUNNING
+    assert manager.cancel("missing") is None
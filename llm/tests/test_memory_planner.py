@@ -0,0 +1,59 @@
+"""Memory planner: memory savings first, then downgrade or reject per MEMORY_POLICY."""
+
+import pytest
+import torch
+
+import memory_planner
+from memory_planner import MemoryBudgetError, MemoryPlanner
+
+GB = 1024 ** 3
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    # 상주 메모리 0 (가중치 측정값 0, RSS 0)으로 활성값만 예산과 비교
+    monkeypatch.setattr(memory_planner, "current_rss_bytes", lambda: 0)
+    monkeypatch.setenv("MEMORY_MIN_SIDE", "256")
+    planner = MemoryPlanner("runwayml/stable-diffusion-v1-5", "cpu", torch.float32)
+    planner.weights_bytes = 0
+    return planner
+
+
+def test_memory_savings_come_before_a_downgrade(planner, monkeypatch):
+    monkeypatch.setenv("MEMORY_BUDGET_GB", "2.5")
+
+    plan = planner.plan(512, 512, batch_size=2)
+
+    assert plan.fits and plan.vae_slicing
+    assert (plan.height, plan.width, plan.downgraded) == (512, 512, False)
+
+
+def test_downgrade_picks_a_smaller_multiple_of_8(planner, monkeypatch):
+    monkeypatch.setenv("MEMORY_BUDGET_GB", "1")
+    monkeypatch.setenv("MEMORY_POLICY", "downgrade")
+    assert planner.estimate(512, 512, 1) > GB
+
+    plan = planner.plan(512, 512, batch_size=1)
+
+    assert plan.downgraded and plan.fits
+    assert 256 <= plan.height < 512 and plan.height % 8 == 0
+    assert plan.width == plan.height
+    assert planner.stats()["downgrades"] == 1
+
+
+def test_reject_policy_raises(planner, monkeypatch):
+    monkeypatch.setenv("MEMORY_BUDGET_GB", "1")
+    monkeypatch.setenv("MEMORY_POLICY", "reject")
+
+    with pytest.raises(MemoryBudgetError, match="512x512"):
+        planner.plan(512, 512, batch_size=1)
+    assert planner.stats()["rejections"] == 1
+
+
+def test_downgrade_never_goes_below_min_side(planner, monkeypatch):
+    monkeypatch.setenv("MEMORY_BUDGET_GB", "1")
+    monkeypatch.setenv("MEMORY_MIN_SIDE", "480")
+
+    with pytest.raises(MemoryBudgetError):
+        planner.plan(512, 512, batch_size=1)
+    assert planner.stats()["downgrades"] == 0
@@ -0,0 +1,36 @@
+"""Model registry hits, misses and explicit eviction."""
+
+from image_generator import StableDiffusionGenerator
+import model_registry
+from model_registry import ModelRegistry
+
+
+class _CountingGenerator(StableDiffusionGenerator):
+    """Generator that never loads weights and counts constructions."""
+
+    constructed = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).constructed += 1
+        super().__init__(*args, **kwargs)
+
+    def load_text_pipeline(self):
+        return None
+
+    def memory_footprint(self):
+        return 1
+
+
+def test_hits_and_evict_do_not_construct_generators(monkeypatch):
+    monkeypatch.setattr(_CountingGenerator, "constructed", 0)
+    monkeypatch.setattr(model_registry, "StableDiffusionGenerator", _CountingGenerator)
+    registry = ModelRegistry()
+
+    first = registry.get("model")
+    assert registry.get("model") is first
+    assert first.cache_key == StableDiffusionGenerator.make_cache_key("model")
+    assert registry.evict("model") is True
+    assert registry.evict("model") is False
+
+    assert _CountingGenerator.constructed == 1
+    assert (registry.hits, registry.misses) == (1, 1)
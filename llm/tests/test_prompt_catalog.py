@@ -0,0 +1,82 @@
+"""Prompt catalog composition: deduplication, token budgets and ETag."""
+
+import pytest
+
+from prompt_catalog import PromptCatalog, estimate_tokens, fit_terms, get_catalog
+
+PROMPTS = {"science": {"lab": "lab bench, glassware, Bright Lighting", "space": "planets, stars"}}
+STYLES = {"flat": {"positive": "flat colors, bright lighting, vector art", "negative": "photo, blurry"}}
+TONES = {"calm": "soft colors, calm mood"}
+
+
+def _catalog(positive_budget=0, negative_budget=0, **overrides):
+    parts = {"prompts": PROMPTS, "styles": STYLES, "tones": TONES}
+    parts.update(overrides)
+    return PromptCatalog(
+        parts["prompts"],
+        parts["styles"],
+        parts["tones"],
+        ["high quality,  bright   lighting", "vector art"],
+        ["blurry, low quality", "Photo"],
+        positive_budget,
+        negative_budget,
+    )
+
+
+def test_compose_dedupes_terms_in_priority_order():
+    composed = _catalog().compose("science", "lab", "flat", "calm")
+
+    # 대소문자/공백만 다른 항목은 처음 나온 것만 유지
+    assert composed.positive == (
+        "lab bench, glassware, Bright Lighting, flat colors, vector art, soft colors, calm mood, high quality"
+    )
+    assert composed.negative == "photo, blurry, low quality"
+    assert composed.dropped == ()
+
+
+def test_budget_keeps_a_prefix_and_drops_the_rest():
+    composed = _catalog(positive_budget=8).compose("science", "lab", "flat")
+
+    assert composed.positive == "lab bench, glassware, Bright Lighting"
+    assert composed.positive_tokens <= 8
+    assert composed.dropped == ("flat colors", "vector art", "high quality")
+
+
+def test_fit_terms_stops_at_the_first_overflow():
+    kept, dropped = fit_terms(["a b c", "d e f g", "h"], budget=5)
+
+    # "h"는 예산 안에 들어가지만 더 중요한 앞 항목이 잘렸으므로 함께 제외
+    assert kept == ["a b c"]
+    assert dropped == ["d e f g", "h"]
+    assert fit_terms(["a", "b"], budget=0) == (["a", "b"], [])
+
+
+def test_default_budgets_bind_on_the_shipped_catalog():
+    catalog = get_catalog()
+    options = catalog.options()
+    composed = [catalog.compose(style=style, tone=tone) for style in options["styles"] for tone in options["tones"]]
+
+    assert max(c.positive_tokens for c in composed) <= catalog.positive_budget
+    assert max(c.negative_tokens for c in composed) <= catalog.negative_budget
+    assert any(c.dropped for c in composed)
+    assert all(estimate_tokens(c.negative) == c.negative_tokens for c in composed)
+
+
+def test_compose_is_cached_and_validates_names():
+    catalog = _catalog()
+    first = catalog.compose(style="flat")
+    assert catalog.compose(style="flat") is first
+    assert catalog.cache_info()["hits"] == 1
+
+    with pytest.raises(ValueError, match="Unknown style"):
+        catalog.compose(style="neon")
+    with pytest.raises(ValueError, match="subcategory requires a category"):
+        catalog.compose(subcategory="lab")
+
+
+def test_etag_tracks_catalog_content():
+    etag = _catalog().etag
+
+    assert _catalog().etag == etag
+    assert _catalog(tones={"calm": "soft colors"}).etag != etag
+    assert _catalog(positive_budget=75).etag != etag
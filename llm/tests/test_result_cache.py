@@ -0,0 +1,53 @@
+"""Result cache keys, LRU eviction and eviction-safe hits."""
+
+import io
+import os
+
+from PIL import Image
+
+from output_store import encode_png
+from result_cache import ResultCache, hash_image, make_cache_key
+
+
+def _image(color):
+    return Image.new("RGB", (32, 32), color)
+
+
+def test_key_covers_every_input():
+    inputs = {"prompt": "a cat", "model_id": "m", "seed": 1, "steps": 4}
+
+    assert make_cache_key(**inputs) == make_cache_key(**dict(reversed(list(inputs.items()))))
+    assert make_cache_key(**inputs) != make_cache_key(**{**inputs, "seed": 2})
+    assert make_cache_key(**inputs) != make_cache_key(**{**inputs, "steps": 8})
+    assert hash_image(_image("red")) == hash_image(_image("red"))
+    assert hash_image(_image("red")) != hash_image(_image("blue"))
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path):
+    entry_bytes = os.path.getsize(ResultCache(str(tmp_path / "probe"), 10 ** 6).put("p" * 64, _image("red")))
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=2 * entry_bytes)
+    a, b, c = ("a" * 64, "b" * 64, "c" * 64)
+
+    cache.put(a, _image("red"))
+    cache.put(b, _image("red"))
+    assert cache.get(a) is not None
+    cache.put(c, _image("red"))
+
+    # b가 가장 오래 사용되지 않았으므로 축출
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+    assert not os.path.exists(cache.path_for(b))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_hit_survives_eviction_of_its_file(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    key = "k" * 64
+    cache.put(key, _image("green"))
+
+    image = cache.get(key)
+    os.remove(cache.path_for(key))
+
+    assert image.getpixel((0, 0)) == (0, 128, 0)
+    assert Image.open(io.BytesIO(encode_png(image))).getpixel((0, 0)) == (0, 128, 0)
+    assert cache.get(key) is None
@@ -0,0 +1,43 @@
+"""Speed profile resolution: defaults, img2img step scaling and explicit overrides."""
+
+import pytest
+
+from speed_profiles import MAX_IMG2IMG_STEPS, get_profile, resolve
+
+SD = "runwayml/stable-diffusion-v1-5"
+
+
+@pytest.fixture(autouse=True)
+def _steps(monkeypatch):
+    monkeypatch.setenv("SPEED_BALANCED_STEPS", "12")
+    monkeypatch.setenv("SPEED_FAST_STEPS", "4")
+    monkeypatch.delenv("SPEED_PROFILE_DEFAULT", raising=False)
+
+
+def test_profile_defaults_fill_unset_values():
+    assert resolve(None, SD, default_steps=20, default_guidance=7.5) == ("quality", 20, 7.5)
+    assert resolve("balanced", SD, default_guidance=7.5) == ("balanced", 12, 7.5)
+    assert resolve("fast", SD) == ("fast", 4, 1.0)
+    assert resolve("fast", "stabilityai/sdxl-turbo") == ("fast", 4, 0.0)
+
+
+def test_img2img_steps_scale_with_strength():
+    # strength 비율만큼만 실행되므로 실제 실행 스텝이 프로필 값이 되도록 전체 스텝을 늘림
+    assert resolve("balanced", SD, strength=0.5)[1] == 24
+    assert resolve("fast", SD, strength=0.3)[1] == 14
+    assert resolve("balanced", SD, strength=0.15)[1] == MAX_IMG2IMG_STEPS
+    # 프로필이 스텝을 정하지 않으면 기본값 그대로
+    assert resolve("quality", SD, strength=0.5, default_steps=20)[1] == 20
+
+
+def test_explicit_values_win():
+    assert resolve("fast", SD, num_inference_steps=30, guidance_scale=5.0, strength=0.5) == ("fast", 30, 5.0)
+
+
+def test_default_profile_and_unknown_names(monkeypatch):
+    monkeypatch.setenv("SPEED_PROFILE_DEFAULT", "balanced")
+    assert resolve(None, SD)[0] == "balanced"
+    assert get_profile("FAST", SD).name == "fast"
+
+    with pytest.raises(ValueError, match="Unknown profile"):
+        resolve("turbo", SD)
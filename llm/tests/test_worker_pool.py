@@ -0,0 +1,101 @@
+"""Task routing in the multi-process worker pool (no processes spawned)."""
+
+import threading
+import time
+
+import pytest
+
+from worker_pool import WorkerPool, WorkerSpec, _WorkerState
+
+
+class _FakeProcess:
+    pid = 0
+
+    def __init__(self, alive=True):
+        self.alive = alive
+
+    def is_alive(self):
+        return self.alive
+
+
+class _FakeQueue(list):
+    def put(self, item):
+        self.append(item)
+
+    def get(self):
+        if not self:
+            raise EOFError
+        return self.pop(0)
+
+
+def _pool(*warm_models):
+    """A pool whose workers are in-memory stand-ins, one per warm model set."""
+    pool = WorkerPool.__new__(WorkerPool)
+    pool.heartbeat_interval = 2.0
+    pool._lock = threading.Lock()
+    pool._draining = False
+    pool._tasks = {}
+    pool._workers = {
+        index: _WorkerState(
+            spec=WorkerSpec(index, list(models)),
+            process=_FakeProcess(),
+            tasks=_FakeQueue(),
+            ready=True,
+            last_heartbeat=time.time(),
+            warm_models=set(models),
+        )
+        for index, models in enumerate(warm_models)
+    }
+    return pool
+
+
+def _route(pool, model_id):
+    return pool._dispatch("run_text_to_image", {"model_id": model_id}, None, False).worker
+
+
+def test_warm_worker_wins_over_idle_cold_worker():
+    pool = _pool({"a"}, set())
+    pool._workers[0].outstanding.update({"x", "y"})
+
+    task = pool._dispatch("run_text_to_image", {"model_id": "a"}, None, False)
+
+    assert task.worker == 0
+    assert task.id in pool._workers[0].outstanding
+    assert pool._workers[0].tasks == [("task", task.id, "run_text_to_image", {"model_id": "a"}, None)]
+
+
+def test_cold_model_goes_to_least_busy_worker_and_sticks():
+    pool = _pool(set(), set(), set())
+    pool._workers[0].outstanding.add("x")
+    pool._workers[2].outstanding.update({"y", "z"})
+
+    assert _route(pool, "b") == 1
+    # 한 번 보낸 워커는 모델이 올라온 것으로 간주해 다음 요청도 같은 워커로
+    assert _route(pool, "b") == 1
+    assert "b" in pool._workers[1].warm_models
+
+
+def test_unhealthy_workers_are_skipped():
+    pool = _pool({"a"}, {"a"}, set())
+    pool._workers[0].ready = False
+    pool._workers[1].last_heartbeat = time.time() - 60
+
+    assert _route(pool, "a") == 2
+
+    pool._workers[2].process.alive = False
+    with pytest.raises(RuntimeError, match="No inference worker"):
+        _route(pool, "a")
+    with pytest.raises(ValueError, match="Unknown worker task"):
+        pool._dispatch("shutdown", {}, None, False)
+
+
+def test_heartbeat_replaces_warm_models():
+    pool = _pool({"a"}, set())
+    pool._events = _FakeQueue([("heartbeat", 0, {"models": ["c"], "metrics": {}})])
+
+    pool._collect()
+
+    # 레지스트리가 내린 모델로는 더 이상 우선 라우팅하지 않음
+    assert pool._workers[0].warm_models == {"c"}
+    assert _route(pool, "c") == 0
+    assert _route(pool, "a") == 1
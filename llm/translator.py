@@ -1,27 +1,347 @@
+"""
+Translator Module
+
+Prompt translation to English with M2M100.
+
+The model is loaded lazily (or explicitly via warm_up), prompts that are
+already English are passed through untouched, results are memoized in a
+bounded LRU that can be persisted to disk (at most once per save interval,
+plus on exit), and concurrent translations are batched into a single
+generate call.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Deque, Dict, List, Optional, Tuple
+
+import torch
 from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 
+from metrics import TRANSLATION_SECONDS
 
-model_name = 'facebook/m2m100_418M'
-tokenizer = M2M100Tokenizer.from_pretrained(model_name)
-model = M2M100ForConditionalGeneration.from_pretrained(model_name)
 
+model_name = os.getenv("TRANSLATION_MODEL", "facebook/m2m100_418M")
 
+# 문자 범위로 원문 언어 추정 (M2M100 언어 코드)
+_SCRIPT_RANGES = [
+    ("ko", [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)]),
+    ("ja", [(0x3040, 0x309F), (0x30A0, 0x30FF)]),
+    ("zh", [(0x4E00, 0x9FFF)]),
+    ("ru", [(0x0400, 0x04FF)]),
+]
 
-def translate_text(text: str) -> str:
-    # M2M100 번역 실행
-    tokenizer.src_lang = "ko"
-    encoded = tokenizer(text, return_tensors="pt")
 
-    generated_tokens = model.generate(
-    **encoded,
-    forced_bos_token_id=tokenizer.get_lang_id("en")   # 번역할 언어
-    )
+def detect_language(text: str) -> Optional[str]:
+    """Guess the source language from its script. Returns None for English/Latin text."""
+    counts: Dict[str, int] = {}
+    for char in text:
+        code = ord(char)
+        if code < 0x80:
+            continue
+        for lang, ranges in _SCRIPT_RANGES:
+            if any(start <= code <= end for start, end in ranges):
+                counts[lang] = counts.get(lang, 0) + 1
+                break
+    if not counts:
+        return None
+    # 가나가 섞여 있으면 한자보다 일본어로 판단
+    if counts.get("ja"):
+        return "ja"
+    return max(counts, key=counts.get)
+
+
+class Translator:
+    """Lazily loaded, cached and batching M2M100 translator."""
+
+    def __init__(
+        self,
+        model_name: str = model_name,
+        target_lang: str = "en",
+        cache_size: int = 1024,
+        cache_path: Optional[str] = None,
+        num_beams: Optional[int] = None,
+        max_new_tokens: int = 128,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        save_interval: float = 30.0
+    ):
+        """Configure the translator. The model is not loaded until first use."""
+        self.model_name = model_name
+        self.target_lang = target_lang
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.num_beams = num_beams
+        self.max_new_tokens = max_new_tokens
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.save_interval = save_interval
+        self.tokenizer = None
+        self.model = None
+        self._load_lock = threading.Lock()
+        self._generate_lock = threading.Lock()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: Deque[Tuple[str, str, Future]] = deque()
+        self._condition = threading.Condition()
+        self._batcher: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.batches = 0
+        # 디스크 저장은 묶어서 (배치마다 전체 파일을 다시 쓰지 않도록)
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._last_save = 0.0
+        self._load_disk_cache()
+
+    def is_loaded(self) -> bool:
+        """Whether the model weights are resident."""
+        return self.model is not None
+
+    def warm_up(self):
+        """Load the model now instead of on the first translation."""
+        self._ensure_loaded()
+
+    def translate(self, text: str) -> str:
+        """Translate a single prompt to the target language."""
+        source_lang = detect_language(text)
+        if source_lang is None:
+            self.skipped += 1
+            return text
+
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+
+        future: Future = Future()
+        with self._condition:
+            self._pending.append((text, source_lang, future))
+            self._condition.notify_all()
+            self._start_batcher_locked()
+        return future.result()
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        """Translate many prompts, running uncached ones in batched generate calls."""
+        results: List[Optional[str]] = [None] * len(texts)
+        todo: Dict[Tuple[str, str], List[int]] = {}
+        for i, text in enumerate(texts):
+            source_lang = detect_language(text)
+            if source_lang is None:
+                self.skipped += 1
+                results[i] = text
+                continue
+            cached = self._cache_get(text)
+            if cached is not None:
+                results[i] = cached
+                continue
+            todo.setdefault((text, source_lang), []).append(i)
+
+        keys = list(todo)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            translations = self._translate_uncached(chunk)
+            for key, translation in zip(chunk, translations):
+                for i in todo[key]:
+                    results[i] = translation
+        return results
+
+    def stats(self) -> Dict[str, object]:
+        """Cache and batching counters."""
+        with self._cache_lock:
+            cache_entries = len(self._cache)
+        return {
+            "loaded": self.is_loaded(),
+            "cache_entries": cache_entries,
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_english": self.skipped,
+            "batches": self.batches,
+            "num_beams": self.num_beams,
+        }
+
+    def _ensure_loaded(self):
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is None:
+                start = time.perf_counter()
+                self.tokenizer = M2M100Tokenizer.from_pretrained(self.model_name)
+                model = M2M100ForConditionalGeneration.from_pretrained(self.model_name)
+                model.eval()
+                self.model = model
+                print(f"🌐 번역 모델 로드 완료: {self.model_name} ({time.perf_counter() - start:.1f}s)")
+
+    def _translate_uncached(self, items: List[Tuple[str, str]]) -> List[str]:
+        """Translate (text, source_lang) pairs and store them in the cache."""
+        self._ensure_loaded()
+        translations: Dict[Tuple[str, str], str] = {}
+        by_lang: Dict[str, List[str]] = {}
+        for text, source_lang in items:
+            by_lang.setdefault(source_lang, []).append(text)
 
-    translation = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
-    print(f"🌐 번역: '{text}' → '{translation}'")
-    return translation
+        with self._generate_lock:
+            for source_lang, texts in by_lang.items():
+                self.tokenizer.src_lang = source_lang
+                encoded = self.tokenizer(texts, return_tensors="pt", padding=True)
+                generate_kwargs = {"max_new_tokens": self.max_new_tokens}
+                # num_beams=1 이면 greedy 디코딩 (지연 시간 우선), None 이면 모델 기본값
+                if self.num_beams is not None:
+                    generate_kwargs["num_beams"] = self.num_beams
+                with torch.inference_mode(), TRANSLATION_SECONDS.time(source_lang=source_lang):
+                    generated_tokens = self.model.generate(
+                        **encoded,
+                        forced_bos_token_id=self.tokenizer.get_lang_id(self.target_lang),  # 번역할 언어
+                        **generate_kwargs
+                    )
+                decoded = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+                for text, translation in zip(texts, decoded):
+                    translations[(text, source_lang)] = translation
+                    print(f"🌐 번역: '{text}' → '{translation}'")
+            self.batches += 1
+
+        for (text, _), translation in translations.items():
+            self._cache_put(text, translation)
+        self._schedule_save()
+        return [translations[item] for item in items]
+
+    def _start_batcher_locked(self):
+        if self._batcher is None:
+            self._batcher = threading.Thread(target=self._run_batcher, name="translator-batcher", daemon=True)
+            self._batcher.start()
+
+    def _run_batcher(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # 짧은 대기 시간 동안 동시에 들어온 번역 요청을 모음
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+
+            futures: Dict[Tuple[str, str], List[Future]] = {}
+            for text, source_lang, future in batch:
+                futures.setdefault((text, source_lang), []).append(future)
+            items = list(futures)
+            try:
+                translations = self._translate_uncached(items)
+            except Exception as e:
+                for waiting in futures.values():
+                    for future in waiting:
+                        future.set_exception(e)
+                continue
+            for item, translation in zip(items, translations):
+                for future in futures[item]:
+                    future.set_result(translation)
+
+    def _cache_get(self, text: str) -> Optional[str]:
+        with self._cache_lock:
+            translation = self._cache.get(text)
+            if translation is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return translation
+
+    def _cache_put(self, text: str, translation: str):
+        with self._cache_lock:
+            self._cache[text] = translation
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def flush(self):
+        """Write pending cache entries to disk now."""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_save = time.monotonic()
+            self._save_disk_cache()
+
+    def _schedule_save(self):
+        """Persist the cache at most once per save_interval; the last change is written by a timer."""
+        if not self.cache_path:
+            return
+        with self._save_lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            delay = max(0.0, self._last_save + self.save_interval - time.monotonic())
+            self._save_timer = threading.Timer(delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _load_disk_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  번역 캐시 로드 실패: {e}")
+            return
+        for text, translation in entries.items():
+            self._cache_put(text, translation)
+
+    def _save_disk_cache(self):
+        if not self.cache_path:
+            return
+        with self._cache_lock:
+            entries = dict(self._cache)
+        # 워커 프로세스들이 같은 캐시 파일을 쓰므로 임시 파일 이름은 프로세스/스레드별로
+        tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"⚠️  번역 캐시 저장 실패: {e}")
+
+
+_translator: Optional[Translator] = None
+_translator_lock = threading.Lock()
+
+
+def get_translator() -> Translator:
+    """Return the process-wide translator, configured from the environment."""
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            _translator = Translator(
+                cache_size=int(os.getenv("TRANSLATION_CACHE_SIZE", "1024")),
+                cache_path=os.getenv("TRANSLATION_CACHE_PATH") or None,
+                num_beams=int(os.environ["TRANSLATION_NUM_BEAMS"]) if os.getenv("TRANSLATION_NUM_BEAMS") else None,
+                max_new_tokens=int(os.getenv("TRANSLATION_MAX_NEW_TOKENS", "128")),
+                max_batch_size=int(os.getenv("TRANSLATION_BATCH_SIZE", "8")),
+                max_wait_ms=float(os.getenv("TRANSLATION_BATCH_WAIT_MS", "20")),
+                save_interval=float(os.getenv("TRANSLATION_CACHE_SAVE_SECONDS", "30")),
+            )
+            # 종료 시 아직 저장되지 않은 번역을 기록
+            atexit.register(_translator.flush)
+        return _translator
+
+
+def translate_text(text: str) -> str:
+    """Translate a prompt to English (no-op for prompts that are already English)."""
+    return get_translator().translate(text)
 
 
 
 if __name__ == "__main__":
-    print(translate_text("강아지의 털색만 검정색으로 바꿔줘"))
\ No newline at end of file
+    print(translate_text("강아지의 털색만 검정색으로 바꿔줘"))
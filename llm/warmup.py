@@ -0,0 +1,120 @@
+"""
+Warm-up
+
+Startup preloading and readiness tracking.
+
+Configured models (and their LoRAs) are loaded and run through one tiny
+inference per pipeline, and the translator is loaded, either before the
+server accepts traffic or in the background. Every phase is timed so the
+orchestrator can see where startup time goes, and the service only reports
+ready once all phases have succeeded.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from generation_service import negative_prompt_for, positive_suffix
+from model_registry import get_registry
+from translator import get_translator
+
+# (model_id, lora_weights)
+WarmupTarget = Tuple[str, Optional[str]]
+
+
+class StartupState:
+    """Per-phase startup timings and overall readiness."""
+
+    def __init__(self):
+        """Start the startup clock."""
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._phases: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._done = False
+
+    def record(self, name: str, seconds: float, status: str = "done", error: Optional[str] = None):
+        """Record a finished phase."""
+        with self._lock:
+            self._phases[name] = {"status": status, "seconds": round(seconds, 3), "error": error}
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase; failures are recorded and swallowed so later phases still run."""
+        with self._lock:
+            self._phases[name] = {"status": "running", "seconds": None, "error": None}
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            print(f"⚠️  Startup phase {name} failed: {e}")
+            self.record(name, time.perf_counter() - start, "failed", str(e))
+        else:
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed)
+            print(f"⏱️  {name}: {elapsed:.2f}s")
+
+    def finish(self):
+        """Mark warm-up as complete."""
+        with self._lock:
+            self._done = True
+            self.finished_at = time.time()
+
+    def is_ready(self) -> bool:
+        """Warm-up finished and no phase failed."""
+        with self._lock:
+            return self._done and all(p["status"] == "done" for p in self._phases.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Readiness and phase timings."""
+        with self._lock:
+            return {
+                "ready": self._done and all(p["status"] == "done" for p in self._phases.values()),
+                "warmup_finished": self._done,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "total_seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+                "phases": dict(self._phases),
+            }
+
+
+def warm_up_model(model_id: str, lora_weights: Optional[str] = None):
+    """Load a model into the registry and run its warm-up inferences."""
+    generator = get_registry().get(model_id, lora_weights)
+    generator.warm_up(positive_suffix(), negative_prompt_for())
+
+
+def run_warmup(state: StartupState, targets: List[WarmupTarget], translator: bool = True):
+    """Run every warm-up phase and mark the state finished."""
+    if translator:
+        with state.phase("translator"):
+            get_translator().warm_up()
+    for model_id, lora_weights in targets:
+        with state.phase(f"model:{model_id}"):
+            warm_up_model(model_id, lora_weights)
+    state.finish()
+
+
+def warmup_targets_from_env() -> List[WarmupTarget]:
+    """Parse WARMUP_MODELS ("model_id[=lora_weights],...")."""
+    targets = []
+    for entry in os.getenv("WARMUP_MODELS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model_id, _, lora_weights = entry.partition("=")
+        targets.append((model_id.strip(), lora_weights.strip() or None))
+    return targets
+
+
+def warmup_mode() -> str:
+    """"blocking" (before serving), "background" or "off"."""
+    return os.getenv("WARMUP_MODE", "background").lower()
+
+
+def warmup_translator() -> bool:
+    """Whether the translation model is loaded during warm-up."""
+    return os.getenv("WARMUP_TRANSLATOR", "true").lower() in ("1", "true", "yes")
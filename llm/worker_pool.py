@@ -0,0 +1,410 @@
+"""
+Worker Pool
+
+Multi-process serving: the API process dispatches generation tasks to N
+inference worker processes.
+
+Each worker is pinned to a set of models (preloaded at start) and optionally
+to a set of CPU cores. Tasks are routed to a healthy worker that already has
+the requested model warm, falling back to the least busy one. Workers report
+readiness and heartbeats, are restarted if they die, and finish their queued
+tasks before exiting on shutdown.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from generation_service import GenerationCancelled
+
+# 워커에서 실행 가능한 작업 (generation_service 함수 이름)
+TASKS = {
+    "run_text_to_image",
+    "run_image_to_image",
+    "generate_text_to_image",
+    "generate_image_to_image",
+}
+
+ProgressReporter = Callable[[int, int, Optional[str]], None]
+
+
+def _parse_cpus(spec: str) -> List[int]:
+    """Parse a core list such as "0-3,8,10-11"."""
+    cpus: List[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+@dataclass
+class WorkerSpec:
+    """Static configuration of one inference worker process."""
+
+    index: int
+    models: List[str]
+    cpus: Optional[List[int]] = None
+    threads: int = 4
+
+
+@dataclass
+class _WorkerState:
+    spec: WorkerSpec
+    process: Any
+    tasks: Any
+    ready: bool = False
+    started_at: float = field(default_factory=time.time)
+    last_heartbeat: float = 0.0
+    warm_models: Set[str] = field(default_factory=set)
+    outstanding: Set[str] = field(default_factory=set)
+    completed: int = 0
+    restarts: int = 0
+    startup: Optional[Dict[str, Any]] = None
+    metrics: Optional[Dict[str, Any]] = None
+
+
+@dataclass(eq=False)
+class _Task:
+    id: str
+    worker: int
+    on_progress: Optional[ProgressReporter]
+    future: Future = field(default_factory=Future)
+    cancel_sent: bool = False
+
+
+def _worker_main(spec: WorkerSpec, tasks, events, heartbeat_interval: float):
+    """Entry point of an inference worker process."""
+    if spec.cpus and hasattr(os, "sched_setaffinity"):
+        # 코어(NUMA 노드)를 고정하면 메모리도 first-touch로 해당 노드에 할당됨
+        try:
+            os.sched_setaffinity(0, spec.cpus)
+        except OSError as e:
+            print(f"⚠️  Worker {spec.index} could not pin to cores {spec.cpus}: {e}")
+
+    import torch
+    import generation_service
+    import metrics
+    from latent_preview import make_step_callback
+    from model_registry import get_registry
+    from warmup import StartupState, run_warmup, warmup_translator
+
+    if spec.cpus:
+        torch.set_num_threads(len(spec.cpus))
+    metrics.install_json_logging()
+    generation_service.register_metric_collectors()
+
+    # 담당 모델을 미리 로드하고 작은 추론으로 예열한 뒤 준비 완료 보고
+    state = StartupState()
+    run_warmup(state, [(model_id, None) for model_id in spec.models], translator=warmup_translator())
+    events.put(("ready", spec.index, state.to_dict()))
+
+    stopping = threading.Event()
+
+    def heartbeat():
+        while not stopping.wait(heartbeat_interval):
+            models = [m["model_id"] for m in get_registry().stats()["models"]]
+            # 메트릭 스냅샷을 하트비트에 실어 API 프로세스의 /metrics 에서 합산
+            events.put(("heartbeat", spec.index, {"pid": os.getpid(), "models": models, "metrics": metrics.collect()}))
+
+    threading.Thread(target=heartbeat, name="worker-heartbeat", daemon=True).start()
+
+    cancels: Dict[str, threading.Event] = {}
+
+    def run(task_id: str, name: str, params: Dict[str, Any], preview: bool):
+        cancel_event = cancels[task_id]
+        kwargs = dict(params, cancel_event=cancel_event)
+        if preview is not None:
+            kwargs["step_callback"] = make_step_callback(
+                params["model_id"],
+                preview,
+                lambda step, total, url: events.put(("progress", task_id, (step, total, url))),
+                cancel_event.is_set,
+            )
+        try:
+            result = getattr(generation_service, name)(**kwargs)
+        except GenerationCancelled:
+            events.put(("cancelled", task_id, None))
+        except Exception as e:
+            events.put(("error", task_id, str(e)))
+        else:
+            events.put(("done", task_id, result))
+        finally:
+            cancels.pop(task_id, None)
+
+    # 여러 작업을 동시에 받아야 프로세스 내부 배치 스케줄러가 묶어서 실행할 수 있음
+    executor = ThreadPoolExecutor(max_workers=spec.threads, thread_name_prefix="worker-task")
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        if message[0] == "cancel":
+            cancel_event = cancels.get(message[1])
+            if cancel_event is not None:
+                cancel_event.set()
+            continue
+        _, task_id, name, params, preview = message
+        cancels[task_id] = threading.Event()
+        executor.submit(run, task_id, name, params, preview)
+
+    # 종료 요청: 이미 받은 작업은 끝까지 처리한 뒤 종료
+    executor.shutdown(wait=True)
+    stopping.set()
+    events.put(("stopped", spec.index, None))
+
+
+class WorkerPool:
+    """Routes generation tasks to model-pinned inference worker processes."""
+
+    def __init__(self, specs: List[WorkerSpec], heartbeat_interval: float = 2.0):
+        """Spawn the worker processes and start the event collector."""
+        self.specs = specs
+        self.heartbeat_interval = heartbeat_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._workers: Dict[int, _WorkerState] = {}
+        self._tasks: Dict[str, _Task] = {}
+        self._lock = threading.Lock()
+        self._draining = False
+        for spec in specs:
+            self._workers[spec.index] = self._spawn(spec)
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-events", daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._watch, name="worker-pool-monitor", daemon=True)
+        self._monitor.start()
+
+    def run(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        on_progress: Optional[ProgressReporter] = None,
+        preview: bool = False,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Any:
+        """Run a generation_service function on a worker and block for its result."""
+        task = self._dispatch(name, params, on_progress, preview)
+        while True:
+            try:
+                return task.future.result(timeout=0.1)
+            except FutureTimeoutError:
+                if cancel_event is not None and cancel_event.is_set() and not task.cancel_sent:
+                    task.cancel_sent = True
+                    with self._lock:
+                        worker = self._workers.get(task.worker)
+                    if worker is not None:
+                        worker.tasks.put(("cancel", task.id))
+
+    def is_ready(self) -> bool:
+        """Whether at least one worker can take tasks."""
+        with self._lock:
+            return not self._draining and any(self._healthy(w) for w in self._workers.values())
+
+    def all_ready(self) -> bool:
+        """Whether every worker is healthy and finished its warm-up without failures."""
+        with self._lock:
+            return not self._draining and all(
+                self._healthy(w) and w.startup is not None and w.startup["ready"]
+                for w in self._workers.values()
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-worker health, pinned/warm models and load."""
+        now = time.time()
+        with self._lock:
+            return {
+                "draining": self._draining,
+                "workers": [
+                    {
+                        "index": w.spec.index,
+                        "pid": w.process.pid,
+                        "alive": w.process.is_alive(),
+                        "ready": w.ready,
+                        "healthy": self._healthy(w),
+                        "pinned_models": w.spec.models,
+                        "warm_models": sorted(w.warm_models),
+                        "cpus": w.spec.cpus,
+                        "outstanding": len(w.outstanding),
+                        "completed": w.completed,
+                        "restarts": w.restarts,
+                        "seconds_since_heartbeat": round(now - w.last_heartbeat, 1) if w.last_heartbeat else None,
+                        "startup": w.startup,
+                    }
+                    for w in self._workers.values()
+                ],
+            }
+
+    def metrics_snapshots(self) -> Dict[int, Dict[str, Any]]:
+        """Latest metrics snapshot reported by each worker, by worker index."""
+        with self._lock:
+            return {index: w.metrics for index, w in self._workers.items() if w.metrics is not None}
+
+    def shutdown(self, timeout: float = 60.0):
+        """Stop accepting tasks, let workers finish queued ones, then stop them."""
+        with self._lock:
+            self._draining = True
+            workers = list(self._workers.values())
+        print(f"🛑 Draining {len(workers)} inference worker(s)...")
+        for worker in workers:
+            worker.tasks.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                print(f"⚠️  Worker {worker.spec.index} did not drain in time, terminating")
+                worker.process.terminate()
+
+    def _spawn(self, spec: WorkerSpec) -> _WorkerState:
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(spec, tasks, self._events, self.heartbeat_interval),
+            name=f"inference-worker-{spec.index}",
+            daemon=True,
+        )
+        process.start()
+        print(f"👷 Started inference worker {spec.index} (pid {process.pid}) for {spec.models or 'any model'}")
+        return _WorkerState(spec=spec, process=process, tasks=tasks, warm_models=set(spec.models))
+
+    def _healthy(self, worker: _WorkerState) -> bool:
+        if not worker.ready or not worker.process.is_alive():
+            return False
+        return time.time() - worker.last_heartbeat < self.heartbeat_interval * 5
+
+    def _dispatch(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        on_progress: Optional[ProgressReporter],
+        preview: bool
+    ) -> _Task:
+        if name not in TASKS:
+            raise ValueError(f"Unknown worker task: {name}")
+        model_id = params.get("model_id")
+        with self._lock:
+            if self._draining:
+                raise RuntimeError("Worker pool is shutting down")
+            candidates = [w for w in self._workers.values() if self._healthy(w)]
+            if not candidates:
+                raise RuntimeError("No inference worker is ready")
+            # 요청한 모델이 이미 올라와 있는 워커 우선, 그 안에서 가장 한가한 워커
+            warm = [w for w in candidates if model_id in w.warm_models]
+            worker = min(warm or candidates, key=lambda w: len(w.outstanding))
+            task = _Task(id=uuid.uuid4().hex, worker=worker.spec.index, on_progress=on_progress)
+            self._tasks[task.id] = task
+            worker.outstanding.add(task.id)
+            worker.warm_models.add(model_id)
+        # step_callback은 프로세스를 넘어갈 수 없으므로 워커에서 다시 만듦
+        worker.tasks.put(("task", task.id, name, params, preview if on_progress is not None else None))
+        return task
+
+    def _collect(self):
+        while True:
+            try:
+                kind, key, payload = self._events.get()
+            except (EOFError, OSError):
+                return
+            if kind in ("ready", "heartbeat", "stopped"):
+                with self._lock:
+                    worker = self._workers.get(key)
+                    if worker is None:
+                        continue
+                    worker.last_heartbeat = time.time()
+                    if kind == "ready":
+                        worker.ready = True
+                        worker.startup = payload
+                        print(f"✅ Inference worker {key} ready")
+                    elif kind == "heartbeat":
+                        # 레지스트리가 제거한 모델도 반영되도록 하트비트 목록으로 교체
+                        worker.warm_models = set(payload["models"])
+                        worker.metrics = payload["metrics"]
+                    else:
+                        worker.ready = False
+                continue
+
+            if kind == "progress":
+                with self._lock:
+                    task = self._tasks.get(key)
+                if task is not None and task.on_progress is not None:
+                    task.on_progress(*payload)
+                continue
+
+            with self._lock:
+                task = self._tasks.pop(key, None)
+                if task is None:
+                    continue
+                worker = self._workers.get(task.worker)
+                if worker is not None:
+                    worker.outstanding.discard(task.id)
+                    worker.completed += 1
+            if kind == "done":
+                task.future.set_result(payload)
+            elif kind == "cancelled":
+                task.future.set_exception(GenerationCancelled())
+            else:
+                task.future.set_exception(RuntimeError(payload))
+
+    def _watch(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                if self._draining:
+                    return
+                dead = [w for w in self._workers.values() if not w.process.is_alive()]
+                for worker in dead:
+                    # 죽은 워커의 작업은 실패 처리하고 같은 설정으로 다시 띄움
+                    for task_id in worker.outstanding:
+                        task = self._tasks.pop(task_id, None)
+                        if task is not None:
+                            task.future.set_exception(RuntimeError(f"Inference worker {worker.spec.index} died"))
+                    print(f"⚠️  Inference worker {worker.spec.index} exited ({worker.process.exitcode}), restarting")
+                    replacement = self._spawn(worker.spec)
+                    replacement.restarts = worker.restarts + 1
+                    self._workers[worker.spec.index] = replacement
+
+
+def worker_specs_from_env() -> List[WorkerSpec]:
+    """Build worker specs from INFERENCE_WORKER_MODELS / INFERENCE_WORKER_CPUS.
+
+    Workers are separated by "|"; models within a worker by ",".
+    """
+    models = os.getenv("INFERENCE_WORKER_MODELS", "")
+    cpus = os.getenv("INFERENCE_WORKER_CPUS", "")
+    threads = int(os.getenv("INFERENCE_WORKER_THREADS", "4"))
+    model_groups = models.split("|") if models else []
+    count = int(os.getenv("INFERENCE_WORKERS", str(max(1, len(model_groups)))))
+    cpu_groups = cpus.split("|") if cpus else []
+    specs = []
+    for i in range(count):
+        group = model_groups[i] if i < len(model_groups) else ""
+        specs.append(WorkerSpec(
+            index=i,
+            models=[m.strip() for m in group.split(",") if m.strip()],
+            cpus=_parse_cpus(cpu_groups[i]) if i < len(cpu_groups) else None,
+            threads=threads,
+        ))
+    return specs
+
+
+def serving_mode() -> str:
+    """"single" (in-process inference) or "workers" (inference worker processes)."""
+    return os.getenv("SERVING_MODE", "single").lower()
+
+
+def create_worker_pool() -> Optional[WorkerPool]:
+    """Start the worker pool when SERVING_MODE=workers, otherwise return None."""
+    if serving_mode() != "workers":
+        return None
+    return WorkerPool(
+        worker_specs_from_env(),
+        heartbeat_interval=float(os.getenv("INFERENCE_WORKER_HEARTBEAT_SECONDS", "2")),
+    )